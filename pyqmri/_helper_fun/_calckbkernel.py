@@ -20,6 +20,70 @@ OUTPUT:
 import numpy as np
 
 
+# NRMSE of the radial NUFFT of this package against the exact non-uniform
+# DFT for each oversampling factor and kernel width. Measured in double
+# precision for random complex 64x64 and 128x128 images, sampled with
+# golden angle spokes of twice the image size, after an optimal global
+# complex scaling. The larger error of both image sizes is listed.
+KB_PRESETS = (
+    # (ogf, kwidth, nrmse)
+    (1.25, 3, 7.7e-2),
+    (1.25, 4, 7.1e-2),
+    (1.25, 5, 9.5e-2),
+    (1.25, 6, 1.3e-1),
+    (1.5, 3, 3.6e-2),
+    (1.5, 4, 3.1e-2),
+    (1.5, 5, 3.5e-2),
+    (1.5, 6, 4.2e-2),
+    (1.75, 3, 2.5e-2),
+    (1.75, 4, 2.3e-2),
+    (1.75, 5, 2.5e-2),
+    (1.75, 6, 2.7e-2),
+    (2.0, 3, 2.1e-2),
+    (2.0, 4, 1.9e-2),
+    (2.0, 5, 2.0e-2),
+    (2.0, 6, 2.1e-2),
+    )
+
+
+def kbpreset(nrmse, ogf=None, kwidth=None):
+    """Select oversampling factor and kernel width for a target accuracy.
+
+    Among the entries of KB_PRESETS which reach the target NRMSE, the one
+    with the smallest grid is selected, followed by the one with the
+    smallest kernel. If no entry reaches the target, the most accurate one
+    is returned.
+
+    Parameters
+    ----------
+      nrmse : float
+        The targeted normalized root mean square error of the NUFFT.
+      ogf : float, None
+        Restrict the selection to this oversampling factor.
+      kwidth : int, None
+        Restrict the selection to this kernel width.
+
+    Returns
+    -------
+      tuple of float and int:
+        The oversampling factor and the kernel width.
+    """
+    presets = [preset for preset in KB_PRESETS
+               if (not ogf or preset[0] == ogf)
+               and (not kwidth or preset[1] == kwidth)]
+    if not presets:
+        raise ValueError("No NUFFT preset for an oversampling factor of %s "
+                         "and a kernel width of %s." % (ogf, kwidth))
+    reached = [preset for preset in presets if preset[2] <= nrmse]
+    if not reached:
+        print("Warning: NRMSE of %.1e is not reached, using the most "
+              "accurate NUFFT preset." % nrmse)
+        best = min(presets, key=lambda preset: preset[2])
+    else:
+        best = min(reached, key=lambda preset: preset[:2])
+    return best[0], best[1]
+
+
 def calckbkernel(kwidth, overgridfactor, G, klength=32):
     """Precompute the Kaiser-Bessel Kerenl used for gridding.
 
@@ -67,7 +131,9 @@ def calckbkernel(kwidth, overgridfactor, G, klength=32):
     ft_y = np.pad(ft_y, int((G * klength - ft_y.size) / 2), 'constant')
     ft_y = np.abs(np.fft.fftshift(np.fft.ifft(
         np.fft.ifftshift(ft_y))) * ft_y.size)
-    x = np.linspace(-int(G / (2 * a)), int(G / (2 * a)) - 1, int(G / (a)))
+    # Rounded, as a = G/dim need not be exact in floating point.
+    dim = int(np.round(G / a))
+    x = np.arange(dim) - dim // 2
 
     ft_y = ft_y[(ft_y.size / 2 - x).astype(int)]
     h = np.sinc(x / (G * klength))**2
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""OpenCL code generation for sympy based signal models."""
+import sympy
+from sympy.printing.c import C99CodePrinter
+from sympy.codegen.ast import real, float32, float64
+
+
+class _OpenCLPrinter(C99CodePrinter):
+    """C99 printer emitting OpenCL C builtins.
+
+    OpenCL math functions are overloaded for float and double, thus no
+    type suffix is appended to function names. Integer powers are mapped
+    to pown and the math constants to their OpenCL counterparts.
+
+    Parameters
+    ----------
+      double : bool, false
+        Print double precision (true) or single precision (false, default)
+        literals.
+    """
+
+    def __init__(self, double=False):
+        if double:
+            real_type = float64
+        else:
+            real_type = float32
+        super().__init__({'type_aliases': {real: real_type}})
+        self._double = double
+
+    def _get_func_suffix(self, type_):
+        return ''
+
+    def _print_Pow(self, expr):
+        if expr.exp.is_Integer and abs(int(expr.exp)) > 1:
+            return 'pown(%s, %d)' % (self._print(expr.base), int(expr.exp))
+        return super()._print_Pow(expr)
+
+    def _print_Pi(self, expr):
+        if self._double:
+            return 'M_PI'
+        return 'M_PI_F'
+
+    def _print_Exp1(self, expr):
+        if self._double:
+            return 'M_E'
+        return 'M_E_F'
+
+
+_HELPER = """
+inline {T2} cmul({T2} a, {T2} b)
+{{
+    return ({T2})(a.x*b.x-a.y*b.y, a.x*b.y+a.y*b.x);
+}}
+
+
+inline int cisfinite({T2} a)
+{{
+    return ((as_{U}(a.x) & {MASK}) != {MASK})
+           && ((as_{U}(a.y) & {MASK}) != {MASK});
+}}
+"""
+
+
+def param_layout(shape, NScan, NSlice, dimY, dimX):
+    """Determine how a model parameter is indexed in the kernels.
+
+    Parameters
+    ----------
+      shape : tuple of int
+        Shape of the parameter as used by the numpy evaluation.
+      NScan : int
+        Number of scans.
+      NSlice : int
+        Number of slices.
+      dimY, dimX : int
+        The image dimensions.
+
+    Returns
+    -------
+      str:
+        One of "scalar", "scan", "voxel" or "full".
+    """
+    if len(shape) > 4:
+        raise ValueError("Parameters with more than 4 dimensions are not "
+                         "supported.")
+    shape = (1,)*(4-len(shape)) + tuple(shape)
+    for dim, full in zip(shape, (NScan, NSlice, dimY, dimX)):
+        if dim not in (1, full):
+            raise ValueError("Parameter of shape %s can not be broadcast "
+                             "to the image series." % (shape,))
+    scan_dep = shape[0] > 1
+    vox_dep = any(dim > 1 for dim in shape[1:])
+    if scan_dep and vox_dep:
+        return "full"
+    if scan_dep:
+        return "scan"
+    if vox_dep:
+        return "voxel"
+    return "scalar"
+
+
+class ModelKernelGenerator:
+    """Generate OpenCL kernels for a sympy signal model.
+
+    The unknowns are split into real and imaginary part, such that the
+    complex valued signal and its partial derivatives can be evaluated
+    with real valued arithmetic in the kernels. Model parameters are
+    assumed to be real valued.
+
+    Parameters
+    ----------
+      unknowns : list of sympy.Symbol
+        The unknowns of the model.
+      modelpar : list of sympy.Symbol
+        The model parameters.
+      uk_scale : list of sympy.Symbol
+        The scaling symbol of each unknown.
+      layouts : list of str
+        The layout of each model parameter, see param_layout.
+      double : bool, false
+        Generate double (true) or single (false, default) precision code.
+      phase : bool, false
+        Multiply each image with an individual phase.
+    """
+
+    def __init__(self, unknowns, modelpar, uk_scale, layouts,
+                 double=False, phase=False):
+        self._nuk = len(unknowns)
+        self._layouts = layouts
+        self._phase = phase
+        self._printer = _OpenCLPrinter(double)
+        if double:
+            self._fmt = {"T": "double", "T2": "double2", "U": "ulong",
+                         "MASK": "0x7ff0000000000000UL", "SMALL": "1e-20",
+                         "ZERO": "0.0"}
+        else:
+            self._fmt = {"T": "float", "T2": "float2", "U": "uint",
+                         "MASK": "0x7f800000", "SMALL": "1e-20f",
+                         "ZERO": "0.0f"}
+
+        self._subs = {}
+        for j, uk in enumerate(unknowns):
+            self._subs[uk] = (
+                sympy.Symbol("uk%d_r" % j, real=True)
+                + sympy.I*sympy.Symbol("uk%d_i" % j, real=True))
+        self._scan_syms = set()
+        for j, mypar in enumerate(modelpar):
+            sym = sympy.Symbol("par%d" % j, real=True)
+            self._subs[mypar] = sym
+            if layouts[j] in ("scan", "full"):
+                self._scan_syms.add(sym)
+        for j, scale in enumerate(uk_scale):
+            self._subs[scale] = sympy.Symbol("sc%d" % j, real=True)
+        self._known = set()
+        for val in self._subs.values():
+            self._known |= val.free_symbols
+
+    def header(self):
+        """Return the helper functions used by the kernels.
+
+        Returns
+        -------
+          str:
+            The OpenCL code of the helper functions.
+        """
+        code = _HELPER.format(**self._fmt)
+        if self._fmt["T"] == "double":
+            code = "#pragma OPENCL EXTENSION cl_khr_fp64: enable\n" + code
+        return code
+
+    def _split(self, exprs):
+        parts = []
+        for expr in exprs:
+            expr = sympy.sympify(expr).subs(self._subs)
+            unknown_syms = expr.free_symbols - self._known
+            if unknown_syms:
+                raise ValueError("Undefined symbols in signal equation: %s"
+                                 % unknown_syms)
+            real_part, imag_part = sympy.expand_complex(expr).as_real_imag()
+            if (real_part.atoms(sympy.re, sympy.im)
+                    or imag_part.atoms(sympy.re, sympy.im)):
+                raise ValueError("Could not split signal equation into "
+                                 "real and imaginary part.")
+            parts += [real_part, imag_part]
+        return parts
+
+    def kernel(self, name, outputs):
+        """Generate a kernel writing the given expressions.
+
+        Output j of the kernel is written at position j*NScan*NVox +
+        scan*NVox + voxel of the output buffer.
+
+        Parameters
+        ----------
+          name : str
+            Name of the kernel.
+          outputs : list of sympy expressions
+            The complex valued expressions to evaluate.
+
+        Returns
+        -------
+          str:
+            The OpenCL code of the kernel.
+        """
+        T = self._fmt["T"]
+        T2 = self._fmt["T2"]
+        parts = self._split(outputs)
+        replacements, reduced = sympy.cse(
+            parts, symbols=sympy.numbered_symbols("tmp"))
+
+        scan_syms = set(self._scan_syms)
+        outer = []
+        inner = []
+        for sym, expr in replacements:
+            line = "const %s %s = %s;" % (T, sym, self._printer.doprint(expr))
+            if expr.free_symbols & scan_syms:
+                scan_syms.add(sym)
+                inner.append(line)
+            else:
+                outer.append(line)
+
+        args = ["__global %s *out" % T2, "__global %s *in" % T2]
+        if self._phase:
+            args.append("__global %s *phase" % T2)
+        args += ["const int NScan", "const int NSlice", "const int offset"]
+        load_outer = []
+        load_inner = []
+        for j, layout in enumerate(self._layouts):
+            if layout == "scalar":
+                args.append("const %s par%d" % (T, j))
+                continue
+            args.append("__global %s *par%d_buf" % (T, j))
+            if layout == "voxel":
+                load_outer.append(
+                    "const %s par%d = par%d_buf[ind];" % (T, j, j))
+            elif layout == "scan":
+                load_inner.append(
+                    "const %s par%d = par%d_buf[scan];" % (T, j, j))
+            else:
+                load_inner.append(
+                    "const %s par%d = par%d_buf[scan*NSlice*X*Y + ind];"
+                    % (T, j, j))
+        args += ["const %s sc%d" % (T, j) for j in range(self._nuk)]
+
+        code = ["__kernel void %s(" % name]
+        code.append(",\n".join(" "*16 + arg for arg in args))
+        code.append(" "*16 + ")")
+        code.append("{")
+        body = [
+            "size_t X = get_global_size(2);",
+            "size_t Y = get_global_size(1);",
+            "size_t NSl = get_global_size(0);",
+            "size_t x = get_global_id(2);",
+            "size_t y = get_global_id(1);",
+            "size_t k = get_global_id(0);",
+            "size_t i = k*X*Y + y*X + x;",
+            "size_t ind = (k+offset)*X*Y + y*X + x;",
+            "%s val = %s;" % (T2, self._fmt["ZERO"]),
+            ""]
+        for j in range(self._nuk):
+            body.append("const %s uk%d_r = in[%d*NSl*X*Y + i].x;" % (T, j, j))
+            body.append("const %s uk%d_i = in[%d*NSl*X*Y + i].y;" % (T, j, j))
+        body += load_outer + outer
+        body += ["", "for (int scan=0; scan<NScan; scan++)", "{"]
+        loop = load_inner + inner
+        for j in range(len(reduced)//2):
+            loop.append("val = (%s)(%s, %s);" % (
+                T2,
+                self._printer.doprint(reduced[2*j]),
+                self._printer.doprint(reduced[2*j+1])))
+            if self._phase:
+                loop.append(
+                    "val = cmul(val, phase[scan*NSlice*X*Y + ind]);")
+            loop += [
+                "if (!cisfinite(val))",
+                "{",
+                "    val = (%s)(%s, %s);" % (
+                    T2, self._fmt["SMALL"], self._fmt["ZERO"]),
+                "}",
+                "out[%d*NScan*NSl*X*Y + scan*NSl*X*Y + i] = val;" % j]
+        body += [" "*4 + line for line in loop]
+        body.append("}")
+        code += [" "*4 + line if line else "" for line in body]
+        code.append("}")
+        return "\n".join(code) + "\n"
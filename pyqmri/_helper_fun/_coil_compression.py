@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""SVD based coil compression.
+
+The coil dimension of the k-space data is projected onto the dominant
+left singular vectors of the data, yielding fewer virtual coils. As the
+projection is linear, coil sensitivities are compressed with the same
+matrix.
+"""
+import numpy as np
+
+
+def coil_compression_matrix(data, ncoils=0, energy=0):
+    """Compute the compression matrix of the coil dimension.
+
+    The singular vectors are obtained from the eigen decomposition of the
+    coil covariance matrix accumulated over all scans. One matrix is used
+    for all slices, such that compression also applies to SMS data.
+
+    Parameters
+    ----------
+      data : numpy.array
+        The complex k-space data of shape (NScan, NC, ...).
+      ncoils : int, 0
+        Number of virtual coils. 0 keeps all coils unless an energy
+        threshold is given.
+      energy : float, 0
+        Fraction of the signal energy the virtual coils need to hold,
+        e.g. 0.95. The number of coils is limited to ncoils if both are
+        given.
+
+    Returns
+    -------
+      numpy.array:
+        The compression matrix of shape (number of virtual coils, NC). Its
+        rows are orthonormal.
+    """
+    NC = data.shape[1]
+    cov = np.zeros((NC, NC), dtype=np.complex128)
+    for scan in data:
+        scan = np.reshape(scan, (NC, -1))
+        cov += scan @ np.conj(scan.T)
+    eigval, eigvec = np.linalg.eigh(cov)
+    eigval = np.maximum(eigval[::-1], 0)
+    eigvec = eigvec[:, ::-1]
+
+    nvirtual = NC
+    if energy:
+        cumulative = np.cumsum(eigval)/np.sum(eigval)
+        nvirtual = int(np.searchsorted(cumulative, energy) + 1)
+    if ncoils:
+        nvirtual = min(nvirtual, ncoils)
+    nvirtual = max(1, min(nvirtual, NC))
+    return np.require(np.conj(eigvec[:, :nvirtual].T), requirements='C')
+
+
+def compress_coils(x, matrix, axis=1):
+    """Apply the compression matrix to the coil dimension.
+
+    Parameters
+    ----------
+      x : numpy.array
+        The complex k-space data or coil sensitivities.
+      matrix : numpy.array
+        The compression matrix as returned by coil_compression_matrix.
+      axis : int, 1
+        The coil dimension of x, 1 for k-space data of shape
+        (NScan, NC, ...) and 0 for coil sensitivities of shape (NC, ...).
+
+    Returns
+    -------
+      numpy.array:
+        The virtual coil data with unchanged precision.
+    """
+    compressed = np.tensordot(matrix.astype(x.dtype), x, axes=(1, axis))
+    return np.require(np.moveaxis(compressed, 0, axis), requirements='C')
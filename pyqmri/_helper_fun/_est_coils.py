@@ -8,8 +8,9 @@ inversion joint estimation of coil sensitivities and image content)
 
 """
 import sys
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor
 import numpy as np
-import ipyparallel as ipp
 import pyopencl.array as clarray
 from pyqmri._helper_fun import _nlinvns as nlinvns
 from pyqmri._helper_fun import _goldcomp as goldcomp
@@ -26,6 +27,12 @@ def est_coils(data, par, file, args, off):
     check fails, new coil sensitivity information is estimated and saved to
     the data file.
 
+    The slices are estimated in parallel by the concurrent.futures.Executor
+    in par["coil_executor"] if given. Otherwise a process pool is used or,
+    if args.coil_executor is "ipyparallel", a running ipcluster.
+    par["coils_precomputed"] is set if the profiles were read from the file,
+    i.e. belong to the acquired and not to possibly compressed coils.
+
     Parameters
     ----------
       data : numpy.array
@@ -45,14 +52,39 @@ def est_coils(data, par, file, args, off):
         numpy.array
             The complex coilsensitivity information.
     """
-    ###########################################################################
-    # Initiate parallel interface #############################################
-    ###########################################################################
-    c = ipp.Client()
+    executor = par.get("coil_executor")
+    if isinstance(executor, Executor):
+        _est_coils(data, par, file, args, off, executor)
+        return
+    with _coilExecutor(getattr(args, "coil_executor", "process")) as executor:
+        _est_coils(data, par, file, args, off, executor)
+
+
+def _coilExecutor(name):
+    if name == "process":
+        # The OpenCL contexts and the open data file are already set up
+        # when the coils are estimated. Forking would duplicate them into
+        # the workers, thus fresh interpreters are started instead.
+        return ProcessPoolExecutor(
+            mp_context=multiprocessing.get_context("spawn"))
+    if name == "ipyparallel":
+        try:
+            import ipyparallel as ipp
+        except ImportError as err:
+            raise ImportError(
+                "The ipyparallel coil executor requires the optional "
+                "ipyparallel package.") from err
+        return ipp.Client().executor()
+    raise ValueError("Unknown coil executor: %s" % name)
+
+
+def _est_coils(data, par, file, args, off, executor):
     nlinvNewtonSteps = 6
     nlinvRealConstr = False
+    par["coils_precomputed"] = False
     if args.sms or "Coils_real" in list(file.keys()):
         print("Using precomputed coil sensitivities")
+        par["coils_precomputed"] = True
         slices_coils = file['Coils_real'][()].shape[1]
         par["C"] = file['Coils_real'][
             :,
@@ -134,9 +166,8 @@ def est_coils(data, par, file, args, off):
                     dtype=par["DTYPE"],
                     requirements='C')
 
-                dview = c[int(np.floor(i * len(c) / par["NSlice"]))]
                 result.append(
-                    dview.apply_async(
+                    executor.submit(
                         nlinvns.nlinvns,
                         combinedData,
                         nlinvNewtonSteps,
@@ -146,13 +177,14 @@ def est_coils(data, par, file, args, off):
                         DTYPE_real=par["DTYPE_real"]))
 
             for i in range(par["NSlice"]):
-                par["C"][:, i, :, :] = result[i].get()[2:, -1, :, :]
+                slice_result = result[i].result()
+                par["C"][:, i, :, :] = slice_result[2:, -1, :, :]
                 sys.stdout.write("slice %i done \r"
                                  % (i))
                 sys.stdout.flush()
                 if not nlinvRealConstr:
                     par["phase"][i, :, :] = np.exp(
-                        1j * np.angle(result[i].get()[0, -1, :, :]))
+                        1j * np.angle(slice_result[0, -1, :, :]))
             # standardize coil sensitivity profiles
             sumSqrC = np.sqrt(
                 np.sum(
@@ -166,14 +198,16 @@ def est_coils(data, par, file, args, off):
             else:
                 par["C"] = par["C"] / \
                     np.tile(sumSqrC, (par["NC"], 1, 1, 1))
-            del file['Coils']
             del FFT
-            file.create_dataset(
-                "Coils",
-                par["C"].shape,
-                dtype=par["C"].dtype,
-                data=par["C"])
-            file.flush()
+            # Maps of virtual coils are not stored with the input data.
+            if "coil_compression" not in par:
+                del file['Coils']
+                file.create_dataset(
+                    "Coils",
+                    par["C"].shape,
+                    dtype=par["C"].dtype,
+                    data=par["C"])
+                file.flush()
         elif not args.trafo and not \
                 file['Coils'].shape[1] >= par["NSlice"]:
 
@@ -192,9 +226,8 @@ def est_coils(data, par, file, args, off):
                 sys.stdout.flush()
 
                 tmp = combinedData[:, i, ...]
-                dview = c[int(np.floor(i * len(c) / par["NSlice"]))]
                 result.append(
-                    dview.apply_async(
+                    executor.submit(
                         nlinvns.nlinvns,
                         tmp,
                         nlinvNewtonSteps,
@@ -204,13 +237,14 @@ def est_coils(data, par, file, args, off):
                         DTYPE_real=par["DTYPE_real"]))
 
             for i in range(par["NSlice"]):
-                par["C"][:, i, :, :] = result[i].get()[2:, -1, :, :]
+                slice_result = result[i].result()
+                par["C"][:, i, :, :] = slice_result[2:, -1, :, :]
                 sys.stdout.write("slice %i done \r"
                                  % (i))
                 sys.stdout.flush()
                 if not nlinvRealConstr:
                     par["phase"][i, :, :] = np.exp(
-                        1j * np.angle(result[i].get()[0, -1, :, :]))
+                        1j * np.angle(slice_result[0, -1, :, :]))
 
                     # standardize coil sensitivity profiles
             sumSqrC = np.sqrt(
@@ -225,15 +259,17 @@ def est_coils(data, par, file, args, off):
             else:
                 par["C"] = par["C"] / \
                     np.tile(sumSqrC, (par["NC"], 1, 1, 1))
-            del file['Coils']
-            file.create_dataset(
-                "Coils",
-                par["C"].shape,
-                dtype=par["C"].dtype,
-                data=par["C"])
-            file.flush()
+            if "coil_compression" not in par:
+                del file['Coils']
+                file.create_dataset(
+                    "Coils",
+                    par["C"].shape,
+                    dtype=par["C"].dtype,
+                    data=par["C"])
+                file.flush()
         else:
             print("Using precomputed coil sensitivities")
+            par["coils_precomputed"] = True
             slices_coils = file['Coils'].shape[1]
             par["C"] = \
                 file['Coils'][
@@ -315,9 +351,8 @@ def est_coils(data, par, file, args, off):
                     dtype=par["DTYPE"],
                     requirements='C')
 
-                dview = c[int(np.floor(i * len(c) / par["NSlice"]))]
                 result.append(
-                    dview.apply_async(
+                    executor.submit(
                         nlinvns.nlinvns,
                         combinedData,
                         nlinvNewtonSteps,
@@ -327,13 +362,14 @@ def est_coils(data, par, file, args, off):
                         DTYPE_real=par["DTYPE_real"]))
 
             for i in range(par["NSlice"]):
-                par["C"][:, i, :, :] = result[i].get()[2:, -1, :, :]
+                slice_result = result[i].result()
+                par["C"][:, i, :, :] = slice_result[2:, -1, :, :]
                 sys.stdout.write("slice %i done \r"
                                  % (i))
                 sys.stdout.flush()
                 if not nlinvRealConstr:
                     par["phase"][i, :, :] = np.exp(
-                        1j * np.angle(result[i].get()[0, -1, :, :]))
+                        1j * np.angle(slice_result[0, -1, :, :]))
 
                     # standardize coil sensitivity profiles
             sumSqrC = np.sqrt(
@@ -369,9 +405,8 @@ def est_coils(data, par, file, args, off):
 
                 # RADIAL PART
                 tmp = combinedData[:, i, ...]
-                dview = c[int(np.floor(i * len(c) / par["NSlice"]))]
                 result.append(
-                    dview.apply_async(
+                    executor.submit(
                         nlinvns.nlinvns,
                         tmp,
                         nlinvNewtonSteps,
@@ -381,13 +416,14 @@ def est_coils(data, par, file, args, off):
                         DTYPE_real=par["DTYPE_real"]))
 
             for i in range(par["NSlice"]):
-                par["C"][:, i, :, :] = result[i].get()[2:, -1, :, :]
+                slice_result = result[i].result()
+                par["C"][:, i, :, :] = slice_result[2:, -1, :, :]
                 sys.stdout.write("slice %i done \r"
                                  % (i))
                 sys.stdout.flush()
                 if not nlinvRealConstr:
                     par["phase"][i, :, :] = np.exp(
-                        1j * np.angle(result[i].get()[0, -1, :, :]))
+                        1j * np.angle(slice_result[0, -1, :, :]))
                     # standardize coil sensitivity profiles
             sumSqrC = np.sqrt(
                 np.sum(
@@ -400,9 +436,10 @@ def est_coils(data, par, file, args, off):
                 par["C"] = sumSqrC[None, ...]
             else:
                 par["C"] = par["C"] / np.tile(sumSqrC, (par["NC"], 1, 1, 1))
-        file.create_dataset(
-            "Coils",
-            par["C"].shape,
-            dtype=par["C"].dtype,
-            data=par["C"])
-        file.flush()
+        if "coil_compression" not in par:
+            file.create_dataset(
+                "Coils",
+                par["C"].shape,
+                dtype=par["C"].dtype,
+                data=par["C"])
+            file.flush()
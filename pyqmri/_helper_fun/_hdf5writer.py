@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Asynchronous writer for HDF5 result files."""
+import queue
+import threading
+import numpy as np
+import h5py
+
+
+_COMPLEX16 = np.dtype([('r', np.float16), ('i', np.float16)])
+
+
+class HDF5Writer():
+    """Write datasets to an HDF5 file in a background thread.
+
+    Datasets are stored chunked with one 2D image per chunk and can be
+    compressed. The number of pending datasets is bounded, such that
+    write only blocks if the writer falls behind.
+
+    Parameters
+    ----------
+      filename : str
+        The HDF5 file to append the datasets to.
+      compression : str, None
+        The HDF5 compression filter, e.g. gzip or lzf. None disables
+        compression.
+      compression_opts : int, None
+        Options of the compression filter, e.g. the gzip level.
+      precision : str, native
+        Store complex data with native precision, as float32 or as float16
+        real and imaginary part.
+      maxsize : int, 2
+        Maximum number of datasets waiting to be written.
+    """
+
+    def __init__(self, filename, compression="gzip", compression_opts=4,
+                 precision="native", maxsize=2):
+        if precision not in ("native", "float32", "float16"):
+            raise ValueError("Unknown output precision: %s" % precision)
+        if compression in ("none", ""):
+            compression = None
+        if compression is None or compression == "lzf":
+            compression_opts = None
+        self._filename = filename
+        self._compression = compression
+        self._compression_opts = compression_opts
+        self._precision = precision
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def write(self, name, data, attrs=None):
+        """Queue a dataset for writing.
+
+        The array is handed over to the writer and must not be modified
+        afterwards.
+
+        Parameters
+        ----------
+          name : str
+            Name of the dataset.
+          data : numpy.array
+            The data to write.
+          attrs : dict, None
+            Attributes to set on the file.
+        """
+        self._checkError()
+        self._queue.put((self._writeItem, (name, data, attrs)))
+
+    def call(self, function, *args):
+        """Queue a function to run in the writer thread.
+
+        The function is called after all previously queued datasets are
+        written. The arguments must not be modified afterwards.
+
+        Parameters
+        ----------
+          function : callable
+            The function to call.
+          args : list of objects
+            The arguments passed to the function.
+        """
+        self._checkError()
+        self._queue.put((function, args))
+
+    def flush(self):
+        """Block until all queued datasets are written."""
+        self._queue.join()
+        self._checkError()
+
+    def close(self):
+        """Write all queued datasets and stop the writer thread."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self._checkError()
+
+    def _checkError(self):
+        if self._error is not None:
+            error = self._error
+            self._error = None
+            raise error
+
+    def _convert(self, data):
+        if not np.iscomplexobj(data) or self._precision == "native":
+            return data
+        if self._precision == "float32":
+            return data.astype(np.complex64)
+        tmp = np.empty(data.shape, dtype=_COMPLEX16)
+        tmp['r'] = data.real
+        tmp['i'] = data.imag
+        return tmp
+
+    def _chunks(self, shape):
+        if len(shape) < 2:
+            return None
+        return (1,)*(len(shape)-2) + tuple(shape[-2:])
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                if self._error is None:
+                    function, args = item
+                    function(*args)
+            except Exception as err:
+                self._error = err
+            finally:
+                self._queue.task_done()
+
+    def _writeItem(self, name, data, attrs):
+        data = self._convert(np.asarray(data))
+        with h5py.File(self._filename, "a") as f:
+            # Datasets of a resumed fit replace the ones written before.
+            if name in f:
+                del f[name]
+            f.create_dataset(name, data.shape, dtype=data.dtype,
+                             data=data,
+                             chunks=self._chunks(data.shape),
+                             compression=self._compression,
+                             compression_opts=self._compression_opts)
+            if attrs is not None:
+                for key, value in attrs.items():
+                    f.attrs[key] = value
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Pooled device memory allocation."""
+import sys
+import threading
+import pyopencl as cl
+import pyopencl.array as clarray
+
+
+def _binSize(size):
+    # Four bins per power of two limit the unused memory of a buffer.
+    shift = max(int(size).bit_length() - 3, 0)
+    return -(-size >> shift) << shift
+
+
+class DevicePool():
+    """Pooled allocator for the device memory of a context.
+
+    Released buffers are kept by the pool and handed out again for requests
+    of the same size bin, such that the arrays allocated anew in every
+    Gauss-Newton step reuse the memory of the previous step instead of
+    fragmenting the device memory.
+
+    A buffer is released once the pool holds the only reference to it. As
+    kernels enqueued before may still access it, a marker is enqueued on
+    every queue of the context at this point. The buffer is handed out
+    again as soon as these markers completed. Buffers with pending markers
+    are only reused if no other buffer of the bin is available, waiting for
+    their markers instead of finishing the queues.
+
+    Parameters
+    ----------
+      queues : list of PyOpenCL.Queue
+        All queues of the context to allocate memory in.
+
+    Attributes
+    ----------
+      hits : int
+        Number of allocations served from released buffers.
+      misses : int
+        Number of allocations which required new device memory.
+      high_water : int
+        Maximum number of bytes in use at the same time.
+    """
+
+    def __init__(self, queues):
+        self._queues = list(queues)
+        self._ctx = self._queues[0].context
+        self._active = []
+        self._held = {}
+        self.hits = 0
+        self.misses = 0
+        self.high_water = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, size):
+        """Allocate a buffer of at least size bytes.
+
+        Parameters
+        ----------
+          size : int
+            The number of bytes to allocate.
+
+        Returns
+        -------
+          PyOpenCL.Buffer:
+            The allocated buffer. It is returned to the pool once it is
+            released.
+        """
+        size = _binSize(size)
+        # Models allocate from several threads in streamed mode.
+        with self._lock:
+            self._collect()
+            buffer = self._reuse(size)
+            if buffer is None:
+                self.misses += 1
+                buffer = self._allocate(size)
+            else:
+                self.hits += 1
+            self._active.append(buffer)
+            self.high_water = max(self.high_water, self._activeBytes())
+        return buffer
+
+    def _collect(self):
+        active = []
+        released = []
+        for buffer in self._active:
+            # The list, the loop variable and the argument of getrefcount
+            # refer to buffers which are not used anymore.
+            if sys.getrefcount(buffer) > 3:
+                active.append(buffer)
+            else:
+                released.append(buffer)
+        if not released:
+            return
+        self._active = active
+        markers = [cl.enqueue_marker(queue) for queue in self._queues]
+        for queue in self._queues:
+            queue.flush()
+        for buffer in released:
+            self._held.setdefault(buffer.size, []).append((buffer, markers))
+
+    def _reuse(self, size):
+        held = self._held.get(size)
+        if not held:
+            return None
+        for j, (buffer, markers) in enumerate(held):
+            if all(marker.command_execution_status
+                   <= cl.command_execution_status.COMPLETE
+                   for marker in markers):
+                del held[j]
+                return buffer
+        # The oldest buffer is released first.
+        buffer, markers = held.pop(0)
+        cl.wait_for_events(markers)
+        return buffer
+
+    def _allocate(self, size):
+        try:
+            return cl.Buffer(self._ctx, cl.mem_flags.READ_WRITE, size)
+        except cl.MemoryError:
+            # Retry once the held buffers are returned to the device.
+            self._held.clear()
+            return cl.Buffer(self._ctx, cl.mem_flags.READ_WRITE, size)
+
+    def _activeBytes(self):
+        return sum(buffer.size for buffer in self._active)
+
+    def stats(self):
+        """Return the allocation statistics.
+
+        Returns
+        -------
+          dict:
+            The number of hits and misses, the high-water mark as well as
+            the currently active and held memory in bytes.
+        """
+        with self._lock:
+            self._collect()
+            active_bytes = self._activeBytes()
+            held_bytes = sum(buffer.size for held in self._held.values()
+                             for buffer, _ in held)
+        return {"hits": self.hits,
+                "misses": self.misses,
+                "high_water": self.high_water,
+                "active_bytes": active_bytes,
+                "managed_bytes": active_bytes + held_bytes}
+
+    def freeHeld(self):
+        """Release all buffers held by the pool to the device."""
+        with self._lock:
+            self._collect()
+            self._held.clear()
+
+
+def get_allocator(par, device=0):
+    """Return the allocator of a device if memory pools are used.
+
+    Parameters
+    ----------
+      par : dict
+        The parameter struct, optionally holding a list of allocators, one
+        per device, in "allocator".
+      device : int, 0
+        Index of the device.
+
+    Returns
+    -------
+      DevicePool or None:
+        The allocator or None to use the default PyOpenCL allocation.
+    """
+    allocators = par.get("allocator")
+    if not allocators:
+        return None
+    return allocators[device]
+
+
+def detach_allocator(*arrays):
+    """Use the default allocation for arrays derived from pooled arrays.
+
+    PyOpenCL allocates the results of array arithmetic and reductions with
+    the allocator of the input arrays. Detaching the pool from long-lived
+    arrays keeps the many small temporaries of the solver iterations out of
+    the pool, which checks its buffers for releases on every allocation.
+
+    Parameters
+    ----------
+      arrays : list of PyOpenCL.Array
+        The arrays allocated from a pool. Other objects, e.g. the numpy
+        arrays of the streamed solvers, are skipped.
+    """
+    for array in arrays:
+        if isinstance(array, clarray.Array):
+            array.allocator = None
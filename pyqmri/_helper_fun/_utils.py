@@ -74,6 +74,16 @@ def gen_default_config():
     config['TGV']["delta_inc"] = '10'
     config['TGV']["gamma_dec"] = '0.5'
     config['TGV']["omega_dec"] = '0.5'
+    config['TGV']["warmstart"] = '0'
+    config['TGV']["model_threads"] = '1'
+    config['TGV']["output_compression"] = 'gzip'
+    config['TGV']["output_compression_level"] = '4'
+    config['TGV']["output_precision"] = 'native'
+    config['TGV']["checkpoint_interval"] = '0'
+    config['TGV']["multires_factor"] = '1'
+    config['TGV']["multires_gn_it"] = '0'
+    config['TGV']["adaptive_iters"] = '0'
+    config['TGV']["gn_tol"] = '0'
     config['TGV']["beta"] = '15'
 
     config['TV'] = {}
@@ -93,6 +103,16 @@ def gen_default_config():
     config['TV']["delta_inc"] = '10'
     config['TV']["gamma_dec"] = '0.5'
     config['TV']["omega_dec"] = '0.5'
+    config['TV']["warmstart"] = '0'
+    config['TV']["model_threads"] = '1'
+    config['TV']["output_compression"] = 'gzip'
+    config['TV']["output_compression_level"] = '4'
+    config['TV']["output_precision"] = 'native'
+    config['TV']["checkpoint_interval"] = '0'
+    config['TV']["multires_factor"] = '1'
+    config['TV']["multires_gn_it"] = '0'
+    config['TV']["adaptive_iters"] = '0'
+    config['TV']["gn_tol"] = '0'
     config['TV']["beta"] = '1'
 
     with open('default.ini', 'w') as configfile:
@@ -125,9 +145,15 @@ def read_config(conf_file, reg_type="TGV"):
     finally:
         params = {}
         for key in config[reg_type]:
-            if key in {'max_gn_it', 'max_iters', 'start_iters'}:
+            if key in {'max_gn_it', 'max_iters', 'start_iters',
+                       'model_threads', 'output_compression_level',
+                       'checkpoint_interval', 'multires_factor',
+                       'multires_gn_it'}:
                 params[key] = int(config[reg_type][key])
-            elif key == 'display_iterations':
+            elif key in {'output_compression', 'output_precision'}:
+                params[key] = config[reg_type][key]
+            elif key in {'display_iterations', 'warmstart',
+                         'adaptive_iters'}:
                 params[key] = config[reg_type].getboolean(key)
             else:
                 params[key] = float(config[reg_type][key])
@@ -2,17 +2,23 @@
 # -*- coding: utf-8 -*-
 """Module holding the classes for IRGN Optimization without streaming."""
 from __future__ import division
+import os
 import time
 import numpy as np
+import numexpr as ne
+import h5py
 
 from pkg_resources import resource_filename
 import pyopencl.array as clarray
-import h5py
+import pyopencl.elementwise as clelem
+import pyopencl.reduction as clred
 
 import pyqmri.operator as operator
 import pyqmri.solver as optimizer
 from pyqmri._helper_fun import CLProgram as Program
 from pyqmri._helper_fun import _utils as utils
+from pyqmri._helper_fun._hdf5writer import HDF5Writer
+from pyqmri._helper_fun._memorypool import get_allocator, detach_allocator
 
 
 class IRGNOptimizer:
@@ -76,6 +82,8 @@ class IRGNOptimizer:
         self.par = par
         self.gn_res = []
         self.irgn_par = utils.read_config(config, reg_type)
+        self._model_threads = self.irgn_par.get("model_threads", 1)
+        self._allocator = get_allocator(par)
         utils.save_config(self.irgn_par, par["outdir"], reg_type)
         num_dev = len(par["num_dev"])
         self._fval_old = 0
@@ -135,13 +143,11 @@ class IRGNOptimizer:
             self.sliceaxis = 1
             if self._streamed:
                 self._data_trans_axes = (1, 0, 2, 3)
-                self._grad_trans_axes = (2, 0, 1, 3, 4)
         else:
             self._data_shape = (par["NScan"], par["NC"],
                                 par["NSlice"], par["Nproj"], par["N"])
             if self._streamed:
                 self._data_trans_axes = (2, 0, 1, 3, 4)
-                self._grad_trans_axes = (2, 0, 1, 3, 4)
                 self._coils = np.require(
                     np.swapaxes(par["C"], 0, 1), requirements='C',
                     dtype=DTYPE)
@@ -163,7 +169,9 @@ class IRGNOptimizer:
                     self._expdim_C = 1
             else:
                 self._coils = clarray.to_device(self._queue[0],
-                                                self.par["C"])
+                                                self.par["C"],
+                                                allocator=self._allocator)
+                detach_allocator(self._coils)
 
         self._MRI_operator, self._FT = operator.Operator.MRIOperatorFactory(
             par,
@@ -202,6 +210,46 @@ class IRGNOptimizer:
         self._omega = None
         self._step_val = None
         self._modelgrad = None
+        self._writer = None
+        self._resume_state = None
+        self._final_state = None
+
+        if not self._streamed:
+            self._setupReductionKernels()
+
+    def _setupReductionKernels(self):
+        if self._DTYPE == np.complex128:
+            ctype = "double2"
+            rtype = "double"
+        else:
+            ctype = "float2"
+            rtype = "float"
+        self._abskrnl = clred.ReductionKernel(
+            self._ctx[0], self._DTYPE_real, 0,
+            reduce_expr="a+b", map_expr="hypot(x[i].s0,x[i].s1)",
+            arguments="__global %s *x" % ctype)
+        self._abskrnldiff = clred.ReductionKernel(
+            self._ctx[0], self._DTYPE_real, 0,
+            reduce_expr="a+b",
+            map_expr="hypot(x[i].s0-y[i].s0,x[i].s1-y[i].s1)",
+            arguments="__global %s *x, __global %s *y" % (ctype, ctype))
+        self._normkrnl = clred.ReductionKernel(
+            self._ctx[0], self._DTYPE_real, 0,
+            reduce_expr="a+b",
+            map_expr="x[i].s0*x[i].s0+x[i].s1*x[i].s1",
+            arguments="__global %s *x" % ctype)
+        self._normkrnldiff = clred.ReductionKernel(
+            self._ctx[0], self._DTYPE_real, 0,
+            reduce_expr="a+b",
+            map_expr="(x[i].s0-y[i].s0)*(x[i].s0-y[i].s0)"
+                     "+(x[i].s1-y[i].s1)*(x[i].s1-y[i].s1)",
+            arguments="__global %s *x, __global %s *y" % (ctype, ctype))
+        self._scalekrnl = clelem.ElementwiseKernel(
+            self._ctx[0],
+            "__global %s *x, __global %s *scale, const long n_vox"
+            % (ctype, rtype),
+            "x[i] *= scale[i/n_vox]",
+            "scale_unknowns")
 
     def _setupLinearOps(self, DTYPE, DTYPE_real):
         grad_op = operator.Operator.GradientOperatorFactory(
@@ -242,80 +290,167 @@ class IRGNOptimizer:
         """
         # self.irgn_par["lambd"] *= (
         #                             (self.par["SNR_est"]))
-        self._gamma = self.irgn_par["gamma"]
-        self._delta = self.irgn_par["delta"]
-        self._omega = self.irgn_par["omega"]
-
-        iters = self.irgn_par["start_iters"]
-        result = np.copy(self._model.guess)
-
-        if self._streamed:
-            data = np.require(
-                np.transpose(data, self._data_trans_axes),
-                requirements='C')
-
-        self._step_val = np.nan_to_num(self._model.execute_forward(result))
-
-        if self._streamed:
-            if self._SMS is False:
-                self._step_val = np.require(
-                    np.swapaxes(self._step_val, 0, 1), requirements='C')
-
-        for ign in range(self.irgn_par["max_gn_it"]):
-            start = time.time()
-            self._modelgrad = np.nan_to_num(
-                self._model.execute_gradient(result))
-
-            self._balanceModelGradients(result)
-
-            # if not np.mod(ign, 1):
-            #     self._pdop._grad_op.updateRatio(result)
-            #     if self._reg_type == 'TGV':
-            #         self._pdop._symgrad_op.updateRatio(
-            #             self._pdop._grad_op.ratio)
-
-            self._step_val = np.nan_to_num(self._model.execute_forward(result))
-
+        if self._resume_state is None:
+            self._gamma = self.irgn_par["gamma"]
+            self._delta = self.irgn_par["delta"]
+            self._omega = self.irgn_par["omega"]
+            iters = self.irgn_par["start_iters"]
+            gn_start = 0
+            guess = self._model.guess
+        else:
+            state = self._resume_state
+            self._resume_state = None
+            self._gamma = state["gamma"]
+            self._delta = state["delta"]
+            self._omega = state["omega"]
+            iters = state["iters"]
+            gn_start = state["gn_step"]
+            guess = state["x"]
+            if state["fval_init"] is not None:
+                self._fval_init = state["fval_init"]
+                self._pdop.setFvalInit(self._fval_init)
+            print("Resuming at GN-Iter: %d" % gn_start)
+        self._pdop.resetWarmStart()
+        self._writer = HDF5Writer(
+            self.par["outdir"]+"output_" + self.par["fname"] + ".h5",
+            compression=self.irgn_par.get("output_compression", "gzip"),
+            compression_opts=self.irgn_par.get(
+                "output_compression_level", 4),
+            precision=self.irgn_par.get("output_precision", "native"))
+        try:
             if self._streamed:
-                if self._SMS is False:
-                    self._step_val = np.require(
-                        np.swapaxes(self._step_val, 0, 1), requirements='C')
-                self._modelgrad = np.require(
-                    np.transpose(self._modelgrad, self._grad_trans_axes),
+                # The streamed solvers work on a slice-major layout. The
+                # unknowns are kept in this layout for the whole fit and only
+                # passed as views with the unknowns first to the model.
+                result = np.require(
+                    np.swapaxes(guess, 0, 1), requirements='C')
+                data = np.require(
+                    np.transpose(data, self._data_trans_axes),
                     requirements='C')
-                self._pdop.model = self._model
-                self._pdop.modelgrad = self._modelgrad
-                self._pdop.jacobi = np.sum(
-                    np.abs(self._modelgrad)**2, 2).astype(self._DTYPE_real)
-                self._pdop.jacobi[self._pdop.jacobi == 0] = 1e-8
             else:
-                _jacobi = np.sum(
-                    np.abs(
-                        self._modelgrad)**2, 1).astype(self._DTYPE_real)
-                _jacobi[_jacobi == 0] = 1e-8
-                self._modelgrad = clarray.to_device(
+                result = np.copy(guess)
+                data = clarray.to_device(
                     self._queue[0],
-                    self._modelgrad)
-                self._pdop.model = self._model
-                self._pdop.modelgrad = self._modelgrad
-                self._pdop.jacobi = clarray.to_device(
-                    self._queue[0],
-                    _jacobi)
-            self._updateIRGNRegPar(ign)
-            self._pdop.updateRegPar(self.irgn_par)
-
-            result = self._irgnSolve3D(result, iters, data, ign)
-
-            iters = np.fmin(iters * 2, self.irgn_par["max_iters"])
+                    np.require(data, self._DTYPE, 'C'),
+                    allocator=self._allocator)
+                detach_allocator(data)
 
-            end = time.time() - start
-            self.gn_res.append(self._fval)
-            print("-" * 75)
-            print("GN-Iter: %d  Elapsed time: %f seconds" % (ign, end))
-            print("-" * 75)
-            self._fval_old = self._fval
-            self._saveToFile(ign, self._model.rescale(result)["data"])
-        self._calcResidual(result, data, ign+1)
+            if self._streamed and self._SMS is False:
+                self._step_val = self._model.execute_forward_sliced(
+                    self._modelLayout(result), self._model_threads)
+            else:
+                self._step_val = self._model.execute_forward(
+                    self._modelLayout(result))
+            self._step_val = np.nan_to_num(self._step_val, copy=False)
+
+            gn_end = self.irgn_par["max_gn_it"]
+            for ign in range(gn_start, self.irgn_par["max_gn_it"]):
+                start = time.time()
+                if self._model.cl_available and not self._streamed:
+                    self._modelgrad = self._model.execute_gradient_cl(
+                        clarray.to_device(self._queue[0], result,
+                                          allocator=self._allocator))
+                    self._step_val = self._model.execute_forward(result)
+                elif self._streamed:
+                    # Slab wise evaluation directly yields the slice-major
+                    # layout used by the streamed solvers.
+                    self._step_val, self._modelgrad = \
+                        self._model.execute_forward_and_gradient_sliced(
+                            self._modelLayout(result), self._model_threads)
+                    self._modelgrad = np.nan_to_num(
+                        self._modelgrad, copy=False)
+                    if self._SMS is True:
+                        self._step_val = np.require(
+                            np.swapaxes(self._step_val, 0, 1),
+                            requirements='C')
+                else:
+                    self._step_val, self._modelgrad = \
+                        self._model.execute_forward_and_gradient(result)
+                    self._modelgrad = np.nan_to_num(self._modelgrad)
+                # The signal only depends on the product of the unknowns and
+                # their scaling, thus it is not affected by the rebalancing.
+                self._step_val = np.nan_to_num(self._step_val, copy=False)
+
+                self._balanceModelGradients(result)
+
+                # if not np.mod(ign, 1):
+                #     self._pdop._grad_op.updateRatio(result)
+                #     if self._reg_type == 'TGV':
+                #         self._pdop._symgrad_op.updateRatio(
+                #             self._pdop._grad_op.ratio)
+
+                if self._streamed:
+                    self._pdop.model = self._model
+                    self._pdop.modelgrad = self._modelgrad
+                    self._pdop.jacobi = np.sum(
+                        np.abs(self._modelgrad)**2, 2).astype(self._DTYPE_real)
+                    self._pdop.jacobi[self._pdop.jacobi == 0] = 1e-8
+                elif isinstance(self._modelgrad, np.ndarray):
+                    _jacobi = np.sum(
+                        np.abs(
+                            self._modelgrad)**2, 1).astype(self._DTYPE_real)
+                    _jacobi[_jacobi == 0] = 1e-8
+                    self._modelgrad = clarray.to_device(
+                        self._queue[0],
+                        self._modelgrad,
+                        allocator=self._allocator)
+                    self._pdop.model = self._model
+                    self._pdop.modelgrad = self._modelgrad
+                    self._pdop.jacobi = clarray.to_device(
+                        self._queue[0],
+                        _jacobi,
+                        allocator=self._allocator)
+                    detach_allocator(self._modelgrad, self._pdop.jacobi)
+                else:
+                    self._pdop.model = self._model
+                    self._pdop.modelgrad = self._modelgrad
+                    self._pdop.jacobi = self._calcJacobi()
+                self._updateIRGNRegPar(ign)
+                self._pdop.updateRegPar(self.irgn_par)
+
+                result = self._irgnSolve3D(result, iters, data, ign)
+
+                end = time.time() - start
+                self.gn_res.append(self._fval)
+                if self.irgn_par.get("adaptive_iters", False):
+                    iters = self._adaptInnerIters(iters)
+                else:
+                    iters = np.fmin(iters * 2, self.irgn_par["max_iters"])
+                print("-" * 75)
+                print("GN-Iter: %d  Elapsed time: %f seconds" % (ign, end))
+                if self._allocator is not None:
+                    print("Device memory pool: %(hits)d hits, %(misses)d "
+                          "misses, %(high_water)d bytes high-water mark"
+                          % self._allocator.stats())
+                print("-" * 75)
+                self._fval_old = self._fval
+                self._saveToFile(
+                    ign,
+                    self._model.rescale(self._modelLayout(result))["data"])
+                interval = self.irgn_par.get("checkpoint_interval", 0)
+                if interval > 0 and not (ign+1) % interval:
+                    self._saveCheckpoint(ign+1, result, iters)
+                gn_dec = self._relativeGNDecrease()
+                gn_tol = self.irgn_par.get("gn_tol", 0)
+                if gn_tol > 0 and gn_dec is not None and \
+                        np.abs(gn_dec) < gn_tol:
+                    print("Terminated at GN-Iter %d because the relative "
+                          "change of the cost was %.3e which is below the "
+                          "tolerance of %.3e" % (ign, np.abs(gn_dec), gn_tol))
+                    gn_end = ign+1
+                    break
+            self._calcResidual(result, data, gn_end)
+            self._final_state = self._collectState(gn_end, result, iters)
+            self._pdop.resetWarmStart()
+            del data
+        finally:
+            self._writer.close()
+            self._writer = None
+
+    def _modelLayout(self, x):
+        if self._streamed:
+            return np.swapaxes(x, 0, 1)
+        return x
 
     def _updateIRGNRegPar(self, ign):
         try:
@@ -334,49 +469,262 @@ class IRGNOptimizer:
             self._omega * self.irgn_par["omega_dec"]**ign,
             self.irgn_par["omega_min"])
 
+    def _relativeGNDecrease(self, step=-1):
+        if len(self.gn_res) < 2 or step-1 < -len(self.gn_res):
+            return None
+        return ((self.gn_res[step-1] - self.gn_res[step])
+                / np.abs(self.gn_res[step-1]))
+
+    def _adaptInnerIters(self, iters):
+        # If the inner solver met its tolerance, the next linearization is
+        # budgeted with some headroom over the iterations actually needed.
+        # Otherwise the budget grows by up to a factor of two, scaled by the
+        # cost decrease of the last GN step relative to the first one, such
+        # that late steps with an almost unchanged linearization do not
+        # keep doubling.
+        if self._pdop.converged:
+            iters = int(np.ceil(1.5 * self._pdop.last_iters))
+        else:
+            gn_dec = self._relativeGNDecrease()
+            gn_dec_first = self._relativeGNDecrease(1-len(self.gn_res))
+            if gn_dec is None or not gn_dec_first or gn_dec_first <= 0:
+                growth = 1
+            else:
+                growth = np.clip(gn_dec / gn_dec_first, 0, 1)
+            iters = int(np.ceil(iters * (1 + growth)))
+        return int(np.clip(iters, self.irgn_par["start_iters"],
+                           self.irgn_par["max_iters"]))
+
+    def _calcJacobi(self):
+        jacobi = clarray.empty(self._queue[0],
+                               (self.par["unknowns"], self.par["NSlice"],
+                                self.par["dimY"], self.par["dimX"]),
+                               dtype=self._DTYPE_real,
+                               allocator=self._allocator)
+        detach_allocator(jacobi)
+        jacobi.add_event(
+            self._prg[0].calc_jacobi(
+                self._queue[0],
+                jacobi.shape[1:],
+                None,
+                jacobi.data,
+                self._modelgrad.data,
+                np.int32(self.par["NScan"]),
+                np.int32(self.par["unknowns"]),
+                wait_for=jacobi.events + self._modelgrad.events))
+        return jacobi
+
+    def _modelGradientNorms(self):
+        if isinstance(self._modelgrad, np.ndarray):
+            # Sum of squares of the real valued view, one contiguous row
+            # per slice (streamed) and unknown.
+            grad = self._modelgrad.view(self._DTYPE_real)
+            if self._streamed:
+                grad = np.reshape(
+                    grad, (grad.shape[0], self.par["unknowns"], -1))
+            else:
+                grad = np.reshape(grad, (1, self.par["unknowns"], -1))
+            norms = np.zeros(self.par["unknowns"])
+            for grad_slice in grad:
+                for uk, grad_uk in enumerate(grad_slice):
+                    norms[uk] += np.vdot(grad_uk, grad_uk)
+            return np.sqrt(norms)
+        norms = [self._normkrnl(self._modelgrad[uk])
+                 for uk in range(self.par["unknowns"])]
+        return np.sqrt([norm.get() for norm in norms])
+
+    def _scaleUnknowns(self, x, scale):
+        # Scales each unknown of a host array in place. The unknowns are
+        # along the second axis in the streamed layout.
+        shape = [1] * x.ndim
+        if self._streamed:
+            shape[1] = -1
+        else:
+            shape[0] = -1
+        scale = np.reshape(scale, shape).astype(self._DTYPE_real)
+        if x.flags.c_contiguous:
+            # numexpr computes single precision complex values in double
+            # precision, thus the real valued view is scaled instead.
+            x = x.view(self._DTYPE_real)
+            ne.evaluate("x*scale", out=x)
+        else:
+            x *= scale
+
     def _balanceModelGradients(self, result):
-        scale = np.reshape(
-            self._modelgrad,
-            (self.par["unknowns"],
-             self.par["NScan"] * self.par["NSlice"] *
-             self.par["dimY"] * self.par["dimX"]))
-        scale = np.linalg.norm(scale, axis=-1)
-        print("Initial Norm: ", np.linalg.norm(scale))
-        print("Initial Ratio: ", scale)
-        scale /= np.linalg.norm(scale)/np.sqrt(self.par["unknowns"])
+        # The unknowns are divided and the partial derivatives are
+        # multiplied by the change of uk_scale, which scales the norm of
+        # each partial derivative by the same factor.
+        norms = self._modelGradientNorms()
+        print("Initial Norm: ", np.linalg.norm(norms))
+        print("Initial Ratio: ", norms)
+        scale = norms / (np.linalg.norm(norms)/np.sqrt(self.par["unknowns"]))
         scale = 1 / scale
         scale[~np.isfinite(scale)] = 1
+        self._rescaleV(1 / scale)
         for uk in range(self.par["unknowns"]):
             self._model.constraints[uk].update(scale[uk])
-            result[uk, ...] *= self._model.uk_scale[uk]
-            self._modelgrad[uk] /= self._model.uk_scale[uk]
             self._model.uk_scale[uk] *= scale[uk]
-            result[uk, ...] /= self._model.uk_scale[uk]
-            self._modelgrad[uk] *= self._model.uk_scale[uk]
-        scale = np.reshape(
-            self._modelgrad,
-            (self.par["unknowns"],
-             self.par["NScan"] * self.par["NSlice"] *
-             self.par["dimY"] * self.par["dimX"]))
-        scale = np.linalg.norm(scale, axis=-1)
-        print("Norm after rescale: ", np.linalg.norm(scale))
-        print("Ratio after rescale: ", scale)
+        self._scaleUnknowns(result, 1 / scale)
+        if isinstance(self._modelgrad, np.ndarray):
+            self._scaleUnknowns(self._modelgrad, scale)
+        else:
+            scale_cl = clarray.to_device(
+                self._queue[0], scale.astype(self._DTYPE_real))
+            self._modelgrad.add_event(self._scalekrnl(
+                self._modelgrad, scale_cl,
+                np.int64(self._modelgrad.size // self.par["unknowns"]),
+                queue=self._queue[0],
+                wait_for=self._modelgrad.events + scale_cl.events))
+        norms = norms * scale
+        print("Norm after rescale: ", np.linalg.norm(norms))
+        print("Ratio after rescale: ", norms)
+
+    def _rescaleV(self, scale):
+        self._pdop.rescaleWarmStart(scale)
+        if self._v is None:
+            return
+        self._scaleUnknowns(self._v, scale)
 
 ###############################################################################
 # New .hdf5 save files ########################################################
 ###############################################################################
     def _saveToFile(self, myit, result):
-        f = h5py.File(self.par["outdir"]+"output_" + self.par["fname"] + ".h5",
-                      "a")
+        # The rescaled result is a new array, thus it can be handed over to
+        # the writer thread without copying.
+        result = np.asarray(result, dtype=self._DTYPE)
         if self._reg_type == 'TGV':
-            f.create_dataset("tgv_result_iter_"+str(myit), result.shape,
-                             dtype=self._DTYPE, data=result)
-            f.attrs['res_tgv_iter_'+str(myit)] = self._fval
+            self._writer.write("tgv_result_iter_"+str(myit), result,
+                               {'res_tgv_iter_'+str(myit): self._fval})
+        else:
+            self._writer.write("tv_result_"+str(myit), result,
+                               {'res_tv_iter_'+str(myit): self._fval})
+
+    def _collectState(self, gn_step, result, iters):
+        state = {}
+        state["x"] = self._modelLayout(result)
+        if self._v is not None:
+            state["v"] = self._modelLayout(self._v)
         else:
-            f.create_dataset("tv_result_"+str(myit), result.shape,
-                             dtype=self._DTYPE, data=result)
-            f.attrs['res_tv_iter_'+str(myit)] = self._fval
-        f.close()
+            state["v"] = None
+        state["uk_scale"] = list(self._model.uk_scale)
+        state["constraints_min"] = [
+            const.min for const in self._model.constraints]
+        state["constraints_max"] = [
+            const.max for const in self._model.constraints]
+        state["gn_res"] = np.array(self.gn_res)
+        state["gn_step"] = gn_step
+        state["iters"] = iters
+        state["fval_init"] = self._fval_init
+        state["gamma"] = self._gamma
+        state["delta"] = self._delta
+        state["omega"] = self._omega
+        state["reg_type"] = self._reg_type
+        state["irgn_par"] = dict(self.irgn_par)
+        return state
+
+    def _saveCheckpoint(self, gn_step, result, iters):
+        # The checkpoint is written by the writer thread after the results
+        # of all finished GN steps, which it claims. The unknowns are
+        # copied as the solver may reuse their memory in the next step.
+        filename = (self.par["outdir"] + "checkpoint_" +
+                    self.par["fname"])
+        state = self._collectState(gn_step, result, iters)
+        state["x"] = np.copy(state["x"])
+        if state["v"] is not None:
+            state["v"] = np.copy(state["v"])
+        self._writer.call(self._writeCheckpoint, filename, state)
+
+    @staticmethod
+    def _writeCheckpoint(filename, state):
+        with h5py.File(filename + ".tmp", "w") as f:
+            for key in ("x", "uk_scale", "constraints_min",
+                        "constraints_max", "gn_res"):
+                f.create_dataset(key, data=state[key])
+            if state["v"] is not None:
+                f.create_dataset("v", data=state["v"])
+            for key in ("gn_step", "iters", "fval_init", "gamma", "delta",
+                        "omega", "reg_type"):
+                f.attrs[key] = state[key]
+            irgn_par = f.create_group("irgn_par")
+            for key, value in state["irgn_par"].items():
+                irgn_par.attrs[key] = value
+        os.replace(filename + ".tmp", filename)
+
+    def getState(self):
+        """Return the state at the end of the last fit.
+
+        Returns
+        -------
+          dict:
+            The state in the format accepted by restoreState or None if
+            no fit has finished yet.
+        """
+        return self._final_state
+
+    def loadCheckpoint(self, filename):
+        """Load a checkpoint written during a previous fit.
+
+        Parameters
+        ----------
+          filename : str
+            Path to the checkpoint file.
+        """
+        state = {}
+        with h5py.File(filename, "r") as f:
+            for key in ("x", "uk_scale", "constraints_min",
+                        "constraints_max", "gn_res"):
+                state[key] = f[key][()]
+            state["v"] = f["v"][()] if "v" in f else None
+            for key in f.attrs:
+                state[key] = f.attrs[key]
+            state["irgn_par"] = {}
+            for key, value in f["irgn_par"].attrs.items():
+                if isinstance(value, np.generic):
+                    value = value.item()
+                state["irgn_par"][key] = value
+        self.restoreState(state)
+
+    def restoreState(self, state):
+        """Restore the state of a previous fit.
+
+        The next call to execute continues with the Gauss-Newton step
+        following the stored one.
+
+        Parameters
+        ----------
+          state : dict
+            The state as stored by the checkpoints. Holds the unscaled
+            unknowns (x), the TGV variable (v), the scaling of the unknowns
+            (uk_scale), the constraint bounds (constraints_min,
+            constraints_max), the IRGN parameters (irgn_par), the residuals
+            (gn_res), the next Gauss-Newton step (gn_step), the number of
+            inner iterations (iters), the initial cost (fval_init) and the
+            initial weights gamma, delta and omega. If fval_init is None,
+            the initial cost is taken from the first continued step.
+        """
+        if state["reg_type"] != self._reg_type:
+            raise ValueError(
+                "State was saved for %s but %s regularization is used."
+                % (state["reg_type"], self._reg_type))
+        if state["x"].shape != self._model.guess.shape:
+            raise ValueError(
+                "State of shape %s does not match the unknowns of shape %s."
+                % (state["x"].shape, self._model.guess.shape))
+        self._model.uk_scale = [scale for scale in state["uk_scale"]]
+        for const, min_val, max_val in zip(self._model.constraints,
+                                           state["constraints_min"],
+                                           state["constraints_max"]):
+            const.min = min_val
+            const.max = max_val
+        self.irgn_par.update(state["irgn_par"])
+        self.gn_res = list(state["gn_res"])
+        if state["v"] is not None:
+            if self._streamed:
+                self._v = np.require(
+                    np.swapaxes(state["v"], 0, 1), self._DTYPE, 'C')
+            else:
+                self._v = np.require(state["v"], self._DTYPE, 'C')
+        self._resume_state = state
 
 ###############################################################################
 # Precompute constant terms of the GN linearization step ######################
@@ -391,14 +739,14 @@ class IRGNOptimizer:
         b = self._calcResidual(x, data, GN_it)
 
         if self._streamed:
-            x = np.require(np.swapaxes(x, 0, 1), requirements='C')
             res = data - b + self._MRI_operator.fwdoop(
                 [[x, self._coils, self._modelgrad]])
         else:
-            tmpx = clarray.to_device(self._queue[0], x)
-            res = data - b + self._MRI_operator.fwdoop(
-                [tmpx, self._coils, self._modelgrad]).get()
-            del tmpx
+            tmpx = clarray.to_device(self._queue[0], x,
+                                     allocator=self._allocator)
+            res = (data - b + self._MRI_operator.fwdoop(
+                [tmpx, self._coils, self._modelgrad])).get()
+            del tmpx, b
         tmpres = self._pdop.run(x, res, iters)
         for key in tmpres:
             if key == 'x':
@@ -408,45 +756,30 @@ class IRGNOptimizer:
                     x = tmpres["x"].get()
             if key == 'v':
                 if isinstance(tmpres[key], np.ndarray):
-                    self._v = tmpres["v"]
+                    if self._pdop.warmstart:
+                        # Keep the warm start buffer of the solver untouched
+                        self._v = np.copy(tmpres["v"])
+                    else:
+                        self._v = tmpres["v"]
                 else:
                     self._v = tmpres["v"].get()
-        if self._streamed:
-            x = np.require(np.swapaxes(x, 0, 1), requirements='C')
 
         return x
 
     def _calcResidual(self, x, data, GN_it):
         if self._streamed:
-            b, grad, sym_grad = self._calcFwdGNPartStreamed(x)
-            grad_tv = grad[:, :self.par["unknowns_TGV"]]
-            grad_H1 = grad[:, self.par["unknowns_TGV"]:]
+            b, datacost, regcost, L2Cost, H1Cost = self._calcCostsStreamed(
+                x, data)
         else:
-            b, grad, sym_grad = self._calcFwdGNPartLinear(x)
-            grad_tv = grad[:self.par["unknowns_TGV"]]
-            grad_H1 = grad[self.par["unknowns_TGV"]:]
-        del grad
-
-        datacost = self.irgn_par["lambd"] / 2 * np.linalg.norm(data - b)**2
-        L2Cost = np.linalg.norm(x)/(2.0*self.irgn_par["delta"])
-        if self._reg_type == 'TV':
-            regcost = self.irgn_par["gamma"] * \
-                np.sum(np.abs(grad_tv))
-        else:
-            regcost = self.irgn_par["gamma"] * np.sum(
-                  np.abs(grad_tv -
-                         self._v)) + self.irgn_par["gamma"] * 2 * np.sum(
-                             np.abs(sym_grad))
-            del sym_grad
+            b, datacost, regcost, L2Cost, H1Cost = self._calcCostsLinear(
+                x, data)
 
         self._fval = (datacost +
                       regcost +
                       L2Cost +
-                      self.irgn_par["omega"] / 2 *
-                      np.linalg.norm(grad_H1)**2)
-        del grad_tv, grad_H1
+                      H1Cost)
 
-        if GN_it == 0:
+        if GN_it == 0 or not self._fval_init:
             self._fval_init = self._fval
             self._pdop.setFvalInit(self._fval)
 
@@ -461,48 +794,91 @@ class IRGNOptimizer:
         print("-" * 75)
         return b
 
+    def _calcCostsStreamed(self, x, data):
+        b, grad, sym_grad = self._calcFwdGNPartStreamed(x)
+        grad_tv = grad[:, :self.par["unknowns_TGV"]]
+        grad_H1 = grad[:, self.par["unknowns_TGV"]:]
+        del grad
+
+        datacost = self.irgn_par["lambd"] / 2 * np.linalg.norm(data - b)**2
+        L2Cost = np.linalg.norm(x)/(2.0*self.irgn_par["delta"])
+        if self._reg_type == 'TV':
+            regcost = self.irgn_par["gamma"] * \
+                np.sum(np.abs(grad_tv))
+        else:
+            regcost = self.irgn_par["gamma"] * np.sum(
+                  np.abs(grad_tv -
+                         self._v)) + self.irgn_par["gamma"] * 2 * np.sum(
+                             np.abs(sym_grad))
+            del sym_grad
+        H1Cost = self.irgn_par["omega"] / 2 * np.linalg.norm(grad_H1)**2
+        del grad_tv, grad_H1
+        return b, datacost, regcost, L2Cost, H1Cost
+
+    def _calcCostsLinear(self, x, data):
+        b, x, grad, sym_grad, v = self._calcFwdGNPartLinear(x)
+        grad_tv = grad[:self.par["unknowns_TGV"]]
+
+        datacost = self.irgn_par["lambd"] / 2 * self._normkrnldiff(
+            data, b).get()
+        L2Cost = np.sqrt(self._normkrnl(x).get())/(2.0*self.irgn_par["delta"])
+        if self._reg_type == 'TV':
+            regcost = self.irgn_par["gamma"] * self._abskrnl(grad_tv).get()
+        else:
+            regcost = self.irgn_par["gamma"] * self._abskrnldiff(
+                grad_tv, v[:self.par["unknowns_TGV"]]).get() + \
+                self.irgn_par["gamma"] * 2 * self._abskrnl(sym_grad).get()
+        if self.par["unknowns_H1"] > 0:
+            H1Cost = self.irgn_par["omega"] / 2 * self._normkrnl(
+                grad[self.par["unknowns_TGV"]:]).get()
+        else:
+            H1Cost = 0
+        del grad, sym_grad, v
+        return b, datacost, regcost, L2Cost, H1Cost
+
     def _calcFwdGNPartLinear(self, x):
         if self._imagespace is False:
             b = clarray.empty(self._queue[0],
                               self._data_shape,
-                              dtype=self._DTYPE)
+                              dtype=self._DTYPE,
+                              allocator=self._allocator)
             self._FT.FFT(b, clarray.to_device(
                 self._queue[0],
                 (self._step_val[:, None, ...] *
-                 self.par["C"]))).wait()
-            b = b.get()
+                 self.par["C"]),
+                allocator=self._allocator)).wait()
         else:
-            b = self._step_val
+            b = clarray.to_device(self._queue[0], self._step_val,
+                                  allocator=self._allocator)
 
-        x = clarray.to_device(self._queue[0], np.require(x, requirements="C"))
-        grad = clarray.to_device(self._queue[0],
-                                 np.zeros(x.shape+(4,), dtype=self._DTYPE))
+        x = clarray.to_device(self._queue[0], np.require(x, requirements="C"),
+                              allocator=self._allocator)
+        grad = clarray.zeros(self._queue[0], x.shape+(4,), dtype=self._DTYPE,
+                             allocator=self._allocator)
         grad.add_event(
             self._grad_op.fwd(
                 grad,
                 x,
                 wait_for=grad.events +
                 x.events))
-        x = x.get()
-        grad = grad.get()
         sym_grad = None
+        v = None
         if self._reg_type == 'TGV':
-            v = clarray.to_device(self._queue[0], self._v)
-            sym_grad = clarray.to_device(self._queue[0],
-                                         np.zeros(x.shape+(8,),
-                                                  dtype=self._DTYPE))
+            v = clarray.to_device(self._queue[0], self._v,
+                                  allocator=self._allocator)
+            sym_grad = clarray.zeros(self._queue[0], x.shape+(8,),
+                                     dtype=self._DTYPE,
+                                     allocator=self._allocator)
             sym_grad.add_event(
                 self._symgrad_op.fwd(
                     sym_grad,
                     v,
                     wait_for=sym_grad.events +
                     v.events))
-            sym_grad = sym_grad.get()
 
-        return b, grad, sym_grad
+        return b, x, grad, sym_grad, v
 
     def _calcFwdGNPartStreamed(self, x):
-        x = np.require(np.swapaxes(x, 0, 1), requirements='C')
         if self._imagespace is False:
             b = np.zeros(self._data_shape_T, dtype=self._DTYPE)
             if self._SMS is True:
@@ -1232,3 +1232,37 @@ __kernel void operator_ad_cg(
         out[scan*NSl*X*Y+k*X*Y+y*X+x] = sum;
     }
 }
+
+
+__kernel void calc_jacobi(
+                __global double *jacobi,
+                __global double2 *grad,
+                const int NScan,
+                const int Nuk
+                )
+{
+    size_t X = get_global_size(2);
+    size_t Y = get_global_size(1);
+    size_t NSl = get_global_size(0);
+    size_t x = get_global_id(2);
+    size_t y = get_global_id(1);
+    size_t k = get_global_id(0);
+
+    double2 tmp_grad = 0.0;
+
+    for (int uk=0; uk<Nuk; uk++)
+    {
+        double sum = 0.0;
+        for (int scan=0; scan<NScan; scan++)
+        {
+            tmp_grad = grad[
+                uk*NScan*NSl*X*Y+scan*NSl*X*Y + k*X*Y + y*X + x];
+            sum += tmp_grad.x*tmp_grad.x+tmp_grad.y*tmp_grad.y;
+        }
+        if (sum == 0.0)
+        {
+            sum = 1e-8;
+        }
+        jacobi[uk*NSl*X*Y + k*X*Y + y*X + x] = sum;
+    }
+}
@@ -0,0 +1,74 @@
+inline float2 cmul(float2 a, float2 b)
+{
+    return (float2)(a.x*b.x-a.y*b.y, a.x*b.y+a.y*b.x);
+}
+
+
+inline float2 cdiv(float2 a, float2 b)
+{
+    float denom = b.x*b.x+b.y*b.y;
+    return (float2)((a.x*b.x+a.y*b.y)/denom, (a.y*b.x-a.x*b.y)/denom);
+}
+
+
+inline int cisfinite(float2 a)
+{
+    return ((as_uint(a.x) & 0x7f800000) != 0x7f800000)
+           && ((as_uint(a.y) & 0x7f800000) != 0x7f800000);
+}
+
+
+__kernel void vfa_grad(
+                __global float2 *grad,
+                __global float2 *in,
+                __global float2 *sin_phi,
+                __global float2 *cos_phi,
+                const int NScan,
+                const float sc_M0,
+                const float sc_E1
+                )
+{
+    size_t X = get_global_size(2);
+    size_t Y = get_global_size(1);
+    size_t NSl = get_global_size(0);
+    size_t x = get_global_id(2);
+    size_t y = get_global_id(1);
+    size_t k = get_global_id(0);
+
+    float2 M0 = in[k*X*Y + y*X + x];
+    float2 E1 = in[NSl*X*Y + k*X*Y + y*X + x]*sc_E1;
+    if (!cisfinite(E1))
+    {
+        E1 = 0.0f;
+    }
+    float2 one_E1 = (float2)(1.0f, 0.0f) - E1;
+    float2 tmp_sin = 0.0f;
+    float2 tmp_cos = 0.0f;
+    float2 denom = 0.0f;
+    float2 grad_M0 = 0.0f;
+    float2 grad_T1 = 0.0f;
+
+    for (int scan=0; scan<NScan; scan++)
+    {
+        tmp_sin = sin_phi[scan*NSl*X*Y + k*X*Y + y*X + x];
+        tmp_cos = cos_phi[scan*NSl*X*Y + k*X*Y + y*X + x];
+        denom = (float2)(1.0f, 0.0f) - cmul(E1, tmp_cos);
+
+        grad_M0 = sc_M0*cdiv(cmul(one_E1, tmp_sin), denom);
+        grad_T1 = sc_M0*sc_E1*cmul(
+            M0,
+            cdiv(cmul(one_E1, cmul(tmp_sin, tmp_cos)), cmul(denom, denom))
+            - cdiv(tmp_sin, denom));
+
+        if (!cisfinite(grad_M0))
+        {
+            grad_M0 = (float2)(1e-20f, 0.0f);
+        }
+        if (!cisfinite(grad_T1))
+        {
+            grad_T1 = (float2)(1e-20f, 0.0f);
+        }
+        grad[scan*NSl*X*Y + k*X*Y + y*X + x] = grad_M0;
+        grad[NScan*NSl*X*Y + scan*NSl*X*Y + k*X*Y + y*X + x] = grad_T1;
+    }
+}
@@ -0,0 +1,76 @@
+#pragma OPENCL EXTENSION cl_khr_fp64: enable
+
+inline double2 cmul(double2 a, double2 b)
+{
+    return (double2)(a.x*b.x-a.y*b.y, a.x*b.y+a.y*b.x);
+}
+
+
+inline double2 cdiv(double2 a, double2 b)
+{
+    double denom = b.x*b.x+b.y*b.y;
+    return (double2)((a.x*b.x+a.y*b.y)/denom, (a.y*b.x-a.x*b.y)/denom);
+}
+
+
+inline int cisfinite(double2 a)
+{
+    return ((as_ulong(a.x) & 0x7ff0000000000000UL) != 0x7ff0000000000000UL)
+           && ((as_ulong(a.y) & 0x7ff0000000000000UL) != 0x7ff0000000000000UL);
+}
+
+
+__kernel void vfa_grad(
+                __global double2 *grad,
+                __global double2 *in,
+                __global double2 *sin_phi,
+                __global double2 *cos_phi,
+                const int NScan,
+                const double sc_M0,
+                const double sc_E1
+                )
+{
+    size_t X = get_global_size(2);
+    size_t Y = get_global_size(1);
+    size_t NSl = get_global_size(0);
+    size_t x = get_global_id(2);
+    size_t y = get_global_id(1);
+    size_t k = get_global_id(0);
+
+    double2 M0 = in[k*X*Y + y*X + x];
+    double2 E1 = in[NSl*X*Y + k*X*Y + y*X + x]*sc_E1;
+    if (!cisfinite(E1))
+    {
+        E1 = 0.0;
+    }
+    double2 one_E1 = (double2)(1.0, 0.0) - E1;
+    double2 tmp_sin = 0.0;
+    double2 tmp_cos = 0.0;
+    double2 denom = 0.0;
+    double2 grad_M0 = 0.0;
+    double2 grad_T1 = 0.0;
+
+    for (int scan=0; scan<NScan; scan++)
+    {
+        tmp_sin = sin_phi[scan*NSl*X*Y + k*X*Y + y*X + x];
+        tmp_cos = cos_phi[scan*NSl*X*Y + k*X*Y + y*X + x];
+        denom = (double2)(1.0, 0.0) - cmul(E1, tmp_cos);
+
+        grad_M0 = sc_M0*cdiv(cmul(one_E1, tmp_sin), denom);
+        grad_T1 = sc_M0*sc_E1*cmul(
+            M0,
+            cdiv(cmul(one_E1, cmul(tmp_sin, tmp_cos)), cmul(denom, denom))
+            - cdiv(tmp_sin, denom));
+
+        if (!cisfinite(grad_M0))
+        {
+            grad_M0 = (double2)(1e-20, 0.0);
+        }
+        if (!cisfinite(grad_T1))
+        {
+            grad_T1 = (double2)(1e-20, 0.0);
+        }
+        grad[scan*NSl*X*Y + k*X*Y + y*X + x] = grad_M0;
+        grad[NScan*NSl*X*Y + scan*NSl*X*Y + k*X*Y + y*X + x] = grad_T1;
+    }
+}
@@ -41,7 +41,8 @@ __kernel void deapo_adj(
                 __constant double *deapo,
                 const int dim,
                 const double scale,
-                const double ogf
+                const double ogf,
+                const int shift
                 )
 {
     size_t x = get_global_id(2);
@@ -55,7 +56,10 @@ __kernel void deapo_adj(
     size_t n = y+(int)(dim-Y)/2;
     size_t N = dim;
 
-    out[k*X*Y+y*X+x] = in[k*N*M+n*M+m] * deapo[y]* deapo[x] * scale;
+    // Checkerboard modulation of the centered FFT.
+    double sign = (shift && (m+n)%2) ? -1.0 : 1.0;
+
+    out[k*X*Y+y*X+x] = in[k*N*M+n*M+m] * deapo[y]* deapo[x] * scale * sign;
 }
 
 
@@ -63,24 +67,33 @@ __kernel void deapo_fwd(
                 __global double2 *out,
                 __global double2 *in,
                 __constant double *deapo,
-                const int dim,
+                const int dimX,
+                const int dimY,
                 const double scale,
-                const double ogf
+                const double ogf,
+                const int shift
                 )
 {
-    size_t x = get_global_id(2);
-    size_t X = get_global_size(2);
-    size_t y = get_global_id(1);
-    size_t Y = get_global_size(1);
+    size_t m = get_global_id(2);
+    size_t M = get_global_size(2);
+    size_t n = get_global_id(1);
+    size_t N = get_global_size(1);
     size_t k = get_global_id(0);
 
-    size_t m = x+(int)(dim-X)/2;
-    size_t M = dim;
-    size_t n = y+(int)(dim-Y)/2;
-    size_t N = dim;
+    int x = (int)m-(int)(M-dimX)/2;
+    int y = (int)n-(int)(N-dimY)/2;
 
+    // The padded border is zeroed here, thus no separate pass is needed.
+    if (x < 0 || x >= dimX || y < 0 || y >= dimY)
+    {
+        out[k*N*M+n*M+m] = 0.0;
+        return;
+    }
+    // Checkerboard modulation of the centered FFT.
+    double sign = (shift && (m+n)%2) ? -1.0 : 1.0;
 
-    out[k*N*M+n*M+m] = in[k*X*Y+y*X+x] * deapo[y]* deapo[x] * scale;
+    out[k*N*M+n*M+m] = in[k*dimX*dimY+y*dimX+x] * deapo[y]* deapo[x] * scale
+                       * sign;
 }
 
 __kernel void zero_tmp(__global double2 *tmp)
@@ -90,6 +103,25 @@ __kernel void zero_tmp(__global double2 *tmp)
     tmp[x] = 0.0f;
 }
 
+__kernel void toeplitz_psf(
+                __global double2 *grid,
+                __global double2 *psf,
+                const int nbatch,
+                const int scanoffset
+                )
+{
+    size_t x = get_global_id(2);
+    size_t X = get_global_size(2);
+    size_t y = get_global_id(1);
+    size_t Y = get_global_size(1);
+    size_t k = get_global_id(0);
+
+    double2 g = grid[k*X*Y+y*X+x];
+    double2 p = psf[(k/nbatch+scanoffset)*X*Y+y*X+x];
+
+    grid[k*X*Y+y*X+x] = (double2)(g.x*p.x-g.y*p.y, g.x*p.y+g.y*p.x);
+}
+
 __kernel void grid_lut(
                 __global double *sg,
                 __global double2 *s,
@@ -146,6 +178,11 @@ __kernel void grid_lut(
                 if (gcount1 >= gridsize) {indx-=gridsize;indy=gridsize-indy;}
                 if (gcount2 < 0) {indy+=gridsize;indx=gridsize-indx;}
                 if (gcount2 >= gridsize) {indy-=gridsize;indx=gridsize-indx;}
+                // Wrapped taps outside of the grid are skipped.
+                if (indx*gridsize+indy < 0 ||
+                    indx*gridsize+indy >= gridsize*gridsize) {continue;}
+                // Checkerboard modulation of the centered FFT.
+                if ((indx+indy)%2) {kern = -kern;}
 
                 AtomicAdd(
     &(
@@ -227,6 +264,11 @@ __kernel void invgrid_lut(
                 if (gcount1 >= gridsize) {indx-=gridsize;indy=gridsize-indy;}
                 if (gcount2 < 0) {indy+=gridsize;indx=gridsize-indx;}
                 if (gcount2 >= gridsize) {indy-=gridsize;indx=gridsize-indx;}
+                // Wrapped taps outside of the grid are skipped.
+                if (indx*gridsize+indy < 0 ||
+                    indx*gridsize+indy >= gridsize*gridsize) {continue;}
+                // Checkerboard modulation of the centered FFT.
+                if ((indx+indy)%2) {kern = -kern;}
 
                 tmp_dat += (double2)(kern,kern)*sg[
                                         indx*gridsize+indy
@@ -239,6 +281,142 @@ __kernel void invgrid_lut(
 }
 
 
+__kernel void grid_binned(
+                __global double2 *sg,
+                __global double2 *s,
+                __global double2 *kpos,
+                __global int *tileptr,
+                __global int *sampleind,
+                const int gridsize,
+                const int kDim,
+                const double kwidth,
+                __global double *dcf,
+                __constant double* kerneltable,
+                const int nkernelpts,
+                const int tilesize,
+                const int scanoffset
+                )
+{
+    size_t g = get_global_id(2);
+    size_t gDim = get_global_size(2);
+    size_t n = get_global_id(1);
+    size_t NDim = get_global_size(1);
+    size_t scan = get_global_id(0);
+
+    int ntiles = (gridsize+tilesize-1)/tilesize;
+    size_t tile = (scan+scanoffset)*ntiles*ntiles
+                  + (g/gridsize/tilesize)*ntiles + (g%gridsize)/tilesize;
+    int gridcenter = gridsize/2;
+
+    int ixmin, ixmax, iymin, iymax, indx, indy, kernelind, k;
+    double kx, ky;
+    double fracind, dkx, dky, dk, fracdk, kern;
+    double2 tmp_dat = 0.0;
+
+    for (int j = tileptr[tile]; j < tileptr[tile+1]; j++)
+    {
+        k = sampleind[j];
+        kx = (kpos[k+kDim*(scan+scanoffset)]).s0;
+        ky = (kpos[k+kDim*(scan+scanoffset)]).s1;
+
+        ixmin =  (int)((kx-kwidth)*gridsize +gridcenter);
+        ixmax = (int)((kx+kwidth)*gridsize +gridcenter)+1;
+        iymin = (int)((ky-kwidth)*gridsize +gridcenter);
+        iymax =  (int)((ky+kwidth)*gridsize +gridcenter)+1;
+
+        double2 kdat = s[k+kDim*n+kDim*NDim*scan]*(double2)(dcf[k],dcf[k]);
+
+        // Replay the taps of grid_lut, including the wrapping around the
+        // grid border, and gather those written to this grid point.
+        for (int gcount1 = ixmin; gcount1 <= ixmax; gcount1++)
+        {
+            for (int gcount2 = iymin; gcount2 <= iymax; gcount2++)
+            {
+                indx = gcount1;
+                indy = gcount2;
+
+                if (gcount1 < 0) {indx+=gridsize;indy=gridsize-indy;}
+                if (gcount1 >= gridsize) {indx-=gridsize;indy=gridsize-indy;}
+                if (gcount2 < 0) {indy+=gridsize;indx=gridsize-indx;}
+                if (gcount2 >= gridsize) {indy-=gridsize;indx=gridsize-indx;}
+                if (indx*gridsize+indy != g) {continue;}
+
+                dkx = (double)(gcount1-gridcenter) / (double)gridsize - kx;
+                dky = (double)(gcount2-gridcenter) / (double)gridsize - ky;
+                dk = sqrt(dkx*dkx+dky*dky);
+                if (dk < kwidth)
+                {
+                    fracind = dk/kwidth*(double)(nkernelpts-1);
+                    kernelind = (int)fracind;
+                    fracdk = fracind-(double)kernelind;
+
+                    kern = kerneltable[kernelind]*(1-fracdk)+
+                    kerneltable[kernelind+1]*fracdk;
+                    // Checkerboard modulation of the centered FFT.
+                    if ((indx+indy)%2) {kern = -kern;}
+                    tmp_dat += kern*kdat;
+                }
+            }
+        }
+    }
+    sg[g+gDim*n+gDim*NDim*scan] = tmp_dat;
+}
+
+
+__kernel void grid_csc(
+                __global double2 *sg,
+                __global double2 *s,
+                __global int *colptr,
+                __global int *rowind,
+                __global double *val,
+                const int nsamples,
+                const int scanoffset
+                )
+{
+    size_t g = get_global_id(2);
+    size_t gDim = get_global_size(2);
+    size_t n = get_global_id(1);
+    size_t NDim = get_global_size(1);
+    size_t scan = get_global_id(0);
+
+    size_t col = (scan+scanoffset)*gDim + g;
+    double2 tmp_dat = 0.0;
+
+    for (int j = colptr[col]; j < colptr[col+1]; j++)
+    {
+        tmp_dat += val[j]*s[rowind[j] + nsamples*n + nsamples*NDim*scan];
+    }
+    sg[g+gDim*n+gDim*NDim*scan] = tmp_dat;
+}
+
+
+__kernel void invgrid_csr(
+                __global double2 *s,
+                __global double2 *sg,
+                __global int *rowptr,
+                __global int *colind,
+                __global double *val,
+                const int gridpoints,
+                const int scanoffset
+                )
+{
+    size_t k = get_global_id(2);
+    size_t kDim = get_global_size(2);
+    size_t n = get_global_id(1);
+    size_t NDim = get_global_size(1);
+    size_t scan = get_global_id(0);
+
+    size_t row = (scan+scanoffset)*kDim + k;
+    double2 tmp_dat = 0.0;
+
+    for (int j = rowptr[row]; j < rowptr[row+1]; j++)
+    {
+        tmp_dat += val[j]*sg[colind[j] + gridpoints*n + gridpoints*NDim*scan];
+    }
+    s[k+kDim*n+kDim*NDim*scan] = tmp_dat;
+}
+
+
 __kernel void copy(
                 __global double2 *out,
                 __global double2 *in,
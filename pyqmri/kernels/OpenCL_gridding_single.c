@@ -36,7 +36,8 @@ __kernel void deapo_adj(
                 __constant float *deapo,
                 const int dim,
                 const float scale,
-                const float ogf
+                const float ogf,
+                const int shift
                 )
 {
     size_t x = get_global_id(2);
@@ -50,7 +51,10 @@ __kernel void deapo_adj(
     size_t n = y+(int)(dim-Y)/2;
     size_t N = dim;
 
-    out[k*X*Y+y*X+x] = in[k*N*M+n*M+m] * deapo[y]* deapo[x] * scale;
+    // Checkerboard modulation of the centered FFT.
+    float sign = (shift && (m+n)%2) ? -1.0f : 1.0f;
+
+    out[k*X*Y+y*X+x] = in[k*N*M+n*M+m] * deapo[y]* deapo[x] * scale * sign;
 }
 
 
@@ -58,24 +62,33 @@ __kernel void deapo_fwd(
                 __global float2 *out,
                 __global float2 *in,
                 __constant float *deapo,
-                const int dim,
+                const int dimX,
+                const int dimY,
                 const float scale,
-                const float ogf
+                const float ogf,
+                const int shift
                 )
 {
-    size_t x = get_global_id(2);
-    size_t X = get_global_size(2);
-    size_t y = get_global_id(1);
-    size_t Y = get_global_size(1);
+    size_t m = get_global_id(2);
+    size_t M = get_global_size(2);
+    size_t n = get_global_id(1);
+    size_t N = get_global_size(1);
     size_t k = get_global_id(0);
 
-    size_t m = x+(int)(dim-X)/2;
-    size_t M = dim;
-    size_t n = y+(int)(dim-Y)/2;
-    size_t N = dim;
+    int x = (int)m-(int)(M-dimX)/2;
+    int y = (int)n-(int)(N-dimY)/2;
 
+    // The padded border is zeroed here, thus no separate pass is needed.
+    if (x < 0 || x >= dimX || y < 0 || y >= dimY)
+    {
+        out[k*N*M+n*M+m] = 0.0f;
+        return;
+    }
+    // Checkerboard modulation of the centered FFT.
+    float sign = (shift && (m+n)%2) ? -1.0f : 1.0f;
 
-    out[k*N*M+n*M+m] = in[k*X*Y+y*X+x] * deapo[y]* deapo[x] * scale;
+    out[k*N*M+n*M+m] = in[k*dimX*dimY+y*dimX+x] * deapo[y]* deapo[x] * scale
+                       * sign;
 }
 
 __kernel void zero_tmp(__global float2 *tmp)
@@ -85,6 +98,25 @@ __kernel void zero_tmp(__global float2 *tmp)
     tmp[x] = 0.0f;
 }
 
+__kernel void toeplitz_psf(
+                __global float2 *grid,
+                __global float2 *psf,
+                const int nbatch,
+                const int scanoffset
+                )
+{
+    size_t x = get_global_id(2);
+    size_t X = get_global_size(2);
+    size_t y = get_global_id(1);
+    size_t Y = get_global_size(1);
+    size_t k = get_global_id(0);
+
+    float2 g = grid[k*X*Y+y*X+x];
+    float2 p = psf[(k/nbatch+scanoffset)*X*Y+y*X+x];
+
+    grid[k*X*Y+y*X+x] = (float2)(g.x*p.x-g.y*p.y, g.x*p.y+g.y*p.x);
+}
+
 __kernel void grid_lut(
                 __global float *sg,
                 __global float2 *s,
@@ -141,6 +173,11 @@ __kernel void grid_lut(
                 if (gcount1 >= gridsize) {indx-=gridsize;indy=gridsize-indy;}
                 if (gcount2 < 0) {indy+=gridsize;indx=gridsize-indx;}
                 if (gcount2 >= gridsize) {indy-=gridsize;indx=gridsize-indx;}
+                // Wrapped taps outside of the grid are skipped.
+                if (indx*gridsize+indy < 0 ||
+                    indx*gridsize+indy >= gridsize*gridsize) {continue;}
+                // Checkerboard modulation of the centered FFT.
+                if ((indx+indy)%2) {kern = -kern;}
 
                 AtomicAdd(
     &(
@@ -222,6 +259,11 @@ __kernel void invgrid_lut(
                 if (gcount1 >= gridsize) {indx-=gridsize;indy=gridsize-indy;}
                 if (gcount2 < 0) {indy+=gridsize;indx=gridsize-indx;}
                 if (gcount2 >= gridsize) {indy-=gridsize;indx=gridsize-indx;}
+                // Wrapped taps outside of the grid are skipped.
+                if (indx*gridsize+indy < 0 ||
+                    indx*gridsize+indy >= gridsize*gridsize) {continue;}
+                // Checkerboard modulation of the centered FFT.
+                if ((indx+indy)%2) {kern = -kern;}
 
                 tmp_dat += (float2)(kern,kern)*sg[
                                         indx*gridsize+indy
@@ -234,6 +276,142 @@ __kernel void invgrid_lut(
 }
 
 
+__kernel void grid_binned(
+                __global float2 *sg,
+                __global float2 *s,
+                __global float2 *kpos,
+                __global int *tileptr,
+                __global int *sampleind,
+                const int gridsize,
+                const int kDim,
+                const float kwidth,
+                __global float *dcf,
+                __constant float* kerneltable,
+                const int nkernelpts,
+                const int tilesize,
+                const int scanoffset
+                )
+{
+    size_t g = get_global_id(2);
+    size_t gDim = get_global_size(2);
+    size_t n = get_global_id(1);
+    size_t NDim = get_global_size(1);
+    size_t scan = get_global_id(0);
+
+    int ntiles = (gridsize+tilesize-1)/tilesize;
+    size_t tile = (scan+scanoffset)*ntiles*ntiles
+                  + (g/gridsize/tilesize)*ntiles + (g%gridsize)/tilesize;
+    int gridcenter = gridsize/2;
+
+    int ixmin, ixmax, iymin, iymax, indx, indy, kernelind, k;
+    float kx, ky;
+    float fracind, dkx, dky, dk, fracdk, kern;
+    float2 tmp_dat = 0.0f;
+
+    for (int j = tileptr[tile]; j < tileptr[tile+1]; j++)
+    {
+        k = sampleind[j];
+        kx = (kpos[k+kDim*(scan+scanoffset)]).s0;
+        ky = (kpos[k+kDim*(scan+scanoffset)]).s1;
+
+        ixmin =  (int)((kx-kwidth)*gridsize +gridcenter);
+        ixmax = (int)((kx+kwidth)*gridsize +gridcenter)+1;
+        iymin = (int)((ky-kwidth)*gridsize +gridcenter);
+        iymax =  (int)((ky+kwidth)*gridsize +gridcenter)+1;
+
+        float2 kdat = s[k+kDim*n+kDim*NDim*scan]*(float2)(dcf[k],dcf[k]);
+
+        // Replay the taps of grid_lut, including the wrapping around the
+        // grid border, and gather those written to this grid point.
+        for (int gcount1 = ixmin; gcount1 <= ixmax; gcount1++)
+        {
+            for (int gcount2 = iymin; gcount2 <= iymax; gcount2++)
+            {
+                indx = gcount1;
+                indy = gcount2;
+
+                if (gcount1 < 0) {indx+=gridsize;indy=gridsize-indy;}
+                if (gcount1 >= gridsize) {indx-=gridsize;indy=gridsize-indy;}
+                if (gcount2 < 0) {indy+=gridsize;indx=gridsize-indx;}
+                if (gcount2 >= gridsize) {indy-=gridsize;indx=gridsize-indx;}
+                if (indx*gridsize+indy != g) {continue;}
+
+                dkx = (float)(gcount1-gridcenter) / (float)gridsize - kx;
+                dky = (float)(gcount2-gridcenter) / (float)gridsize - ky;
+                dk = sqrt(dkx*dkx+dky*dky);
+                if (dk < kwidth)
+                {
+                    fracind = dk/kwidth*(float)(nkernelpts-1);
+                    kernelind = (int)fracind;
+                    fracdk = fracind-(float)kernelind;
+
+                    kern = kerneltable[kernelind]*(1-fracdk)+
+                    kerneltable[kernelind+1]*fracdk;
+                    // Checkerboard modulation of the centered FFT.
+                    if ((indx+indy)%2) {kern = -kern;}
+                    tmp_dat += kern*kdat;
+                }
+            }
+        }
+    }
+    sg[g+gDim*n+gDim*NDim*scan] = tmp_dat;
+}
+
+
+__kernel void grid_csc(
+                __global float2 *sg,
+                __global float2 *s,
+                __global int *colptr,
+                __global int *rowind,
+                __global float *val,
+                const int nsamples,
+                const int scanoffset
+                )
+{
+    size_t g = get_global_id(2);
+    size_t gDim = get_global_size(2);
+    size_t n = get_global_id(1);
+    size_t NDim = get_global_size(1);
+    size_t scan = get_global_id(0);
+
+    size_t col = (scan+scanoffset)*gDim + g;
+    float2 tmp_dat = 0.0f;
+
+    for (int j = colptr[col]; j < colptr[col+1]; j++)
+    {
+        tmp_dat += val[j]*s[rowind[j] + nsamples*n + nsamples*NDim*scan];
+    }
+    sg[g+gDim*n+gDim*NDim*scan] = tmp_dat;
+}
+
+
+__kernel void invgrid_csr(
+                __global float2 *s,
+                __global float2 *sg,
+                __global int *rowptr,
+                __global int *colind,
+                __global float *val,
+                const int gridpoints,
+                const int scanoffset
+                )
+{
+    size_t k = get_global_id(2);
+    size_t kDim = get_global_size(2);
+    size_t n = get_global_id(1);
+    size_t NDim = get_global_size(1);
+    size_t scan = get_global_id(0);
+
+    size_t row = (scan+scanoffset)*kDim + k;
+    float2 tmp_dat = 0.0f;
+
+    for (int j = rowptr[row]; j < rowptr[row+1]; j++)
+    {
+        tmp_dat += val[j]*sg[colind[j] + gridpoints*n + gridpoints*NDim*scan];
+    }
+    s[k+kDim*n+kDim*NDim*scan] = tmp_dat;
+}
+
+
 __kernel void copy(
                 __global float2 *out,
                 __global float2 *in,
@@ -35,7 +35,8 @@ __kernel void deapo_adj(
                 __constant float *deapo,
                 const int dim,
                 const float scale,
-                const float ogf
+                const float ogf,
+                const int shift
                 )
 {
     size_t x = get_global_id(2);
@@ -49,7 +50,10 @@ __kernel void deapo_adj(
     size_t n = y+(int)(dim-Y)/2;
     size_t N = dim;
 
-    out[k*X*Y+y*X+x] = in[k*N*M+n*M+m] * deapo[y]* deapo[x] * scale;
+    // Checkerboard modulation of the centered FFT.
+    float sign = (shift && (m+n)%2) ? -1.0f : 1.0f;
+
+    out[k*X*Y+y*X+x] = in[k*N*M+n*M+m] * deapo[y]* deapo[x] * scale * sign;
 }
 
 
@@ -57,24 +61,33 @@ __kernel void deapo_fwd(
                 __global float2 *out,
                 __global float2 *in,
                 __constant float *deapo,
-                const int dim,
+                const int dimX,
+                const int dimY,
                 const float scale,
-                const float ogf
+                const float ogf,
+                const int shift
                 )
 {
-    size_t x = get_global_id(2);
-    size_t X = get_global_size(2);
-    size_t y = get_global_id(1);
-    size_t Y = get_global_size(1);
+    size_t m = get_global_id(2);
+    size_t M = get_global_size(2);
+    size_t n = get_global_id(1);
+    size_t N = get_global_size(1);
     size_t k = get_global_id(0);
 
-    size_t m = x+(int)(dim-X)/2;
-    size_t M = dim;
-    size_t n = y+(int)(dim-Y)/2;
-    size_t N = dim;
+    int x = (int)m-(int)(M-dimX)/2;
+    int y = (int)n-(int)(N-dimY)/2;
 
+    // The padded border is zeroed here, thus no separate pass is needed.
+    if (x < 0 || x >= dimX || y < 0 || y >= dimY)
+    {
+        out[k*N*M+n*M+m] = 0.0f;
+        return;
+    }
+    // Checkerboard modulation of the centered FFT.
+    float sign = (shift && (m+n)%2) ? -1.0f : 1.0f;
 
-    out[k*N*M+n*M+m] = in[k*X*Y+y*X+x] * deapo[y]* deapo[x] * scale;
+    out[k*N*M+n*M+m] = in[k*dimX*dimY+y*dimX+x] * deapo[y]* deapo[x] * scale
+                       * sign;
 }
 
 __kernel void zero_tmp(__global float2 *tmp)
@@ -142,6 +155,11 @@ __kernel void grid_lut(
                 if (gcount1 >= gridsize) {indx-=gridsize;indy=gridsize-indy;}
                 if (gcount2 < 0) {indy+=gridsize;indx=gridsize-indx;}
                 if (gcount2 >= gridsize) {indy-=gridsize;indx=gridsize-indx;}
+                // Wrapped taps outside of the grid are skipped.
+                if (indx*gridsize+indy < 0 ||
+                    indx*gridsize+indy >= gridsize*gridsize) {continue;}
+                // Checkerboard modulation of the centered FFT.
+                if ((indx+indy)%2) {kern = -kern;}
                 AtomicAdd(
     &(
       sg[
@@ -225,6 +243,11 @@ __kernel void invgrid_lut(
                 if (gcount1 >= gridsize) {indx-=gridsize;indy=gridsize-indy;}
                 if (gcount2 < 0) {indy+=gridsize;indx=gridsize-indx;}
                 if (gcount2 >= gridsize) {indy-=gridsize;indx=gridsize-indx;}
+                // Wrapped taps outside of the grid are skipped.
+                if (indx*gridsize+indy < 0 ||
+                    indx*gridsize+indy >= gridsize*gridsize) {continue;}
+                // Checkerboard modulation of the centered FFT.
+                if ((indx+indy)%2) {kern = -kern;}
                 tmp_dat += (float2)(kern,kern)*sg[
                                         indx*gridsize+indy
                                         + (gridsize*gridsize)*n
@@ -124,7 +124,7 @@ class Model(BaseModel):
                                  "M02", "T22"],
                 "real_valued": const}
 
-    def _execute_forward_3D(self, x):
+    def _execute_forward_3D(self, x, islice=None):
         M0 = x[0, ...] * self.uk_scale[0]
         M01 = x[1, ...] * self.uk_scale[1]
         T21 = x[2, ...] * self.uk_scale[2]
@@ -136,7 +136,7 @@ class Model(BaseModel):
         S = np.array(S, dtype=self._DTYPE)
         return S
 
-    def _execute_gradient_3D(self, x):
+    def _execute_gradient_3D(self, x, islice=None):
         M0 = x[0, ...]
         M01 = x[1, ...]
         T21 = x[2, ...]
@@ -162,6 +162,27 @@ class Model(BaseModel):
         grad[~np.isfinite(grad)] = 1e-20
         return grad
 
+    def _execute_forward_and_gradient_3D(self, x, islice=None):
+        M0 = x[0, ...]
+        M01 = x[1, ...]
+        T21 = x[2, ...]
+        M02 = x[3, ...]
+        T22 = x[4, ...]
+        E21 = np.exp(-self.TE * (T21 * self.uk_scale[2]))
+        E22 = np.exp(-self.TE * (T22 * self.uk_scale[4]))
+        grad_M0 = self.uk_scale[0] * (
+            M01 * self.uk_scale[1] * E21 + M02 * self.uk_scale[3] * E22)
+        grad_M01 = self.uk_scale[0] * M0 * self.uk_scale[1] * E21
+        grad_T21 = -M01 * self.TE * self.uk_scale[2] * grad_M01
+        grad_M02 = self.uk_scale[0] * M0 * self.uk_scale[3] * E22
+        grad_T22 = -M02 * self.TE * self.uk_scale[4] * grad_M02
+        S = np.array(M0 * grad_M0, dtype=self._DTYPE)
+        S[~np.isfinite(S)] = 1e-20
+        grad = np.array([grad_M0, grad_M01, grad_T21,
+                         grad_M02, grad_T22], dtype=self._DTYPE)
+        grad[~np.isfinite(grad)] = 1e-20
+        return S, grad
+
     def computeInitialGuess(self, *args):
         """Initialize unknown array for the fitting.
 
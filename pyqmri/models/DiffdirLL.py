@@ -181,55 +181,46 @@ class Model(BaseModel):
                                  "ADC_yz"],
                 "real_valued": const}
 
-    def _execute_forward_3D(self, x):
-        ADC = x[1, ...]**2 * self.uk_scale[1]**2 * self.dir[..., 0]**2 + \
-              (x[2, ...]**2 * self.uk_scale[2]**2 +
-               x[3, ...]**2 * self.uk_scale[3]**2) * self.dir[..., 1]**2 + \
-              (x[4, ...]**2 * self.uk_scale[4]**2 +
-               x[5, ...]**2 * self.uk_scale[5]**2 +
-               x[6, ...]**2 * self.uk_scale[6]**2) * self.dir[..., 2]**2 +\
-              2 * (x[2, ...] * self.uk_scale[2] *
-                   x[1, ...] * self.uk_scale[1]) * \
-              self.dir[..., 0] * self.dir[..., 1] + \
-              2 * (x[4, ...] * self.uk_scale[4] *
-                   x[1, ...] * self.uk_scale[1]) *\
-              self.dir[..., 0] * self.dir[..., 2] +\
-              2 * (x[2, ...] * self.uk_scale[2] *
-                   x[4, ...] * self.uk_scale[4] +
-                   x[6, ...] * self.uk_scale[6] *
-                   x[3, ...] * self.uk_scale[3]) * \
-              self.dir[..., 1] * self.dir[..., 2]
-
+    def _calcADC(self, x):
+        return x[1, ...]**2 * self.uk_scale[1]**2 * self.dir[..., 0]**2 + \
+               (x[2, ...]**2 * self.uk_scale[2]**2 +
+                x[3, ...]**2 * self.uk_scale[3]**2) * self.dir[..., 1]**2 + \
+               (x[4, ...]**2 * self.uk_scale[4]**2 +
+                x[5, ...]**2 * self.uk_scale[5]**2 +
+                x[6, ...]**2 * self.uk_scale[6]**2) * self.dir[..., 2]**2 +\
+               2 * (x[2, ...] * self.uk_scale[2] *
+                    x[1, ...] * self.uk_scale[1]) * \
+               self.dir[..., 0] * self.dir[..., 1] + \
+               2 * (x[4, ...] * self.uk_scale[4] *
+                    x[1, ...] * self.uk_scale[1]) *\
+               self.dir[..., 0] * self.dir[..., 2] +\
+               2 * (x[2, ...] * self.uk_scale[2] *
+                    x[4, ...] * self.uk_scale[4] +
+                    x[6, ...] * self.uk_scale[6] *
+                    x[3, ...] * self.uk_scale[3]) * \
+               self.dir[..., 1] * self.dir[..., 2]
+
+    def _execute_forward_3D(self, x, islice=None):
         S = (x[0, ...] * self.uk_scale[0] *
-             np.exp(- ADC * self.b)).astype(self._DTYPE)
+             np.exp(- self._calcADC(x) * self.b)).astype(self._DTYPE)
 
-        S *= self.phase
+        S *= self._slab(self.phase, islice)
         S[~np.isfinite(S)] = 0
         return S
 
-    def _execute_gradient_3D(self, x):
-        ADC = x[1, ...]**2 * self.uk_scale[1]**2 * self.dir[..., 0]**2 + \
-              (x[2, ...]**2 * self.uk_scale[2]**2 +
-               x[3, ...]**2 * self.uk_scale[3]**2) * self.dir[..., 1]**2 + \
-              (x[4, ...]**2 * self.uk_scale[4]**2 +
-               x[5, ...]**2 * self.uk_scale[5]**2 +
-               x[6, ...]**2 * self.uk_scale[6]**2) * self.dir[..., 2]**2 +\
-              2 * (x[2, ...] * self.uk_scale[2] *
-                   x[1, ...] * self.uk_scale[1]) * \
-              self.dir[..., 0] * self.dir[..., 1] + \
-              2 * (x[4, ...] * self.uk_scale[4] *
-                   x[1, ...] * self.uk_scale[1]) *\
-              self.dir[..., 0] * self.dir[..., 2] +\
-              2 * (x[2, ...] * self.uk_scale[2] *
-                   x[4, ...] * self.uk_scale[4] +
-                   x[6, ...] * self.uk_scale[6] *
-                   x[3, ...] * self.uk_scale[3]) * \
-              self.dir[..., 1] * self.dir[..., 2]
-
-        grad_M0 = self.uk_scale[0] * np.exp(- ADC * self.b)
-        del ADC
-
-        grad_M0 *= self.phase
+    def _execute_gradient_3D(self, x, islice=None):
+        grad_M0 = self.uk_scale[0] * np.exp(- self._calcADC(x) * self.b)
+        grad_M0 *= self._slab(self.phase, islice)
+        return self._calcGradient(x, grad_M0)
+
+    def _execute_forward_and_gradient_3D(self, x, islice=None):
+        grad_M0 = self.uk_scale[0] * np.exp(- self._calcADC(x) * self.b)
+        grad_M0 *= self._slab(self.phase, islice)
+        S = (x[0, ...] * grad_M0).astype(self._DTYPE)
+        S[~np.isfinite(S)] = 0
+        return S, self._calcGradient(x, grad_M0)
+
+    def _calcGradient(self, x, grad_M0):
         grad_ADC_x = -x[0, ...] * self.b * grad_M0 * \
             (2 * x[1, ...] * self.uk_scale[1]**2 * self.dir[..., 0]**2 +
              2 * self.uk_scale[1] * x[2, ...] * self.uk_scale[2] *
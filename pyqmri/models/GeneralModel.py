@@ -2,9 +2,13 @@
 # -*- coding: utf-8 -*-
 """Module holding the general model for fitting."""
 import configparser
+import threading
 import numpy as np
 import sympy
+import pyopencl as cl
+import pyopencl.array as clarray
 from pyqmri.models.template import BaseModel, constraints
+from pyqmri._helper_fun import _clcodegen as clcodegen
 
 
 def _str2bool(v):
@@ -41,6 +45,11 @@ class Model(BaseModel):
         forward and gradient evaluation.
       init_values : list of str
           Initial guess for each unknown
+
+    The signal and its partial derivatives are evaluated with OpenCL
+    kernels generated from the sympy expressions if an OpenCL context is
+    present in par. Setting "use_opencl = False" in the model file
+    falls back to the numpy based evaluation.
     """
 
     def __init__(self, par):
@@ -83,9 +92,11 @@ class Model(BaseModel):
 
         self.grad = []
         self.rescalefun = []
+        grad_expr = []
 
         for uk, scalefuns in zip(unknowns, params["rescale"]):
             tmp_grad = sympy.diff(signaleq, uk)
+            grad_expr.append(tmp_grad)
             self.grad.append(sympy.lambdify(
                 (modelpar, unknowns, uk_scale), tmp_grad))
             self.rescalefun.append(
@@ -96,6 +107,18 @@ class Model(BaseModel):
         self.signaleq = sympy.lambdify(
             (modelpar, unknowns, uk_scale), signaleq)
 
+        replacements, reduced = sympy.cse(
+            [signaleq] + grad_expr,
+            symbols=sympy.numbered_symbols("_cse"))
+        self._cse_funs = []
+        cse_syms = []
+        for sym, expr in replacements:
+            self._cse_funs.append(sympy.lambdify(
+                (modelpar, unknowns, uk_scale, list(cse_syms)), expr))
+            cse_syms.append(sym)
+        self._fwd_grad = sympy.lambdify(
+            (modelpar, unknowns, uk_scale, cse_syms), reduced)
+
         self.modelparams = []
         for mypar in modelpar:
             tmp = par[str(mypar)]
@@ -129,8 +152,62 @@ class Model(BaseModel):
 
         self._plot = []
         self._phase = None
+        self._phase_cl = None
+        self._cl_params = []
+        self._cl_lock = threading.Lock()
         self.guess = None
 
+        if _str2bool(params.get("use_opencl", "True")):
+            self._setupCLModel(par, modelpar, unknowns, uk_scale,
+                               signaleq, grad_expr)
+
+    def _setupCLModel(self, par, modelpar, unknowns, uk_scale,
+                      signaleq, grad_expr):
+        if "ctx" not in par:
+            return
+        layouts = []
+        try:
+            for mypar in self.modelparams:
+                if np.any(np.imag(mypar) != 0):
+                    raise ValueError(
+                        "Complex valued model parameters are not supported.")
+                layouts.append(clcodegen.param_layout(
+                    np.shape(mypar), self.NScan, self.NSlice,
+                    self.dimY, self.dimX))
+            generator = clcodegen.ModelKernelGenerator(
+                unknowns, modelpar, uk_scale, layouts,
+                double=self._DTYPE == np.complex128,
+                phase=self.indphase)
+            code = (generator.header()
+                    + generator.kernel("model_fwd", [signaleq])
+                    + generator.kernel("model_grad", grad_expr)
+                    + generator.kernel("model_fwd_grad",
+                                       [signaleq] + grad_expr))
+            self._setupCL(par, code)
+        except (ValueError, NotImplementedError, cl.Error) as err:
+            print("OpenCL code generation failed, "
+                  "using numpy evaluation instead: %s" % err)
+            return
+
+        for mypar, layout in zip(self.modelparams, layouts):
+            tmp = np.real(mypar)
+            if layout == "scalar":
+                self._cl_params.append(self._DTYPE_real(np.ravel(tmp)[0]))
+                continue
+            tmp = np.reshape(tmp, (1,)*(4-tmp.ndim) + tmp.shape)
+            if layout == "scan":
+                tmp = tmp[:, 0, 0, 0]
+            elif layout == "voxel":
+                tmp = np.broadcast_to(
+                    tmp[0], (self.NSlice, self.dimY, self.dimX))
+            else:
+                tmp = np.broadcast_to(
+                    tmp, (self.NScan, self.NSlice, self.dimY, self.dimX))
+            self._cl_params.append(
+                clarray.to_device(
+                    self._queue,
+                    np.require(tmp, self._DTYPE_real, 'C')))
+
     def rescale(self, x):
         """Rescale the unknowns with the scaling factors.
 
@@ -160,31 +237,97 @@ class Model(BaseModel):
                 "unknown_name": uk_name,
                 "real_valued": const}
 
-    def _execute_forward_3D(self, x):
-        S = self.signaleq(self.modelparams, x, self.uk_scale)
+    def _runCLKernel(self, kernel, out, x, offset=0):
+        args = [out.data, x.data]
+        if self.indphase is True:
+            args.append(self._phase_cl.data)
+        args += [np.int32(self.NScan),
+                 np.int32(self.NSlice),
+                 np.int32(offset)]
+        for mypar in self._cl_params:
+            if isinstance(mypar, clarray.Array):
+                args.append(mypar.data)
+            else:
+                args.append(mypar)
+        for scale in self.uk_scale:
+            args.append(self._DTYPE_real(scale))
+        return kernel(self._queue, x.shape[1:], None, *args,
+                      wait_for=out.events + x.events)
+
+    def _execute_cl(self, kernel, x, num_out, islice=None):
+        offset = 0
+        if islice is not None:
+            offset = islice.start
+        result = np.empty((num_out, self.NScan)+x.shape[1:],
+                          dtype=self._DTYPE)
+        for start in range(0, x.shape[1], self.par_slices):
+            stop = min(start + self.par_slices, x.shape[1])
+            tmp_x = clarray.to_device(
+                self._queue,
+                np.require(x[:, start:stop], self._DTYPE, 'C'),
+                allocator=self._allocator)
+            out = clarray.empty(self._queue,
+                                (num_out, self.NScan)+tmp_x.shape[1:],
+                                dtype=self._DTYPE, allocator=self._allocator)
+            # Setting the kernel arguments is not thread safe.
+            with self._cl_lock:
+                event = self._runCLKernel(kernel, out, tmp_x, offset+start)
+            event.wait()
+            result[:, :, start:stop] = out.get()
+        return result
+
+    def _execute_gradient_cl(self, x):
+        out = clarray.empty(self._queue,
+                            (len(self.grad), self.NScan)+x.shape[1:],
+                            dtype=self._DTYPE, allocator=self._allocator)
+        out.add_event(self._runCLKernel(self._prg.model_grad, out, x))
+        return out
+
+    def _execute_forward_3D(self, x, islice=None):
+        if self.cl_available:
+            return self._execute_cl(self._prg.model_fwd, x, 1, islice)[0]
+        S = self.signaleq(self._modelParams(islice), x, self.uk_scale)
         while len(S.shape) >= 5:
             S = np.squeeze(S, axis=0)
         if self.indphase is True:
-            S *= self._phase
+            S *= self._slab(self._phase, islice)
         S[~np.isfinite(S)] = 1e-20
         S = S.astype(dtype=self._DTYPE)
         return S
 
-    def _execute_gradient_3D(self, x):
-        modelgradient = []
-        if self.indphase is True:
-            for ukgrad in self.grad:
-                modelgradient.append(
-                    ukgrad(self.modelparams, x, self.uk_scale)*self._phase)
+    def _execute_gradient_3D(self, x, islice=None):
+        if self.cl_available:
+            return self._execute_cl(
+                self._prg.model_grad, x, len(self.grad), islice)
+        return self._evaluate_fused(x, islice)[1:]
+
+    def _execute_forward_and_gradient_3D(self, x, islice=None):
+        if self.cl_available:
+            result = self._execute_cl(
+                self._prg.model_fwd_grad, x, len(self.grad)+1, islice)
         else:
-            for ukgrad in self.grad:
-                modelgradient.append(
-                    ukgrad(self.modelparams, x, self.uk_scale))
-        modelgradient = np.array(modelgradient, dtype=self._DTYPE)
-        while len(modelgradient.shape) >= 6:
-            modelgradient = np.squeeze(modelgradient, axis=1)
-        modelgradient[~np.isfinite(modelgradient)] = 1e-20
-        return modelgradient
+            result = self._evaluate_fused(x, islice)
+        return result[0], result[1:]
+
+    def _modelParams(self, islice):
+        return [self._slab(mypar, islice) for mypar in self.modelparams]
+
+    def _evaluate_fused(self, x, islice=None):
+        modelparams = self._modelParams(islice)
+        cse_vals = []
+        for fun in self._cse_funs:
+            cse_vals.append(fun(modelparams, x, self.uk_scale, cse_vals))
+        values = self._fwd_grad(modelparams, x, self.uk_scale, cse_vals)
+        result = np.empty((len(values), self.NScan)+x.shape[1:],
+                          dtype=self._DTYPE)
+        for j, val in enumerate(values):
+            while np.ndim(val) >= 5:
+                val = np.squeeze(val, axis=0)
+            result[j] = val
+        if self.indphase is True:
+            result *= self._slab(self._phase, islice)
+        result[~np.isfinite(result)] = 1e-20
+        return result
 
     def computeInitialGuess(self, *args):
         """Initialize unknown array for the fitting.
@@ -201,6 +344,10 @@ class Model(BaseModel):
         """
         if self.indphase is True:
             self._phase = np.exp(1j*(np.angle(args[0])-np.angle(args[0][0])))
+            if self.cl_available:
+                self._phase_cl = clarray.to_device(
+                    self._queue,
+                    np.require(self._phase, self._DTYPE, 'C'))
         x = np.ones((len(self.init_values),
                      self.NSlice, self.dimY, self.dimX), self._DTYPE)
         for j in range(len(self.init_values)):
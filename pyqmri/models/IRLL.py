@@ -127,76 +127,28 @@ class Model(BaseModel):
                 "unknown_name": ["M0", "T1"],
                 "real_valued": const}
 
-    def _execute_forward_3D(self, x):
-        S = np.zeros(
-            (self.NScan,
-             self.Nproj,
-             self.NSlice,
-             self.dimY,
-             self.dimX),
-            dtype=self._DTYPE)
-
-        TR = self.TR
-        tau = self.tau
-        td = self.td
-        sin_phi = self._sin_phi
-        cos_phi = self._cos_phi
+    def _signalTerms(self, x, islice=None):
+        cos_phi = self._slab(self._cos_phi, islice)
         N = self.Nproj_measured
-        scale = self.scale
         Efit = x[1, ...] * self.uk_scale[1]
-        Etau = Efit**(tau / scale)
-        Etr = Efit**(TR / scale)
-        Etd = Efit**(td / scale)
-        M0 = x[0, ...]
-        M0_sc = self.uk_scale[0]
+        Etau = Efit**(self.tau / self.scale)
+        Etr = Efit**(self.TR / self.scale)
+        Etd = Efit**(self.td / self.scale)
 
         F = (1 - Etau) / (1 - Etau * cos_phi)
         Q = (-Etr * Etd * F * (-(Etau * cos_phi)**(N - 1) + 1) *
              cos_phi + Etr *
              Etd - 2 * Etd + 1) / (Etr * Etd * (Etau * cos_phi)**(N - 1) *
                                    cos_phi + 1)
-        Q_F = Q - F
-
-        def numexpeval_S(M0, M0_sc, sin_phi, cos_phi, n, Q_F, F, Etau):
-            return ne.evaluate(
-                "M0*M0_sc*((Etau*cos_phi)**(n - 1)*Q_F + F)*sin_phi")
-        for i in range(self.NScan):
-            for j in range(self.Nproj):
-                n = i * self.Nproj + j + 1
-                S[i, j, ...] = numexpeval_S(
-                    M0, M0_sc, sin_phi, cos_phi, n, Q_F, F, Etau)
-
-        return np.mean(S, axis=1, dtype=self._DTYPE).astype(self._DTYPE)
-
-    def _execute_gradient_3D(self, x):
-        grad = np.zeros(
-            (2,
-             self.NScan,
-             self.Nproj,
-             self.NSlice,
-             self.dimY,
-             self.dimX),
-            dtype=self._DTYPE)
-        M0_sc = self.uk_scale[0]
+        return Etau, Etr, Etd, F, Q - F
+
+    def _derivativeTerms(self, x, Etau, Etr, Etd, islice=None):
         TR = self.TR
         tau = self.tau
         td = self.td
-        sin_phi = self._sin_phi
-        cos_phi = self._cos_phi
+        cos_phi = self._slab(self._cos_phi, islice)
         N = self.Nproj_measured
         scale = self.scale
-        Efit = x[1, ...] * self.uk_scale[1]
-        Etau = Efit**(tau / scale)
-        Etr = Efit**(TR / scale)
-        Etd = Efit**(td / scale)
-        M0 = x[0, ...]
-        M0_sc = self.uk_scale[0]
-
-        F = (1 - Etau) / (1 - Etau * cos_phi)
-        Q = (-Etr * Etd * (-Etau + 1) * (-(Etau * cos_phi)**(N - 1) + 1) *
-             cos_phi / (-Etau * cos_phi + 1) + Etr * Etd - 2 * Etd + 1) / \
-            (Etr * Etd * (Etau * cos_phi)**(N - 1) * cos_phi + 1)
-        Q_F = Q - F
         tmp1 = (
             (
                 - TR * Etr * Etd * (-Etau + 1)
@@ -252,37 +204,91 @@ class Model(BaseModel):
                     1
                     )
             ) / (x[1, ...] * scale)
+        return tmp1, tmp2, tmp3
+
+    def _projectionMeans(self, Etau, islice=None):
+        """Average the readout terms over the projections of each scan.
 
-        def numexpeval_M0(M0_sc, sin_phi, cos_phi, n, Q_F, F, Etau):
-            return ne.evaluate(
-                "M0_sc*((Etau*cos_phi)**(n - 1)*Q_F + F)*sin_phi")
-
-        def numexpeval_T1(
-                M0,
-                M0_sc,
-                Etau,
-                cos_phi,
-                sin_phi,
-                n,
-                tmp1,
-                tmp2,
-                tmp3,
-                tau):
-            return ne.evaluate(
-                "M0*M0_sc*((Etau*cos_phi)**(n - 1)*tmp1 + "
-                "tmp2 + tau*(Etau*cos_phi)**(n - 1)*(n - 1)*tmp3)*sin_phi")
-
-        for i in range(self.NScan):
-            for j in range(self.Nproj):
-                n = i * self.Nproj + j + 1
-
-                grad[0, i, j, ...] = numexpeval_M0(
-                    M0_sc, sin_phi, cos_phi, n, Q_F, F, Etau)
-                grad[1, i, j, ...] = numexpeval_T1(
-                    M0, M0_sc, Etau, cos_phi, sin_phi, n,
-                    tmp1, tmp2, tmp3, tau)
-
-        return np.mean(grad, axis=2, dtype=self._DTYPE).astype(self._DTYPE)
+        The readout n = i*Nproj + j + 1 of scan i is weighted with
+        a**(n-1), a = Etau*cos_phi. As this is a geometric series, the
+        means over the projections of a scan follow as
+        a**(i*Nproj)*c0 and a**(i*Nproj)*(i*Nproj*c0 + c1) for the terms
+        a**(n-1) and (n-1)*a**(n-1), respectively, with c0 and c1 the
+        means of a**j and j*a**j over j = 0, ..., Nproj-1.
+
+        Parameters
+        ----------
+          Etau : numpy.array
+            The exponential term of a single readout.
+          islice : slice, None
+            The slices Etau belongs to.
+
+        Returns
+        -------
+          tuple of numpy.array:
+            The means of a**(n-1) and (n-1)*a**(n-1) for each scan.
+        """
+        P = self.Nproj
+        a = np.asarray(Etau * self._slab(self._cos_phi, islice),
+                       dtype=np.complex128)
+        one_a = 1 - a
+        # Voxels close to a = 1 are summed up explicitly to avoid the
+        # cancellation in the closed form.
+        direct = np.abs(one_a) < 1e-4
+        one_a[direct] = 1
+        aP = a**P
+        c0 = (1 - aP) / (P * one_a)
+        c1 = a * (1 - P * a**(P - 1) + (P - 1) * aP) / (P * one_a**2)
+        if np.any(direct):
+            a_direct = a[direct]
+            a_j = np.ones_like(a_direct)
+            sum0 = np.zeros_like(a_direct)
+            sum1 = np.zeros_like(a_direct)
+            for j in range(P):
+                sum0 += a_j
+                sum1 += j * a_j
+                a_j *= a_direct
+            c0[direct] = sum0 / P
+            c1[direct] = sum1 / P
+
+        scans = np.arange(self.NScan).reshape(
+            (self.NScan,) + (1,) * a.ndim)
+        a_scan = aP[None]**scans
+        mean0 = (a_scan * c0).astype(self._DTYPE)
+        mean1 = (a_scan * (scans * P * c0 + c1)).astype(self._DTYPE)
+        return mean0, mean1
+
+    def _execute_forward_3D(self, x, islice=None):
+        sin_phi = self._slab(self._sin_phi, islice)
+        M0 = x[0, ...]
+        M0_sc = self.uk_scale[0]
+        Etau, _, _, F, Q_F = self._signalTerms(x, islice)
+        mean0, _ = self._projectionMeans(Etau, islice)
+
+        S = ne.evaluate("M0*M0_sc*(mean0*Q_F + F)*sin_phi")
+        return S.astype(self._DTYPE)
+
+    def _execute_gradient_3D(self, x, islice=None):
+        return self._execute_forward_and_gradient_3D(x, islice)[1]
+
+    def _execute_forward_and_gradient_3D(self, x, islice=None):
+        tau = self.tau
+        sin_phi = self._slab(self._sin_phi, islice)
+        M0 = x[0, ...]
+        M0_sc = self.uk_scale[0]
+        Etau, Etr, Etd, F, Q_F = self._signalTerms(x, islice)
+        tmp1, tmp2, tmp3 = self._derivativeTerms(
+            x, Etau, Etr, Etd, islice)
+        mean0, mean1 = self._projectionMeans(Etau, islice)
+
+        grad = np.empty((2,) + mean0.shape, dtype=self._DTYPE)
+        grad[0] = ne.evaluate("M0_sc*(mean0*Q_F + F)*sin_phi")
+        grad[1] = ne.evaluate(
+            "M0*M0_sc*(mean0*tmp1 + tmp2 + tau*mean1*tmp3)*sin_phi")
+        # The signal is linear in M0, thus it follows from the
+        # partial derivative with respect to M0.
+        S = (M0 * grad[0]).astype(self._DTYPE)
+        return S, grad
 
     def computeInitialGuess(self, *args):
         """Initialize unknown array for the fitting.
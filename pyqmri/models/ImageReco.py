@@ -71,14 +71,14 @@ class Model(BaseModel):
                 "unknown_name": uk_names,
                 "real_valued": const}
 
-    def _execute_forward_3D(self, x):
+    def _execute_forward_3D(self, x, islice=None):
         S = np.zeros_like(x)
         for j in range(self.NScan):
             S[j, ...] = x[j, ...] * self.uk_scale[j]
         S[~np.isfinite(S)] = 1e-20
         return S
 
-    def _execute_gradient_3D(self, x):
+    def _execute_gradient_3D(self, x, islice=None):
         grad_M0 = np.zeros(((self.NScan, )+x.shape), dtype=self._DTYPE)
         for j in range(self.NScan):
             grad_M0[j, ...] = self.uk_scale[j]*np.ones_like(x)
@@ -2,6 +2,7 @@
 # -*- coding: utf-8 -*-
 """Module holding the variable flip angle model for T1 fitting."""
 import numpy as np
+import pyopencl.array as clarray
 from pyqmri.models.template import BaseModel, constraints
 
 
@@ -62,6 +63,10 @@ class Model(BaseModel):
         self._sin_phi = np.sin(phi_corr)
         self._cos_phi = np.cos(phi_corr)
 
+        self._setupCL(par)
+        self._sin_phi_cl = None
+        self._cos_phi_cl = None
+
         for j in range(par["unknowns"]):
             self.uk_scale.append(1)
 
@@ -112,26 +117,71 @@ class Model(BaseModel):
                 "unknown_name": ["M0", "T1"],
                 "real_valued": const}
 
-    def _execute_forward_3D(self, x):
+    def _execute_forward_3D(self, x, islice=None):
+        sin_phi = self._slab(self._sin_phi, islice)
+        cos_phi = self._slab(self._cos_phi, islice)
         E1 = x[1, ...] * self.uk_scale[1]
-        S = x[0, ...] * self.uk_scale[0] * (-E1 + 1) * self._sin_phi /\
-            (-E1 * self._cos_phi + 1)
+        S = x[0, ...] * self.uk_scale[0] * (-E1 + 1) * sin_phi /\
+            (-E1 * cos_phi + 1)
         S[~np.isfinite(S)] = 1e-20
         S = np.array(S, dtype=self._DTYPE)
         return S
 
-    def _execute_gradient_3D(self, x):
+    def _execute_gradient_3D(self, x, islice=None):
+        sin_phi = self._slab(self._sin_phi, islice)
+        cos_phi = self._slab(self._cos_phi, islice)
         E1 = x[1, ...] * self.uk_scale[1]
         M0 = x[0, ...]
         E1[~np.isfinite(E1)] = 0
-        grad_M0 = self.uk_scale[0] * (-E1 + 1) * self._sin_phi /\
-            (-E1 * self._cos_phi + 1)
+        grad_M0 = self.uk_scale[0] * (-E1 + 1) * sin_phi /\
+            (-E1 * cos_phi + 1)
         grad_T1 = M0 * self.uk_scale[0] * self.uk_scale[1] * (-E1 + 1) *\
-            self._sin_phi * self._cos_phi / (-E1 * self._cos_phi + 1)**2 -\
-            M0 * self.uk_scale[0] * self.uk_scale[1] * self._sin_phi /\
-            (-E1 * self._cos_phi + 1)
+            sin_phi * cos_phi / (-E1 * cos_phi + 1)**2 -\
+            M0 * self.uk_scale[0] * self.uk_scale[1] * sin_phi /\
+            (-E1 * cos_phi + 1)
+        grad = np.array([grad_M0, grad_T1], dtype=self._DTYPE)
+        grad[~np.isfinite(grad)] = 1e-20
+        return grad
+
+    def _execute_forward_and_gradient_3D(self, x, islice=None):
+        sin_phi = self._slab(self._sin_phi, islice)
+        cos_phi = self._slab(self._cos_phi, islice)
+        E1 = x[1, ...] * self.uk_scale[1]
+        if not np.all(np.isfinite(E1)):
+            return (self._execute_forward_3D(x, islice),
+                    self._execute_gradient_3D(x, islice))
+        denom = -E1 * cos_phi + 1
+        grad_M0 = self.uk_scale[0] * (-E1 + 1) * sin_phi / denom
+        S = np.array(x[0, ...] * grad_M0, dtype=self._DTYPE)
+        S[~np.isfinite(S)] = 1e-20
+        grad_T1 = x[0, ...] * self.uk_scale[0] * self.uk_scale[1] *\
+            sin_phi / denom * ((-E1 + 1) * cos_phi / denom - 1)
         grad = np.array([grad_M0, grad_T1], dtype=self._DTYPE)
         grad[~np.isfinite(grad)] = 1e-20
+        return S, grad
+
+    def _execute_gradient_cl(self, x):
+        if self._sin_phi_cl is None:
+            # Uploaded on first use, as the full volume need not fit on the
+            # device in streamed operation, where this path is not used.
+            self._sin_phi_cl = clarray.to_device(self._queue, self._sin_phi)
+            self._cos_phi_cl = clarray.to_device(self._queue, self._cos_phi)
+        grad = clarray.empty(self._queue,
+                             (2, self.NScan)+x.shape[1:],
+                             dtype=self._DTYPE, allocator=self._allocator)
+        grad.add_event(
+            self._prg.vfa_grad(
+                self._queue,
+                x.shape[1:],
+                None,
+                grad.data,
+                x.data,
+                self._sin_phi_cl.data,
+                self._cos_phi_cl.data,
+                np.int32(self.NScan),
+                self._DTYPE_real(self.uk_scale[0]),
+                self._DTYPE_real(self.uk_scale[1]),
+                wait_for=grad.events + x.events))
         return grad
 
     def computeInitialGuess(self, *args):
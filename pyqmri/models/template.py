@@ -2,10 +2,15 @@
 # -*- coding: utf-8 -*-
 """Module holding the template base class model."""
 import itertools
+import inspect
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.gridspec as gridspec
+from pkg_resources import resource_filename
+from pyqmri._helper_fun import CLProgram as Program
+from pyqmri._helper_fun._memorypool import get_allocator
 
 
 class constraints:
@@ -81,6 +86,12 @@ class BaseModel(ABC):
         Number of slices.
       dimX, dimY : int
         The image dimensions.
+      cl_available : bool
+        True if the model provides OpenCL kernels to evaluate the partial
+        derivatives directly on the compute device.
+      par_slices : int
+        Number of slices evaluated at once by the sliced evaluation
+        methods.
     """
 
     def __init__(self, par):
@@ -97,6 +108,38 @@ class BaseModel(ABC):
         self._plot_trans = []
         self._plot_cor = []
         self._plot_sag = []
+        self.cl_available = False
+        self._prg = None
+        self._queue = None
+        self._allocator = None
+        self.par_slices = par.get("par_slices", self.NSlice)
+
+    def _setupCL(self, par, code=None):
+        """Build the OpenCL program holding the model kernels.
+
+        Nothing is done if no OpenCL context is present in par. If no code
+        is passed, the kernels shipped with PyQMRI are used.
+
+        Parameters
+        ----------
+          par : dict
+            A python dict containing the PyOpenCL context (ctx) and
+            queues (queue).
+          code : str, None
+            The OpenCL code of the model.
+        """
+        if "ctx" not in par or "queue" not in par:
+            return
+        if code is None:
+            if self._DTYPE == np.complex128:
+                kernname = 'kernels/OpenCL_Models_double.c'
+            else:
+                kernname = 'kernels/OpenCL_Models.c'
+            code = open(resource_filename('pyqmri', kernname)).read()
+        self._prg = Program(par["ctx"][0], code)
+        self._queue = par["queue"][0]
+        self._allocator = get_allocator(par)
+        self.cl_available = True
 
     def rescale(self, x):
         """Rescale the unknowns with the scaling factors.
@@ -135,11 +178,14 @@ class BaseModel(ABC):
         ----------
           x : numpy.array
             The array of quantitative parameters to be fitted
-          islice : int, None
-            Currently unused.
+          islice : slice, int, None
+            The slices of the volume x belongs to. Defaults to None, i.e.
+            x holds the whole volume.
         """
-        # if islice is None:
-        return self._execute_forward_3D(x)
+        if islice is None:
+            return self._execute_forward_3D(x)
+        self._checkSliceSupport(self._execute_forward_3D)
+        return self._execute_forward_3D(x, islice=self._asSlice(islice))
 
     def execute_gradient(self, x, islice=None):
         """Execute the partial derivatives of the signal model.
@@ -151,18 +197,211 @@ class BaseModel(ABC):
         ----------
           x : numpy.array
             The array of quantitative parameters to be fitted
-          islice : int, None
-            Currently unused.
+          islice : slice, int, None
+            The slices of the volume x belongs to. Defaults to None, i.e.
+            x holds the whole volume.
+        """
+        if islice is None:
+            return self._execute_gradient_3D(x)
+        self._checkSliceSupport(self._execute_gradient_3D)
+        return self._execute_gradient_3D(x, islice=self._asSlice(islice))
+
+    def execute_forward_and_gradient(self, x, islice=None):
+        """Execute the signal model and its partial derivatives.
+
+        Both are evaluated at the same linearization point, thus models
+        can compute their shared intermediate terms only once by
+        overriding _execute_forward_and_gradient_3D.
+
+        Parameters
+        ----------
+          x : numpy.array
+            The array of quantitative parameters to be fitted
+          islice : slice, int, None
+            The slices of the volume x belongs to. Defaults to None, i.e.
+            x holds the whole volume.
+
+        Returns
+        -------
+          tuple of numpy.array:
+            The image series and the partial derivatives with respect to
+            each unknown.
+        """
+        if islice is None:
+            return self._execute_forward_and_gradient_3D(x)
+        self._checkSliceSupport(self._execute_forward_and_gradient_3D)
+        return self._execute_forward_and_gradient_3D(
+            x, islice=self._asSlice(islice))
+
+    def execute_forward_sliced(self, x, threads=1):
+        """Execute the signal model slab by slab.
+
+        The image series is written in slice-major order, i.e. with shape
+        (NSlice, NScan, dimY, dimX).
+
+        Parameters
+        ----------
+          x : numpy.array
+            The array of quantitative parameters to be fitted
+          threads : int, 1
+            Number of slabs evaluated in parallel.
+
+        Returns
+        -------
+          numpy.array:
+            The image series in slice-major order.
+        """
+        return self._executeSliced(x, True, False, threads)[0]
+
+    def execute_gradient_sliced(self, x, threads=1):
+        """Execute the partial derivatives of the signal model slab by slab.
+
+        The partial derivatives are written in slice-major order, i.e. with
+        shape (NSlice, unknowns, NScan, dimY, dimX).
+
+        Parameters
+        ----------
+          x : numpy.array
+            The array of quantitative parameters to be fitted
+          threads : int, 1
+            Number of slabs evaluated in parallel.
+
+        Returns
+        -------
+          numpy.array:
+            The partial derivatives in slice-major order.
+        """
+        return self._executeSliced(x, False, True, threads)[1]
+
+    def execute_forward_and_gradient_sliced(self, x, threads=1):
+        """Execute the signal model and its partial derivatives slab by slab.
+
+        Both results are written in slice-major order, see
+        execute_forward_sliced and execute_gradient_sliced.
+
+        Parameters
+        ----------
+          x : numpy.array
+            The array of quantitative parameters to be fitted
+          threads : int, 1
+            Number of slabs evaluated in parallel.
+
+        Returns
+        -------
+          tuple of numpy.array:
+            The image series and the partial derivatives in slice-major
+            order.
+        """
+        return self._executeSliced(x, True, True, threads)
+
+    def _executeSliced(self, x, forward, gradient, threads):
+        NSlice = x.shape[1]
+        S = None
+        grad = None
+        if forward:
+            S = np.empty((NSlice, self.NScan)+x.shape[2:], dtype=self._DTYPE)
+        if gradient:
+            grad = np.empty((NSlice, x.shape[0], self.NScan)+x.shape[2:],
+                            dtype=self._DTYPE)
+
+        if forward and gradient:
+            fun = self._execute_forward_and_gradient_3D
+        elif forward:
+            fun = self._execute_forward_3D
+        else:
+            fun = self._execute_gradient_3D
+
+        if not self._acceptsSlice(fun):
+            slabs = [slice(0, NSlice)]
+        else:
+            slabs = [slice(start, min(start+self.par_slices, NSlice))
+                     for start in range(0, NSlice, self.par_slices)]
+
+        def evaluate(islice):
+            if len(slabs) == 1:
+                result = fun(x)
+            else:
+                result = fun(x[:, islice], islice=islice)
+            if forward and gradient:
+                tmp_S, tmp_grad = result
+            elif forward:
+                tmp_S = result
+            else:
+                tmp_grad = result
+            if forward:
+                S[islice] = np.swapaxes(tmp_S, 0, 1)
+            if gradient:
+                grad[islice] = np.moveaxis(tmp_grad, 2, 0)
+
+        if threads > 1 and len(slabs) > 1:
+            with ThreadPoolExecutor(max_workers=threads) as executor:
+                list(executor.map(evaluate, slabs))
+        else:
+            for islice in slabs:
+                evaluate(islice)
+        return S, grad
+
+    def _slab(self, arr, islice):
+        # Restrict voxel wise attributes to the slices of the current slab.
+        if (islice is None or np.ndim(arr) < 3
+                or np.shape(arr)[-3] != self.NSlice):
+            return arr
+        return arr[..., islice, :, :]
+
+    @staticmethod
+    def _asSlice(islice):
+        if isinstance(islice, slice):
+            return islice
+        return slice(islice, islice+1)
+
+    def _acceptsSlice(self, fun):
+        if (getattr(fun, "__func__", None)
+                is BaseModel._execute_forward_and_gradient_3D):
+            return (self._acceptsSlice(self._execute_forward_3D)
+                    and self._acceptsSlice(self._execute_gradient_3D))
+        return "islice" in inspect.signature(fun).parameters
+
+    def _checkSliceSupport(self, fun):
+        if not self._acceptsSlice(fun):
+            raise NotImplementedError(
+                "The model does not support slice-wise evaluation.")
+
+    def _execute_forward_and_gradient_3D(self, x, islice=None):
+        if islice is None:
+            return self._execute_forward_3D(x), self._execute_gradient_3D(x)
+        return (self._execute_forward_3D(x, islice=islice),
+                self._execute_gradient_3D(x, islice=islice))
+
+    def execute_gradient_cl(self, x):
+        """Execute the partial derivatives of the signal model on the device.
+
+        Only available if the model provides OpenCL kernels, indicated by
+        cl_available. The result is kept in device memory.
+
+        Parameters
+        ----------
+          x : PyOpenCL.Array
+            The array of quantitative parameters to be fitted.
+
+        Returns
+        -------
+          PyOpenCL.Array:
+            The partial derivatives with respect to each unknown.
         """
-        # if islice is None:
-        return self._execute_gradient_3D(x)
+        if not self.cl_available:
+            raise NotImplementedError(
+                "The model does not provide OpenCL kernels.")
+        return self._execute_gradient_cl(x)
+
+    def _execute_gradient_cl(self, x):
+        raise NotImplementedError
 
     @abstractmethod
-    def _execute_forward_3D(self, x):
+    def _execute_forward_3D(self, x, islice=None):
         ...
 
     @abstractmethod
-    def _execute_gradient_3D(self, x):
+    def _execute_gradient_3D(self, x, islice=None):
         ...
 
     def plot_unknowns(self, x):
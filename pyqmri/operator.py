@@ -5,6 +5,7 @@ from abc import ABC, abstractmethod
 import pyopencl.array as clarray
 import numpy as np
 from pyqmri.transforms import PyOpenCLnuFFT as CLnuFFT
+from pyqmri._helper_fun._memorypool import get_allocator
 import pyqmri.streaming as streaming
 
 
@@ -92,6 +93,7 @@ class Operator(ABC):
         self.Nproj = par["Nproj"]
         self.ctx = par["ctx"]
         self.queue = par["queue"]
+        self._allocator = get_allocator(par)
         self.unknowns_TGV = par["unknowns_TGV"]
         self.unknowns_H1 = par["unknowns_H1"]
         self.unknowns = par["unknowns"]
@@ -503,7 +505,7 @@ class OperatorImagespace(Operator):
             wait_for = []
         tmp_result = clarray.empty(
             self.queue, (self.NScan, self.NSlice, self.dimY, self.dimX),
-            self.DTYPE, "C")
+            self.DTYPE, "C", allocator=self._allocator)
         tmp_result.add_event(self.prg.operator_fwd_imagespace(
             self.queue, (self.NSlice, self.dimY, self.dimX), None,
             tmp_result.data, inp[0].data, inp[2].data,
@@ -571,7 +573,7 @@ class OperatorImagespace(Operator):
             wait_for = []
         out = clarray.empty(
             self.queue, (self.unknowns, self.NSlice, self.dimY, self.dimX),
-            dtype=self.DTYPE)
+            dtype=self.DTYPE, allocator=self._allocator)
         self.prg.operator_ad_imagespace(
             out.queue, (self.NSlice, self.dimY, self.dimX), None,
             out.data, inp[0].data, inp[2].data,
@@ -660,7 +662,7 @@ class OperatorKspace(Operator):
         self._tmp_result = clarray.empty(
             self.queue, (self.NScan, self.NC,
                          self.NSlice, self.dimY, self.dimX),
-            self.DTYPE, "C")
+            self.DTYPE, "C", allocator=self._allocator)
         if not trafo:
             self.Nproj = self.dimY
             self.N = self.dimX
@@ -755,7 +757,7 @@ class OperatorKspace(Operator):
         tmp_sino = clarray.empty(
             self.queue,
             (self.NScan, self.NC, self.NSlice, self.Nproj, self.N),
-            self.DTYPE, "C")
+            self.DTYPE, "C", allocator=self._allocator)
         tmp_sino.add_event(
             self.NUFFT.FFT(tmp_sino, self._tmp_result))
         return tmp_sino
@@ -828,7 +830,7 @@ class OperatorKspace(Operator):
                                                     + inp[0].events)))
         out = clarray.empty(
             self.queue, (self.unknowns, self.NSlice, self.dimY, self.dimX),
-            dtype=self.DTYPE)
+            dtype=self.DTYPE, allocator=self._allocator)
         self.prg.operator_ad(
             out.queue, (self.NSlice, self.dimY, self.dimX), None,
             out.data, self._tmp_result.data, inp[1].data,
@@ -924,7 +926,7 @@ class OperatorKspaceSMS(Operator):
         self._tmp_result = clarray.empty(
             self.queue, (self.NScan, self.NC,
                          self.NSlice, self.dimY, self.dimX),
-            self.DTYPE, "C")
+            self.DTYPE, "C", allocator=self._allocator)
 
         self.Nproj = self.dimY
         self.N = self.dimX
@@ -1019,7 +1021,7 @@ class OperatorKspaceSMS(Operator):
         tmp_sino = clarray.empty(
             self.queue,
             (self.NScan, self.NC, self.packs, self.Nproj, self.N),
-            self.DTYPE, "C")
+            self.DTYPE, "C", allocator=self._allocator)
         tmp_sino.add_event(
             self.NUFFT.FFT(tmp_sino, self._tmp_result))
         return tmp_sino
@@ -1092,7 +1094,7 @@ class OperatorKspaceSMS(Operator):
                                                     + inp[0].events)))
         out = clarray.empty(
             self.queue, (self.unknowns, self.NSlice, self.dimY, self.dimX),
-            dtype=self.DTYPE)
+            dtype=self.DTYPE, allocator=self._allocator)
         self.prg.operator_ad(
             out.queue, (self.NSlice, self.dimY, self.dimX), None,
             out.data, self._tmp_result.data, inp[1].data,
@@ -1450,7 +1452,7 @@ class OperatorKspaceStreamed(Operator):
                         self.queue[4*j+i],
                         (self.par_slices+self._overlap, self.NScan,
                          self.NC, self.dimY, self.dimX),
-                        self.DTYPE, "C"))
+                        self.DTYPE, "C", allocator=get_allocator(par, j)))
                 self.NUFFT.append(
                     CLnuFFT.create(self.ctx[j],
                                    self.queue[4*j+i], par,
@@ -1750,7 +1752,7 @@ class OperatorKspaceSMSStreamed(Operator):
                         self.queue[4*j+i],
                         (self.par_slices+self._overlap, self.NScan,
                          self.NC, self.dimY, self.dimX),
-                        self.DTYPE, "C"))
+                        self.DTYPE, "C", allocator=get_allocator(par, j)))
                 self.NUFFT.append(
                     CLnuFFT.create(self.ctx[j],
                                    self.queue[4*j+i], par,
@@ -2173,7 +2175,7 @@ class OperatorFiniteGradient(Operator):
         tmp_result = clarray.empty(
             self.queue, (self.unknowns,
                          self.NSlice, self.dimY, self.dimX, 4),
-            self.DTYPE, "C")
+            self.DTYPE, "C", allocator=self._allocator)
         tmp_result.add_event(self.prg.gradient(
             self.queue, inp.shape[1:], None, tmp_result.data, inp.data,
             np.int32(self.unknowns),
@@ -2239,7 +2241,7 @@ class OperatorFiniteGradient(Operator):
             wait_for = []
         tmp_result = clarray.empty(
             self.queue, (self.unknowns, self.NSlice, self.dimY, self.dimX),
-            self.DTYPE, "C")
+            self.DTYPE, "C", allocator=self._allocator)
         tmp_result.add_event(self.prg.divergence(
             self.queue, tmp_result.shape[1:], None, tmp_result.data, inp.data,
             np.int32(self.unknowns),
@@ -2413,7 +2415,7 @@ class OperatorFiniteSymGradient(Operator):
         tmp_result = clarray.empty(
             self.queue, (self.unknowns,
                          self.NSlice, self.dimY, self.dimX, 8),
-            self.DTYPE, "C")
+            self.DTYPE, "C", allocator=self._allocator)
         tmp_result.add_event(self.prg.sym_grad(
             self.queue, inp.shape[1:-1], None, tmp_result.data, inp.data,
             np.int32(self.unknowns_TGV),
@@ -2482,7 +2484,7 @@ class OperatorFiniteSymGradient(Operator):
         tmp_result = clarray.empty(
             self.queue, (self.unknowns,
                          self.NSlice, self.dimY, self.dimX, 4),
-            self.DTYPE, "C")
+            self.DTYPE, "C", allocator=self._allocator)
         tmp_result.add_event(self.prg.sym_divergence(
             self.queue, inp.shape[1:-1], None, tmp_result.data, inp.data,
             np.int32(self.unknowns_TGV),
@@ -6,6 +6,7 @@ import argparse
 import os
 import time
 import importlib
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 from tkinter import filedialog
@@ -21,6 +22,10 @@ import pyopencl.array as clarray
 from pyqmri._helper_fun import _goldcomp as goldcomp
 from pyqmri._helper_fun._est_coils import est_coils
 from pyqmri._helper_fun import _utils as utils
+from pyqmri._helper_fun._memorypool import DevicePool
+from pyqmri._helper_fun._calckbkernel import kbpreset
+from pyqmri._helper_fun._coil_compression import (coil_compression_matrix,
+                                                  compress_coils)
 from pyqmri.solver import CGSolver
 from pyqmri.irgn import IRGNOptimizer
 
@@ -108,6 +113,7 @@ def _setupOCL(myargs, par):
     platforms = _choosePlatform(myargs, par)
     par["ctx"] = []
     par["queue"] = []
+    par["allocator"] = []
     if isinstance(myargs.devices, int):
         myargs.devices = [myargs.devices]
     if myargs.streamed:
@@ -136,6 +142,7 @@ def _setupOCL(myargs, par):
                      cl.command_queue_properties.OUT_OF_ORDER_EXEC_MODE_ENABLE)
                    )
                 )
+        par["allocator"].append(DevicePool(par["queue"][-4:]))
 
 
 def _genImages(myargs, par, data, off):
@@ -170,52 +177,9 @@ def _genImages(myargs, par, data, off):
 
     else:
         tol = 1e-6
-        par_scans = 4
         lambd = 1e-3
         if "images" not in list(par["file"].keys()):
-            images = np.zeros((par["NScan"],
-                               par["NSlice"],
-                               par["dimY"],
-                               par["dimX"]), dtype=par["DTYPE"])
-            if par["NScan"]/par_scans >= 1:
-                cgs = CGSolver(par, par_scans, myargs.trafo, myargs.sms)
-                for j in range(int(par["NScan"]/par_scans)):
-                    if par["NSlice"] == 1:
-                        images[par_scans*j:par_scans*(j+1), ...] = cgs.run(
-                            data[par_scans*j:par_scans*(j+1), ...],
-                            tol=tol, lambd=lambd,
-                            scan_offset=par_scans*j)[:, None, ...]
-                    else:
-                        images[par_scans*j:par_scans*(j+1), ...] = cgs.run(
-                            data[par_scans*j:par_scans*(j+1), ...],
-                            tol=tol, lambd=lambd, scan_offset=par_scans*j)
-                del cgs
-            if np.mod(par["NScan"], par_scans):
-                cgs = CGSolver(par, np.mod(par["NScan"], par_scans),
-                               myargs.trafo, myargs.sms)
-                if par["NSlice"] == 1:
-                    if np.mod(par["NScan"], par_scans) == 1:
-                        images[-np.mod(par["NScan"], par_scans):, ...] = \
-                            cgs.run(
-                                data[-np.mod(par["NScan"], par_scans):, ...],
-                                tol=tol, lambd=lambd,
-                                scan_offset=par["NScan"]-np.mod(
-                                    par["NScan"], par_scans))
-                    else:
-                        images[-np.mod(par["NScan"], par_scans):, ...] = \
-                            cgs.run(
-                                data[-np.mod(par["NScan"], par_scans):, ...],
-                                tol=tol, lambd=lambd,
-                                scan_offset=par["NScan"]-np.mod(
-                                    par["NScan"], par_scans))[:, None, ...]
-                else:
-                    images[-np.mod(par["NScan"], par_scans):, ...] = \
-                        cgs.run(
-                            data[-np.mod(par["NScan"], par_scans):, ...],
-                            tol=tol, lambd=lambd,
-                            scan_offset=par["NScan"]-np.mod(
-                                    par["NScan"], par_scans))
-                del cgs
+            images = _cgImages(myargs, par, data, tol, lambd)
             par["file"].create_dataset("images", images.shape,
                                        dtype=par["DTYPE"], data=images)
         else:
@@ -237,6 +201,83 @@ def _genImages(myargs, par, data, off):
     return images
 
 
+def _cgBatchSize(par, trafo, mem_fraction=0.5):
+    # Device memory of one CGSolver scales linearly with the number of
+    # scans: k-space data and its copy, the coil images, the (oversampled)
+    # FFT grid and the five CG vectors. Coils, trajectory and density
+    # compensation are allocated once per solver.
+    itemsize = np.dtype(par["DTYPE"]).itemsize
+    n_img = par["NSlice"]*par["dimY"]*par["dimX"]
+    n_kspace = par["NC"]*par["NSlice"]*par["Nproj"]*par["N"]
+    if trafo:
+        ogf = par.get("ogf") or par["N"]/par["dimX"]
+    else:
+        ogf = 1
+    n_grid = (par["NC"]*par["NSlice"] *
+              int(par["dimY"]*ogf)*int(par["dimX"]*ogf))
+    per_scan = itemsize*(2*n_kspace + par["NC"]*n_img + n_grid + 5*n_img)
+    fixed = itemsize*par["NC"]*n_img
+    if trafo:
+        fixed += (np.asarray(par["traj"]).nbytes
+                  + np.asarray(par["dcf"]).nbytes)
+    mem = min(ctx.devices[0].global_mem_size for ctx in par["ctx"])
+    par_scans = int((mem_fraction*mem - fixed) // per_scan)
+    # Spread the scans evenly over all devices.
+    par_scans = min(par_scans,
+                    int(np.ceil(par["NScan"]/len(par["ctx"]))))
+    return max(par_scans, 1)
+
+
+def _devicePar(par, device):
+    # CGSolver and its operator work on the first context, queue and
+    # allocator of par.
+    dev_par = dict(par)
+    n_queue = len(par["queue"])//len(par["ctx"])
+    dev_par["ctx"] = [par["ctx"][device]]
+    dev_par["queue"] = par["queue"][device*n_queue:(device+1)*n_queue]
+    if par.get("allocator"):
+        dev_par["allocator"] = [par["allocator"][device]]
+    if isinstance(par.get("fft_batch"), (list, tuple)) and par["fft_batch"]:
+        dev_par["fft_batch"] = [
+            par["fft_batch"][min(device, len(par["fft_batch"])-1)]]
+    return dev_par
+
+
+def _cgImages(myargs, par, data, tol, lambd):
+    images = np.zeros((par["NScan"],
+                       par["NSlice"],
+                       par["dimY"],
+                       par["dimX"]), dtype=par["DTYPE"])
+    par_scans = _cgBatchSize(par, myargs.trafo)
+    # The last batch ends with the last scan and overlaps the previous one
+    # instead of being smaller, such that all batches share one solver.
+    # Padding it with empty scans would index the trajectory beyond the
+    # acquired scans.
+    batches = [(start, min(start, par["NScan"]-par_scans))
+               for start in range(0, par["NScan"], par_scans)]
+    num_dev = len(par["ctx"])
+    print("CG-SENSE initial guess with %i scans per batch on %i device(s)"
+          % (par_scans, num_dev))
+
+    def reconstruct(device):
+        cgs = CGSolver(_devicePar(par, device), par_scans,
+                       myargs.trafo, myargs.sms, toeplitz=myargs.toeplitz)
+        for start, offset in batches[device::num_dev]:
+            result = cgs.run(
+                data[offset:offset+par_scans, ...],
+                tol=tol, lambd=lambd, scan_offset=offset)
+            result = np.reshape(result, (par_scans,)+images.shape[1:])
+            images[start:offset+par_scans, ...] = result[start-offset:]
+        del cgs
+
+    if num_dev > 1 and len(batches) > 1:
+        with ThreadPoolExecutor(max_workers=num_dev) as executor:
+            list(executor.map(reconstruct, range(num_dev)))
+    else:
+        reconstruct(0)
+    return images
+
+
 def _estScaleNorm(myargs, par, images, data):
 
     if myargs.trafo:
@@ -286,6 +327,150 @@ def _estScaleNorm(myargs, par, images, data):
     return data, images
 
 
+def _centerCrop(arr, shape, axes):
+    for size, axis in zip(shape, axes):
+        start = arr.shape[axis]//2 - size//2
+        arr = np.fft.fftshift(arr, axes=axis)
+        arr = np.take(arr, np.arange(start, start+size), axis=axis)
+        arr = np.fft.ifftshift(arr, axes=axis)
+    return arr
+
+
+def _downsampleImage(img, factor):
+    shape = (img.shape[-2]//factor, img.shape[-1]//factor)
+    tmp = np.fft.fft2(img, norm='ortho')
+    tmp = _centerCrop(tmp, shape, (-2, -1)) / factor
+    return np.require(np.fft.ifft2(tmp, norm='ortho').astype(img.dtype),
+                      requirements='C')
+
+
+def _downsampleParameter(x, factor):
+    tmp = _downsampleImage(
+        np.asarray(x, dtype=np.result_type(x, np.complex64)), factor)
+    # Real valued maps stay real valued.
+    if not np.any(np.imag(x)):
+        tmp = tmp.real
+    return np.require(tmp.astype(x.dtype), requirements='C')
+
+
+def _prolongate(x, factor):
+    # Linear interpolation keeps the unknowns within their box
+    # constraints, which a Fourier interpolation would not.
+    for axis in (-2, -1):
+        size = x.shape[axis]
+        pos = np.arange(size*factor) / factor
+        lower = np.minimum(np.floor(pos).astype(int), size-1)
+        upper = np.minimum(lower+1, size-1)
+        weight = np.reshape(pos-lower, (-1,) + (1,)*(-axis-1))
+        x = (np.take(x, lower, axis=axis)*(1-weight) +
+             np.take(x, upper, axis=axis)*weight).astype(x.dtype)
+    return np.require(x, requirements='C')
+
+
+def _coarse_problem(par, data, images, factor, trafo, imagespace):
+    if par["dimX"] % factor or par["dimY"] % factor or \
+            par["N"] % factor:
+        raise ValueError(
+            "Image dimensions %i x %i and %i samples per read out need "
+            "to be divisible by the multi-resolution factor %i."
+            % (par["dimY"], par["dimX"], par["N"], factor))
+    par_coarse = dict(par)
+    par_coarse["dimX"] = par["dimX"]//factor
+    par_coarse["dimY"] = par["dimY"]//factor
+    par_coarse["fname"] = "coarse_" + par["fname"]
+    # Voxel wise inputs, e.g. the coil sensitivities, the flip angle correction
+    # or parameter maps of a general model, are sampled on the coarse grid.
+    voxels = (par["NSlice"], par["dimY"], par["dimX"])
+    for key, value in par.items():
+        if isinstance(value, np.ndarray) and value.shape[-3:] == voxels:
+            par_coarse[key] = _downsampleParameter(value, factor)
+    if "file" in par and "b0" in par["file"]:
+        # DiffdirLL reads the initial guess of M0 from the input file.
+        par_coarse["file"] = {
+            "b0": _downsampleParameter(par["file"]["b0"][()], factor)}
+    images = _downsampleImage(images, factor)
+    if imagespace:
+        return par_coarse, images, images
+    # Keeping the central part of k-space on a grid with the same field of view
+    # but 1/factor times the number of points scales the image intensities with
+    # factor.
+    if trafo:
+        N = par["N"]//factor
+        if np.max(utils.prime_factors(N)) > 13:
+            raise ValueError(
+                "The largest prime factor of the %i samples per read out "
+                "on the coarse grid needs to be 13 or lower." % N)
+        start = par["N"]//2 - N//2
+        par_coarse["N"] = N
+        par_coarse["traj"] = np.require(
+            par["traj"][..., start:start+N] * factor, requirements='C')
+        par_coarse["dcf"] = np.require(
+            par["dcf"][..., start:start+N], requirements='C')
+        data = data[..., start:start+N] / factor
+    else:
+        shape = (par_coarse["dimY"], par_coarse["dimX"])
+        img_axes = [axis for axis in (-2, -1)
+                    if par["fft_dim"] is None or axis not in par["fft_dim"]]
+        if img_axes:
+            data = np.fft.fftn(data, axes=img_axes, norm='ortho')
+        data = _centerCrop(data, shape, (-2, -1)) / factor
+        if img_axes:
+            data = np.fft.ifftn(data, axes=img_axes, norm='ortho')
+        par_coarse["mask"] = np.require(
+            _centerCrop(par["mask"], shape, (-2, -1)), requirements='C')
+        par_coarse["N"] = par_coarse["dimX"]
+        par_coarse["Nproj"] = par_coarse["dimY"]
+    data = np.require(data.astype(par["DTYPE"]), requirements='C')
+    return par_coarse, data, images
+
+
+def _coarse_fit(myargs, par, sig_model, data, images):
+    irgn_par = utils.read_config(myargs.config, myargs.reg)
+    factor = irgn_par.get("multires_factor", 1)
+    gn_steps = min(irgn_par.get("multires_gn_it", 0),
+                   irgn_par["max_gn_it"]-1)
+    if factor <= 1 or gn_steps <= 0:
+        return None
+    if myargs.sms:
+        print("Multi-resolution fitting is not supported for SMS data. "
+              "Fitting at full resolution only.")
+        return None
+    par_coarse, data, images = _coarse_problem(
+        par, data, images, factor, myargs.trafo, myargs.imagespace)
+    model = sig_model.Model(par_coarse)
+    model.computeInitialGuess(
+        images,
+        par_coarse["dscale"])
+    opt = IRGNOptimizer(par_coarse,
+                        model,
+                        trafo=myargs.trafo,
+                        imagespace=myargs.imagespace,
+                        SMS=myargs.sms,
+                        config=myargs.config,
+                        streamed=myargs.streamed,
+                        reg_type=myargs.reg,
+                        DTYPE=par["DTYPE"],
+                        DTYPE_real=par["DTYPE_real"])
+    opt.irgn_par["max_gn_it"] = gn_steps
+    print("Running %i Gauss-Newton steps on the %i x %i grid."
+          % (gn_steps, par_coarse["dimY"], par_coarse["dimX"]))
+    opt.execute(data)
+    state = opt.getState()
+    del opt, model
+    # The buffers held for the coarse grid do not fit the full grid.
+    for allocator in par["allocator"]:
+        allocator.freeHeld()
+    # The fine grid fit continues with the schedule of the coarse one. Its
+    # initial cost and the TGV variable refer to the coarse problem, thus they
+    # are recomputed on the fine grid.
+    state["x"] = _prolongate(state["x"], factor)
+    state["v"] = None
+    state["gn_res"] = []
+    state["fval_init"] = None
+    del state["irgn_par"]["max_gn_it"]
+    return state
+
+
 def _readInput(myargs, par):
     if myargs.file == '':
         select_file = True
@@ -311,7 +496,10 @@ def _readInput(myargs, par):
     name = os.path.normpath(file)
     par["fname"] = name.split(os.sep)[-1]
 
-    if myargs.outdir == '':
+    if myargs.resume:
+        # Continue writing to the folder of the interrupted fit.
+        outdir = os.path.dirname(os.path.abspath(myargs.resume)) + os.sep
+    elif myargs.outdir == '':
         outdir = os.sep.join(name.split(os.sep)[:-1]) + os.sep + \
             "PyQMRI_out" + \
             os.sep + myargs.sig_model + os.sep + \
@@ -561,6 +749,25 @@ def _start_recon(myargs):
 # ratio of z direction to x,y, important for finite differences ###############
 ###############################################################################
     par["dz"] = par["DTYPE_real"](myargs.dz)
+    par["gridding"] = myargs.gridding
+    par["fft_batch"] = myargs.fft_batch
+    par["ogf"] = myargs.ogf
+    par["kwidth"] = myargs.kwidth
+    if myargs.nufft_nrmse:
+        par["ogf"], par["kwidth"] = kbpreset(
+            myargs.nufft_nrmse, myargs.ogf, myargs.kwidth)
+        print("NUFFT with an oversampling factor of %.2f and a kernel width "
+              "of %d." % (par["ogf"], par["kwidth"]))
+###############################################################################
+# Coil compression ############################################################
+###############################################################################
+    if (myargs.virtual_coils or myargs.coil_energy) and not myargs.imagespace:
+        par["coil_compression"] = coil_compression_matrix(
+            data, myargs.virtual_coils, myargs.coil_energy)
+        data = compress_coils(data, par["coil_compression"])
+        print("Compressed %i coils to %i virtual coils."
+              % (par["NC"], data.shape[1]))
+        par["NC"] = data.shape[1]
 ###############################################################################
 # Create OpenCL Context and Queues ############################################
 ###############################################################################
@@ -569,6 +776,9 @@ def _start_recon(myargs):
 # Coil Sensitivity Estimation #################################################
 ###############################################################################
     est_coils(data, par, par["file"], myargs, off)
+    if "coil_compression" in par and par["coils_precomputed"]:
+        # Precomputed sensitivities of the acquired coils.
+        par["C"] = compress_coils(par["C"], par["coil_compression"], axis=0)
 ###############################################################################
 # Standardize data ############################################################
 ###############################################################################
@@ -610,6 +820,15 @@ def _start_recon(myargs):
         images,
         par["dscale"])
 ###############################################################################
+# Coarse grid fit  ############################################################
+###############################################################################
+    if myargs.resume:
+        coarse_state = None
+    elif myargs.imagespace is True:
+        coarse_state = _coarse_fit(myargs, par, sig_model, images, images)
+    else:
+        coarse_state = _coarse_fit(myargs, par, sig_model, data, images)
+###############################################################################
 # initialize operator  ########################################################
 ###############################################################################
     opt = IRGNOptimizer(par,
@@ -622,9 +841,18 @@ def _start_recon(myargs):
                         reg_type=myargs.reg,
                         DTYPE=par["DTYPE"],
                         DTYPE_real=par["DTYPE_real"])
+    if myargs.resume:
+        opt.loadCheckpoint(myargs.resume)
+    elif coarse_state is not None:
+        opt.restoreState(coarse_state)
     f = h5py.File(par["outdir"]+"output_" + par["fname"], "a")
-    f.create_dataset("images_ifft", data=images)
+    if "images_ifft" not in f:
+        f.create_dataset("images_ifft", data=images)
     f.attrs['data_norm'] = par["dscale"]
+    if "coil_compression" in par:
+        if "coil_compression" in f:
+            del f["coil_compression"]
+        f.create_dataset("coil_compression", data=par["coil_compression"])
     f.close()
     par["file"].close()
 ###############################################################################
@@ -661,10 +889,20 @@ def run(reg_type='TGV',
         dz=1,
         weights=-1,
         useCGguess=True,
+        useToeplitz=False,
+        gridding='lut',
+        fft_batch=0,
+        ogf=0,
+        kwidth=0,
+        nufft_nrmse=0,
+        virtual_coils=0,
+        coil_energy=0,
+        coil_executor='process',
         out='',
         modelfile="models.ini",
         modelname="VFA-E1",
-        double_precision=False):
+        double_precision=False,
+        resume=''):
     """
     Start a 3D model based reconstruction.
 
@@ -717,6 +955,38 @@ def run(reg_type='TGV',
         Ratio of physical Z to X/Y dimension. X/Y is assumed to be isotropic.
       useCGguess : bool, True
         Switch between CG sense and simple FFT as initial guess for the images.
+      useToeplitz : bool, False
+        Apply the normal operator of radial CG sense via the Toeplitz
+        embedded point spread function instead of gridding.
+      gridding : str, lut
+        Radial gridding with the kernel lookup table (lut), with a
+        precomputed sparse interpolation matrix (matrix) or with the
+        lookup table and an atomic free adjoint gathering the samples
+        binned per grid point (binned). The lookup table is used if the
+        matrix does not fit into device memory.
+      fft_batch : list of int, 0
+        Number of scans (coils and scans for Cartesian data) transformed
+        by one batched FFT, one value per device or one for all devices.
+        0 selects the batch size from the device memory.
+      ogf : float, 0
+        Oversampling factor of the radial NUFFT grid. 0 uses a grid with
+        as many points as a readout.
+      kwidth : int, 0
+        Width of the radial gridding kernel. 0 uses a width of 5.
+      nufft_nrmse : float, 0
+        Target NRMSE of the radial NUFFT. If given, the oversampling factor
+        and kernel width are chosen from the presets which reach the
+        target, restricted to ogf and kwidth if these are passed as well.
+      virtual_coils : int, 0
+        Compress the coils to this number of virtual coils prior to the
+        coil sensitivity estimation. 0 disables the compression.
+      coil_energy : float, 0
+        Compress the coils to as many virtual coils as needed to hold this
+        fraction of the signal energy, e.g. 0.95. Limited to virtual_coils
+        if both are given. 0 disables the compression.
+      coil_executor : str, process
+        Executor of the per slice coil sensitivity estimation, either a
+        local process pool (process) or a running ipcluster (ipyparallel).
       out : str, ''
         Output directory. Defaults to the location of the input file.
       modelpath : str, models.ini
@@ -728,6 +998,12 @@ def run(reg_type='TGV',
         weights are used.
       double_precision : bool, False
         Enable double precission computation.
+      resume : str, ''
+        Path to a checkpoint file of an interrupted fit. The fit continues
+        from the stored Gauss-Newton step and writes to the folder of the
+        checkpoint. The remaining arguments need to match the interrupted
+        fit. Checkpoints are only written if checkpoint_interval is set in
+        the config file.
     """
     params = [('--recon_type', "TGV"),
               ('--reg_type', str(reg_type)),
@@ -744,18 +1020,31 @@ def run(reg_type='TGV',
               ('--dz', str(dz)),
               ('--weights', str(weights)),
               ('--useCGguess', str(useCGguess)),
+              ('--useToeplitz', str(useToeplitz)),
+              ('--gridding', str(gridding)),
+              ('--fft_batch', fft_batch),
+              ('--ogf', str(ogf)),
+              ('--kwidth', str(kwidth)),
+              ('--nufft_nrmse', str(nufft_nrmse)),
+              ('--virtual_coils', str(virtual_coils)),
+              ('--coil_energy', str(coil_energy)),
+              ('--coil_executor', str(coil_executor)),
               ('--model', str(model)),
               ('--modelfile', str(modelfile)),
               ('--modelname', str(modelname)),
               ('--outdir', str(out)),
-              ('--double_precision', str(double_precision))
+              ('--double_precision', str(double_precision)),
+              ('--resume', str(resume))
               ]
 
     sysargs = sys.argv[1:]
     for par_name, par_value in params:
         if par_name not in sysargs:
             sysargs.append(par_name)
-            sysargs.append(par_value)
+            if isinstance(par_value, (list, tuple)):
+                sysargs.extend(str(value) for value in par_value)
+            else:
+                sysargs.append(str(par_value))
     argsrun, unknown = _parseArguments(sysargs)
     if unknown:
         print("Unknown command line arguments passed: " + str(unknown) + "."
@@ -825,6 +1114,45 @@ def _parseArguments(args):
       '--useCGguess', dest='usecg', type=_str2bool,
       help="Switch between CG sense and simple FFT as "
            "initial guess for the images.")
+    argparmain.add_argument(
+      '--useToeplitz', dest='toeplitz', type=_str2bool, default=False,
+      help="Use the Toeplitz embedded normal operator instead of gridding "
+           "in radial CG sense.")
+    argparmain.add_argument(
+      '--gridding', dest='gridding', type=str, default='lut',
+      choices=['lut', 'matrix', 'binned'],
+      help="Radial gridding with the kernel lookup table (lut, default), "
+           "a precomputed sparse interpolation matrix (matrix) or the "
+           "lookup table with an atomic free adjoint (binned).")
+    argparmain.add_argument(
+      '--fft_batch', dest='fft_batch', type=int, nargs='*',
+      help="Number of scans per batched FFT, one value per device or one "
+           "for all devices. 0 selects the batch from the device memory.")
+    argparmain.add_argument(
+      '--ogf', dest='ogf', type=float, default=0,
+      help="Oversampling factor of the radial NUFFT grid, e.g. 1.25 to 2. "
+           "Defaults to the ratio of readout length to image size.")
+    argparmain.add_argument(
+      '--kwidth', dest='kwidth', type=int, default=0,
+      help="Width of the radial gridding kernel. Defaults to 5.")
+    argparmain.add_argument(
+      '--nufft_nrmse', dest='nufft_nrmse', type=float, default=0,
+      help="Target NRMSE of the radial NUFFT. Selects the smallest grid and "
+           "kernel reaching it from the presets.")
+    argparmain.add_argument(
+      '--virtual_coils', dest='virtual_coils', type=int, default=0,
+      help="Number of virtual coils after SVD coil compression. "
+           "Defaults to 0, i.e. no compression.")
+    argparmain.add_argument(
+      '--coil_energy', dest='coil_energy', type=float, default=0,
+      help="Fraction of the signal energy kept by SVD coil compression, "
+           "e.g. 0.95. Defaults to 0, i.e. no compression.")
+    argparmain.add_argument(
+      '--coil_executor', dest='coil_executor', type=str, default='process',
+      choices=['process', 'ipyparallel'],
+      help="Run the coil sensitivity estimation of the slices in a local "
+           "process pool (process, default) or on a running ipcluster "
+           "(ipyparallel, optional dependency).")
     argparmain.add_argument('--out', dest='outdir', type=str,
                             help="Set output directory. Defaults to the input "
                             "file directory")
@@ -846,6 +1174,10 @@ def _parseArguments(args):
       help="Switch between single (False, default) and double "
            "precision (True). Usually, single precision gives high enough "
            "accuracy.")
+    argparmain.add_argument(
+      '--resume', dest='resume', type=str, default='',
+      help="Path to a checkpoint file to resume an interrupted fit from. "
+           "All other arguments need to match the interrupted fit.")
 
     arguments, unknown = argparmain.parse_known_args(args)
     return arguments, unknown
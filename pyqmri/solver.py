@@ -8,9 +8,12 @@ import numpy as np
 from pkg_resources import resource_filename
 import pyopencl as cl
 import pyopencl.array as clarray
+import pyopencl.elementwise as clelem
 import pyopencl.reduction as clred
 import pyqmri.operator as operator
+from pyqmri.transforms import PyOpenCLRadialToeplitz
 from pyqmri._helper_fun import CLProgram as Program
+from pyqmri._helper_fun._memorypool import get_allocator, detach_allocator
 import pyqmri.streaming as streaming
 
 
@@ -38,9 +41,13 @@ class CGSolver:
       SMS : bool
         Simultaneouos Multi Slice. Switch between noraml (0)
         and slice accelerated (1) reconstruction.
+      toeplitz : bool
+        Apply the normal operator of the radial NUFFT via the Toeplitz
+        embedded point spread function instead of gridding in each
+        iteration. Only used for radial (trafo=1) and non-SMS data.
     """
 
-    def __init__(self, par, NScan=1, trafo=1, SMS=0):
+    def __init__(self, par, NScan=1, trafo=1, SMS=0, toeplitz=False):
         self._NSlice = par["NSlice"]
         NScan_save = par["NScan"]
         par["NScan"] = NScan
@@ -49,6 +56,7 @@ class CGSolver:
         self._dimY = par["dimY"]
         self._NC = par["NC"]
         self._queue = par["queue"][0]
+        self._allocator = get_allocator(par)
         file = open(
             resource_filename(
                 'pyqmri', 'kernels/OpenCL_Kernels.c'))
@@ -77,22 +85,69 @@ class CGSolver:
                 self._queue,
                 (self._NScan, self._NC,
                  int(self._NSlice/par["MB"]), par["Nproj"], par["N"]),
-                self._DTYPE, "C")
+                self._DTYPE, "C", allocator=self._allocator)
         else:
             self._tmp_sino = clarray.empty(
                 self._queue,
                 (self._NScan, self._NC,
                  self._NSlice, par["Nproj"], par["N"]),
-                self._DTYPE, "C")
+                self._DTYPE, "C", allocator=self._allocator)
         self._FT = FT.FFT
         self._FTH = FT.FFTH
         self._tmp_result = clarray.empty(
             self._queue,
             (self._NScan, self._NC,
              self._NSlice, self._dimY, self._dimX),
-            self._DTYPE, "C")
+            self._DTYPE, "C", allocator=self._allocator)
+        self._toeplitz = None
+        if toeplitz and trafo and not SMS:
+            self._toeplitz = PyOpenCLRadialToeplitz(
+                par["ctx"][0], self._queue, par,
+                DTYPE=self._DTYPE, DTYPE_real=self._DTYPE_real)
         par["NScan"] = NScan_save
         self._scan_offset = 0
+        self._setupKernels(par["ctx"][0])
+
+    def _setupKernels(self, ctx):
+        if self._DTYPE == np.complex128:
+            ctype = "double2"
+            rtype = "double"
+        else:
+            ctype = "float2"
+            rtype = "float"
+        self._dotkrnl = clred.ReductionKernel(
+            ctx, self._DTYPE_real, 0,
+            reduce_expr="a+b",
+            map_expr="x[i].s0*y[i].s0+x[i].s1*y[i].s1",
+            arguments="__global %s *x, __global %s *y" % (ctype, ctype))
+        self._tikhonovkrnl = clelem.ElementwiseKernel(
+            ctx,
+            "__global %s *Ax, __global %s *p, const %s lambd"
+            % (ctype, ctype, rtype),
+            "Ax[i] += lambd*p[i]",
+            "cg_tikhonov")
+        self._residualkrnl = clelem.ElementwiseKernel(
+            ctx,
+            "__global %s *res, __global %s *b, __global %s *Ax"
+            % (ctype, ctype, ctype),
+            "res[i] = b[i] - Ax[i]",
+            "cg_residual")
+        self._stepkrnl = clelem.ElementwiseKernel(
+            ctx,
+            "__global %s *x, __global %s *res, __global %s *p, "
+            "__global %s *Ap, __global %s *rr, __global %s *pAp"
+            % (ctype, ctype, ctype, ctype, rtype, rtype),
+            "const %s alpha = rr[0]/pAp[0];"
+            "x[i] += alpha*p[i];"
+            "res[i] -= alpha*Ap[i]" % rtype,
+            "cg_step")
+        self._directionkrnl = clelem.ElementwiseKernel(
+            ctx,
+            "__global %s *p, __global %s *res, "
+            "__global %s *rr_new, __global %s *rr"
+            % (ctype, ctype, rtype, rtype),
+            "p[i] = res[i] + rr_new[0]/rr[0]*p[i]",
+            "cg_direction")
 
     def __del__(self):
         """Destructor.
@@ -105,9 +160,10 @@ class CGSolver:
         del self._tmp_sino
         del self._FT
         del self._FTH
+        del self._toeplitz
 
     def run(self, data, iters=30, lambd=1e-5, tol=1e-8, guess=None,
-            scan_offset=0):
+            scan_offset=0, check_interval=5):
         """
         Start the CG reconstruction.
 
@@ -126,6 +182,10 @@ class CGSolver:
             threshold the algorithm is terminated.
           guess : numpy.array
             An optional initial guess for the images. If None, zeros is used.
+          check_interval : int, 5
+            Number of iterations between two evaluations of the termination
+            criterion. All other iterations run without synchronizing with
+            the host.
 
         Returns
         -------
@@ -133,49 +193,79 @@ class CGSolver:
               The result of the image reconstruction.
         """
         self._scan_offset = scan_offset
+        check_interval = max(int(check_interval), 1)
+        shape = (self._NScan, 1, self._NSlice, self._dimY, self._dimX)
+        if guess is not None:
+            x = clarray.to_device(self._queue,
+                                  np.require(guess, self._DTYPE, "C"),
+                                  allocator=self._allocator)
+            x = x.reshape(shape)
+        else:
+            x = clarray.zeros(self._queue, shape,
+                              self._DTYPE, "C", allocator=self._allocator)
+        b = clarray.empty(self._queue, shape,
+                          self._DTYPE, "C", allocator=self._allocator)
+        res = clarray.empty(self._queue, shape,
+                            self._DTYPE, "C", allocator=self._allocator)
+        p = clarray.empty(self._queue, shape,
+                          self._DTYPE, "C", allocator=self._allocator)
+        Ap = clarray.empty(self._queue, shape,
+                           self._DTYPE, "C", allocator=self._allocator)
+
+        data = clarray.to_device(self._queue, data,
+                                 allocator=self._allocator)
+        # The scalars of the reductions are not pooled.
+        detach_allocator(x, b, res, p, Ap, data)
+        b.add_event(self._operator_rhs(b, data))
         if guess is not None:
-            x = clarray.to_device(self._queue, guess)
+            self._applyNormal(Ap, x, lambd)
+            res.add_event(
+                self._residualkrnl(res, b, Ap,
+                                   wait_for=res.events+b.events+Ap.events))
         else:
-            x = clarray.zeros(self._queue,
-                              (self._NScan, 1,
-                               self._NSlice, self._dimY, self._dimX),
-                              self._DTYPE, "C")
-        b = clarray.empty(self._queue,
-                          (self._NScan, 1,
-                           self._NSlice, self._dimY, self._dimX),
-                          self._DTYPE, "C")
-        Ax = clarray.empty(self._queue,
-                           (self._NScan, 1,
-                            self._NSlice, self._dimY, self._dimX),
-                           self._DTYPE, "C")
-
-        data = clarray.to_device(self._queue, data)
-        self._operator_rhs(b, data)
-        res = b
-        p = res
-        delta = np.linalg.norm(res.get())**2/np.linalg.norm(b.get())**2
+            res.add_event(
+                cl.enqueue_copy(self._queue, res.data, b.data,
+                                wait_for=res.events+b.events))
+        p.add_event(
+            cl.enqueue_copy(self._queue, p.data, res.data,
+                            wait_for=p.events+res.events))
+
+        # ||b||^2 is only needed for the relative residual, thus it is
+        # computed once instead of in every convergence test.
+        norm_b = self._dotkrnl(b, b).get()
+        if norm_b == 0:
+            return np.squeeze(x.get())
+        rr = self._dotkrnl(res, res)
 
         for i in range(iters):
-            self._operator_lhs(Ax, p)
-            Ax = Ax + lambd*p
-            alpha = (clarray.vdot(res, res) /
-                     (clarray.vdot(p, Ax))).real.get()
-            x = (x + alpha*p)
-            res_new = res - alpha*Ax
-            delta = np.linalg.norm(res_new.get())**2 /\
-                np.linalg.norm(b.get())**2
-            if delta < tol:
-                print(
-                    "Converged after %i iterations to %1.3e." % (i, delta))
-                del Ax, \
-                    b, res, p, data, res_new
-                return np.squeeze(x.get())
-            beta = (clarray.vdot(res_new, res_new) /
-                    clarray.vdot(res, res)).real.get()
-            p = res_new+beta*p
-            (res, res_new) = (res_new, res)
-        del Ax, b, res, p, data, res_new
-        return np.squeeze(x.get())
+            self._applyNormal(Ap, p, lambd)
+            pAp = self._dotkrnl(p, Ap)
+            step = self._stepkrnl(x, res, p, Ap, rr, pAp,
+                                  wait_for=(x.events+res.events+p.events +
+                                            Ap.events+rr.events+pAp.events))
+            x.add_event(step)
+            res.add_event(step)
+            rr_new = self._dotkrnl(res, res)
+            if not (i+1) % check_interval or i == iters-1:
+                delta = rr_new.get()/norm_b
+                if delta < tol:
+                    print(
+                        "Converged after %i iterations to %1.3e." % (i, delta))
+                    break
+            p.add_event(
+                self._directionkrnl(p, res, rr_new, rr,
+                                    wait_for=(p.events+res.events +
+                                              rr_new.events+rr.events)))
+            rr = rr_new
+        result = np.squeeze(x.get())
+        del Ap, b, res, p, data
+        return result
+
+    def _applyNormal(self, out, x, lambd):
+        out.add_event(self._operator_lhs(out, x))
+        out.add_event(
+            self._tikhonovkrnl(out, x, self._DTYPE_real(lambd),
+                               wait_for=out.events+x.events))
 
     def eval_fwd_kspace_cg(self, y, x, wait_for=None):
         """Apply forward operator for image reconstruction.
@@ -226,6 +316,11 @@ class CGSolver:
             wait_for = []
         self._tmp_result.add_event(self.eval_fwd_kspace_cg(
             self._tmp_result, x, wait_for=self._tmp_result.events+x.events))
+        if self._toeplitz is not None:
+            self._tmp_result.add_event(self._toeplitz.FFTHFFT(
+                self._tmp_result, self._tmp_result,
+                scan_offset=self._scan_offset))
+            return self._adjointCoils(out, wait_for)
         self._tmp_sino.add_event(self._FT(
             self._tmp_sino, self._tmp_result, scan_offset=self._scan_offset))
         return self._operator_rhs(out, self._tmp_sino)
@@ -252,6 +347,9 @@ class CGSolver:
         self._tmp_result.add_event(self._FTH(
             self._tmp_result, x, wait_for=wait_for+x.events,
             scan_offset=self._scan_offset))
+        return self._adjointCoils(out, wait_for)
+
+    def _adjointCoils(self, out, wait_for):
         return self._prg.operator_ad_cg(self._queue,
                                         (self._NSlice, self._dimY,
                                          self._dimX),
@@ -343,6 +441,15 @@ class PDBaseSolver:
         list of maximal values, one for each unknown
       real_const : list of int
         list if a unknown is constrained to real values only. (1 True, 0 False)
+      warmstart : bool
+        Reuse the dual variables and v of the previous call to run as
+        starting point instead of zeros. The variables stay allocated until
+        resetWarmStart is called.
+      last_iters : int
+        Number of iterations performed by the last call to run.
+      converged : bool
+        True if the last call to run stopped before reaching the maximum
+        number of iterations because of the tolerance or stagnation checks.
     """
 
     def __init__(self,
@@ -382,6 +489,11 @@ class PDBaseSolver:
         self.min_const = None
         self.max_const = None
         self.real_const = None
+        self.warmstart = irgn_par.get("warmstart", False)
+        self._warmstart_vars = None
+        self._allocator = get_allocator(par)
+        self.last_iters = 0
+        self.converged = False
         self._kernelsize = (par["par_slices"] + par["overlap"], par["dimY"],
                             par["dimX"])
         self.abskrnl = clred.ReductionKernel(
@@ -608,7 +720,7 @@ class PDBaseSolver:
          dual_vars_new,
          tmp_results_adjoint,
          tmp_results_adjoint_new,
-         data) = self._setupVariables(inp, data)
+         data) = self._getVariables(inp, data)
 
         self._updateInitial(
             out_fwd=tmp_results_forward,
@@ -617,7 +729,10 @@ class PDBaseSolver:
             in_dual=dual_vars
             )
 
+        self.last_iters = 0
+        self.converged = False
         for i in range(iters):
+            self.last_iters = i+1
             self._updatePrimal(
                 out_primal=primal_vars_new,
                 out_fwd=tmp_results_forward_new,
@@ -701,6 +816,7 @@ class PDBaseSolver:
         (i+1,
          np.abs(primal[-2] - primal[-1])/primal[1],
          self.tol))
+                self.converged = True
                 return primal_vars
             if np.abs(np.abs(dual[-2] - dual[-1])/dual[1]) <\
                self.tol:
@@ -711,6 +827,7 @@ class PDBaseSolver:
         (i+1,
          np.abs(np.abs(dual[-2] - dual[-1])/dual[1]),
          self.tol))
+                self.converged = True
                 return primal_vars
             if (
                 len(gap)>40 and 
@@ -722,6 +839,7 @@ class PDBaseSolver:
         "because the method stagnated. Relative difference: %.3e" % 
         (i+1, np.abs(np.mean(gap[-20:-10]) - np.mean(gap[-10:]))
                  /np.mean(gap[-20:-10])))
+                self.converged = True
                 return primal_vars
             if np.abs((gap[-1] - gap[-2]) / gap[1]) < self.tol:
                 print(
@@ -729,6 +847,7 @@ class PDBaseSolver:
         "decrease in the PD-gap was %.3e which is below the "
         "relative tolerance of %.3e" 
         % (i+1, np.abs((gap[-1] - gap[-2]) / gap[1]), self.tol))
+                self.converged = True
                 return primal_vars
             sys.stdout.write(
                 "Iteration: %04d ---- Primal: %2.2e, "
@@ -786,6 +905,66 @@ class PDBaseSolver:
     def _setupVariables(self, inp, data):
         return ({}, {}, {}, {}, {}, {}, {}, {}, {})
 
+    def _getVariables(self, inp, data):
+        if self.warmstart and self._warmstart_vars is not None:
+            return self._reuseVariables(inp, data)
+        variables = self._setupVariables(inp, data)
+        # Temporaries of the array arithmetic and reductions are not pooled.
+        for group in variables:
+            if isinstance(group, dict):
+                detach_allocator(*group.values())
+            else:
+                detach_allocator(group)
+        if self.warmstart:
+            self._warmstart_vars = variables
+        return variables
+
+    def _reuseVariables(self, inp, data):
+        variables = list(self._warmstart_vars)
+        primal_vars = variables[0]
+        if isinstance(primal_vars["x"], np.ndarray):
+            primal_vars["x"] = inp
+            primal_vars["xk"][...] = inp
+            variables[-1] = data
+        else:
+            self._queue[0].finish()
+            inp = np.require(inp, self._DTYPE, 'C')
+            primal_vars["x"].set(inp)
+            primal_vars["xk"].set(inp)
+            variables[-1].set(np.require(data, self._DTYPE, 'C'))
+        self._warmstart_vars = tuple(variables)
+        return self._warmstart_vars
+
+    def rescaleWarmStart(self, scale):
+        """Rescale the stored v to the new scaling of the unknowns.
+
+        Needs to be called whenever the unknowns are rescaled between two
+        calls to run, e.g. after balancing the model gradients.
+
+        Parameters
+        ----------
+          scale : numpy.array
+            The factor each unknown was multiplied with.
+        """
+        if self._warmstart_vars is None:
+            return
+        if "v" not in self._warmstart_vars[0]:
+            return
+        for uk in range(self.unknowns):
+            self._warmstart_vars[0]["v"][self._unknownIndex(uk)] *= \
+                self._DTYPE_real(scale[uk])
+
+    def _unknownIndex(self, uk):
+        return uk
+
+    def resetWarmStart(self):
+        """Discard the stored variables of a warm started optimization.
+
+        The next call to run starts from zero dual variables again and
+        the memory of the stored variables is released.
+        """
+        self._warmstart_vars = None
+
     def _updateConstraints(self):
         num_const = (len(self.model.constraints))
         min_const = np.zeros((num_const), dtype=self._DTYPE_real)
@@ -1178,14 +1357,16 @@ class PDSolverTV(PDBaseSolver):
 
     def _setupVariables(self, inp, data):
 
-        data = clarray.to_device(self._queue[0], data.astype(self._DTYPE))
+        data = clarray.to_device(self._queue[0], data.astype(self._DTYPE),
+                                 allocator=self._allocator)
 
         primal_vars = {}
         primal_vars_new = {}
         tmp_results_adjoint = {}
         tmp_results_adjoint_new = {}
 
-        primal_vars["x"] = clarray.to_device(self._queue[0], inp)
+        primal_vars["x"] = clarray.to_device(self._queue[0], inp,
+                                             allocator=self._allocator)
         primal_vars["xk"] = primal_vars["x"].copy()
         primal_vars_new["x"] = clarray.empty_like(primal_vars["x"])
 
@@ -1199,12 +1380,14 @@ class PDSolverTV(PDBaseSolver):
         dual_vars["r"] = clarray.zeros(
             self._queue[0],
             data.shape,
-            dtype=self._DTYPE)
+            dtype=self._DTYPE,
+            allocator=self._allocator)
         dual_vars_new["r"] = clarray.empty_like(dual_vars["r"])
 
         dual_vars["z1"] = clarray.zeros(self._queue[0],
                                         primal_vars["x"].shape+(4,),
-                                        dtype=self._DTYPE)
+                                        dtype=self._DTYPE,
+                                        allocator=self._allocator)
         dual_vars_new["z1"] = clarray.empty_like(dual_vars["z1"])
 
         tmp_results_forward["gradx"] = clarray.empty_like(
@@ -1425,19 +1608,22 @@ class PDSolverTGV(PDBaseSolver):
 
     def _setupVariables(self, inp, data):
 
-        data = clarray.to_device(self._queue[0], data.astype(self._DTYPE))
+        data = clarray.to_device(self._queue[0], data.astype(self._DTYPE),
+                                 allocator=self._allocator)
 
         primal_vars = {}
         primal_vars_new = {}
         tmp_results_adjoint = {}
         tmp_results_adjoint_new = {}
 
-        primal_vars["x"] = clarray.to_device(self._queue[0], inp)
+        primal_vars["x"] = clarray.to_device(self._queue[0], inp,
+                                             allocator=self._allocator)
         primal_vars["xk"] = primal_vars["x"].copy()
         primal_vars_new["x"] = clarray.empty_like(primal_vars["x"])
         primal_vars["v"] = clarray.zeros(self._queue[0],
                                          primal_vars["x"].shape+(4,),
-                                         dtype=self._DTYPE)
+                                         dtype=self._DTYPE,
+                                         allocator=self._allocator)
         primal_vars_new["v"] = clarray.empty_like(primal_vars["v"])
 
         tmp_results_adjoint["Kyk1"] = clarray.empty_like(primal_vars["x"])
@@ -1452,16 +1638,19 @@ class PDSolverTGV(PDBaseSolver):
         dual_vars["r"] = clarray.zeros(
             self._queue[0],
             data.shape,
-            dtype=self._DTYPE)
+            dtype=self._DTYPE,
+            allocator=self._allocator)
         dual_vars_new["r"] = clarray.empty_like(dual_vars["r"])
 
         dual_vars["z1"] = clarray.zeros(self._queue[0],
                                         primal_vars["x"].shape+(4,),
-                                        dtype=self._DTYPE)
+                                        dtype=self._DTYPE,
+                                        allocator=self._allocator)
         dual_vars_new["z1"] = clarray.empty_like(dual_vars["z1"])
         dual_vars["z2"] = clarray.zeros(self._queue[0],
                                         primal_vars["x"].shape+(8,),
-                                        dtype=self._DTYPE)
+                                        dtype=self._DTYPE,
+                                        allocator=self._allocator)
         dual_vars_new["z2"] = clarray.empty_like(dual_vars["z2"])
 
         tmp_results_forward["gradx"] = clarray.empty_like(
@@ -1753,6 +1942,10 @@ class PDSolverStreamed(PDBaseSolver):
             self._expdim_dat = 2
             self._expdim_C = 1
 
+    def _unknownIndex(self, uk):
+        # Streamed variables are stored slice first.
+        return (slice(None), uk)
+
     def _setup_reg_tmp_arrays(self, reg_type, SMS=False):
         if reg_type == 'TV':
             pass
@@ -54,6 +54,70 @@ class PyOpenCLnuFFT():
         self.prg = None
         self.fft_dim = fft_dim
 
+    def _setupFFT(self, par, nblocks, mem_fraction=0.25):
+        """Set up the FFT plans for the temporary array.
+
+        The temporary array consists of nblocks blocks of par_fft images.
+        Each enqueue transforms as many blocks as set in par["fft_batch"],
+        either one value for all devices or a list with one value per
+        device. Without a setting, all blocks are transformed at once if
+        mem_fraction of the device memory can hold them, such that
+        temporary buffers of the FFT fit as well.
+
+        Parameters
+        ----------
+          par : dict
+            A python dict containing the context of each device (ctx) and
+            optionally the number of blocks per FFT (fft_batch).
+          nblocks : int
+            The number of blocks in the temporary array.
+          mem_fraction : float, 0.25
+            Fraction of the device memory usable by one batched FFT.
+        """
+        block_bytes = self._tmp_fft_array[0:self.par_fft].nbytes
+        batch = par.get("fft_batch")
+        if isinstance(batch, (list, tuple)):
+            device = 0
+            if self.ctx in par.get("ctx", []):
+                device = par["ctx"].index(self.ctx)
+            batch = batch[min(device, len(batch)-1)] if batch else None
+        if not batch or batch < 1:
+            batch = int(mem_fraction*self.queue.device.global_mem_size
+                        // block_bytes)
+        self._fft_blocks = int(max(1, min(batch, nblocks)))
+        self._fft_plans = {}
+        self.fft = self._fftPlan(self._fft_blocks)
+
+    def _fftPlan(self, nblocks):
+        # Plans are created once per batch size and reused afterwards.
+        if nblocks not in self._fft_plans:
+            tmp = self._tmp_fft_array[0:nblocks*self.par_fft, ...]
+            self._fft_plans[nblocks] = FFT(self.ctx, self.queue, tmp,
+                                           out_array=tmp,
+                                           axes=self.fft_dim)
+        return self._fft_plans[nblocks]
+
+    def _enqueueFFT(self, nblocks, forward=True):
+        """Transform the first nblocks blocks of the temporary array.
+
+        Parameters
+        ----------
+          nblocks : int
+            The number of blocks of par_fft images to transform.
+          forward : bool, True
+            Forward (True) or backward (False) FFT.
+        """
+        for start in range(0, nblocks, self._fft_blocks):
+            stop = min(start + self._fft_blocks, nblocks)
+            tmp = self._tmp_fft_array[
+                start * self.par_fft:stop * self.par_fft, ...]
+            self._tmp_fft_array.add_event(
+                self._fftPlan(stop - start).enqueue_arrays(
+                    data=tmp,
+                    result=tmp,
+                    forward=forward,
+                    wait_for_events=self._tmp_fft_array.events)[0])
+
     @staticmethod
     def create(ctx,
                queue,
@@ -223,7 +287,9 @@ class PyOpenCLRadialNUFFT(PyOpenCLnuFFT):
         number of scans (NScan), image dimensions (dimX, dimY), number of
         coils (NC), sampling points (N) and read outs (NProj)
         a PyOpenCL queue (queue) and the complex coil
-        sensitivities (C).
+        sensitivities (C). Optionally contains the oversampling factor
+        (ogf) of the grid and the kernel width (kwidth), which takes
+        precedence over the argument. Without ogf, the grid has N points.
       kwidth : int
         The width of the sampling kernel for regridding of non-uniform
         kspace samples.
@@ -276,18 +342,20 @@ class PyOpenCLRadialNUFFT(PyOpenCLnuFFT):
             DTYPE=np.complex64,
             DTYPE_real=np.float32):
         super().__init__(ctx, queue, par["fft_dim"], DTYPE, DTYPE_real)
-        self.ogf = par["N"]/par["dimX"]
+        kwidth = par.get("kwidth") or kwidth
+        self._gridsize = _gridSize(par)
+        self.ogf = self._gridsize/par["dimX"]
         self.fft_shape = (
             par["NScan"] *
             par["NC"] *
             par["NSlice"],
-            int(par["dimY"]*self.ogf),
-            int(par["dimX"]*self.ogf))
+            self._gridsize,
+            self._gridsize)
         self.fft_scale = DTYPE_real(
             np.sqrt(np.prod(self.fft_shape[self.fft_dim[0]:])))
 
         (kerneltable, kerneltable_FT) = calckbkernel(
-            kwidth, self.ogf, par["N"], klength)
+            kwidth, self.ogf, self._gridsize, klength)
 
         deapo = 1 / kerneltable_FT.astype(DTYPE_real)
 
@@ -307,31 +375,168 @@ class PyOpenCLRadialNUFFT(PyOpenCLnuFFT):
                 (self.fft_shape),
                 dtype=DTYPE))
         self.par_fft = int(self.fft_shape[0] / par["NScan"])
-        self.fft = FFT(ctx, queue, self._tmp_fft_array[
-            0:self.par_fft, ...],
-                       out_array=self._tmp_fft_array[
-                           0:self.par_fft, ...],
-                       axes=self.fft_dim)
+        self._setupFFT(par, par["NScan"])
 
         self._kernelpoints = kerneltable.size
         self._kwidth = kwidth / 2
-        self._check = np.ones(par["N"], dtype=DTYPE_real)
-        self._check[1::2] = -1
-        self._check = clarray.to_device(self.queue, self._check)
-        self._gridsize = par["N"]
+
+        self._csr = None
+        self._csc = None
+        self._bins = None
+        if par.get("gridding", "lut") == "matrix":
+            self._setupGriddingMatrix(par, kerneltable)
+        elif par.get("gridding", "lut") == "binned":
+            self._setupBins(par, kerneltable)
 
     def __del__(self):
         """Explicitly delete OpenCL Objets."""
         del self.traj
         del self.dcf
+        del self._csr
+        del self._csc
+        del self._bins
         del self._tmp_fft_array
         del self.cl_kerneltable
         del self.cl_deapo
-        del self._check
         del self.queue
         del self.ctx
         del self.prg
         del self.fft
+        del self._fft_plans
+
+    def _setupGriddingMatrix(self, par, kerneltable, mem_fraction=0.25):
+        nscan = par["traj"].shape[0]
+        itemsize = np.dtype(self.DTYPE_real).itemsize
+        needed = _griddingMatrixBytes(
+            nscan, par["Nproj"]*par["N"], self._gridsize**2,
+            self._kwidth, itemsize)
+        device = self.queue.device
+        if needed > mem_fraction*device.global_mem_size:
+            print("Gridding matrix needs up to %.1f MB of device memory. "
+                  "Falling back to lookup table gridding."
+                  % (needed/1024**2))
+            return
+        (rowptr, colind, val, colptr, rowind, val_t) = _griddingMatrix(
+            par["traj"], par["dcf"], kerneltable, self._kwidth,
+            self._gridsize, self.DTYPE_real)
+        if max(val.nbytes, colind.nbytes,
+               colptr.nbytes) > device.max_mem_alloc_size:
+            print("Gridding matrix exceeds the maximum buffer size. "
+                  "Falling back to lookup table gridding.")
+            return
+        self._csr = (clarray.to_device(self.queue, rowptr),
+                     clarray.to_device(self.queue, colind),
+                     clarray.to_device(self.queue, val))
+        self._csc = (clarray.to_device(self.queue, colptr),
+                     clarray.to_device(self.queue, rowind),
+                     clarray.to_device(self.queue, val_t))
+
+    def _setupBins(self, par, kerneltable, tilesize=1):
+        tileptr, sampleind = _binSamples(
+            par["traj"], kerneltable, self._kwidth, self._gridsize,
+            tilesize, self.DTYPE_real)
+        self._bins = (clarray.to_device(self.queue, tileptr),
+                      clarray.to_device(self.queue, sampleind),
+                      tilesize)
+
+    def _grid(self, s, wait_for, scan_offset):
+        if self._bins is not None:
+            # Gather per grid point, thus no zeroing is needed.
+            tileptr, sampleind, tilesize = self._bins
+            return self.prg.grid_binned(
+                self.queue,
+                (s.shape[0], s.shape[1] * s.shape[2],
+                 self.fft_shape[1] * self.fft_shape[2]),
+                None,
+                self._tmp_fft_array.data,
+                s.data,
+                self.traj.data,
+                tileptr.data,
+                sampleind.data,
+                np.int32(self._gridsize),
+                np.int32(s.shape[-2] * s.shape[-1]),
+                self.DTYPE_real(self._kwidth / self._gridsize),
+                self.dcf.data,
+                self.cl_kerneltable,
+                np.int32(self._kernelpoints),
+                np.int32(tilesize),
+                np.int32(scan_offset),
+                wait_for=(wait_for + s.events +
+                          self._tmp_fft_array.events))
+        if self._csc is not None:
+            # Every grid point is written, thus no zeroing is needed.
+            colptr, rowind, val = self._csc
+            return self.prg.grid_csc(
+                self.queue,
+                (s.shape[0], s.shape[1] * s.shape[2],
+                 self.fft_shape[1] * self.fft_shape[2]),
+                None,
+                self._tmp_fft_array.data,
+                s.data,
+                colptr.data,
+                rowind.data,
+                val.data,
+                np.int32(s.shape[-2] * s.shape[-1]),
+                np.int32(scan_offset),
+                wait_for=(wait_for + s.events +
+                          self._tmp_fft_array.events))
+        self._tmp_fft_array.add_event(
+            self.prg.zero_tmp(
+                self.queue,
+                (self._tmp_fft_array.size,
+                 ),
+                None,
+                self._tmp_fft_array.data,
+                wait_for=s.events +
+                self._tmp_fft_array.events +
+                wait_for))
+        return self.prg.grid_lut(
+            self.queue,
+            (s.shape[0], s.shape[1] * s.shape[2],
+             s.shape[-2] * s.shape[-1]),
+            None,
+            self._tmp_fft_array.data,
+            s.data,
+            self.traj.data,
+            np.int32(self._gridsize),
+            self.DTYPE_real(self._kwidth / self._gridsize),
+            self.dcf.data,
+            self.cl_kerneltable,
+            np.int32(self._kernelpoints),
+            np.int32(scan_offset),
+            wait_for=(wait_for + s.events + self._tmp_fft_array.events))
+
+    def _invgrid(self, s, wait_for, scan_offset):
+        if self._csr is not None:
+            rowptr, colind, val = self._csr
+            return self.prg.invgrid_csr(
+                self.queue,
+                (s.shape[0], s.shape[1] * s.shape[2],
+                 s.shape[-2] * s.shape[-1]),
+                None,
+                s.data,
+                self._tmp_fft_array.data,
+                rowptr.data,
+                colind.data,
+                val.data,
+                np.int32(self.fft_shape[1] * self.fft_shape[2]),
+                np.int32(scan_offset),
+                wait_for=s.events + wait_for + self._tmp_fft_array.events)
+        return self.prg.invgrid_lut(
+            self.queue,
+            (s.shape[0], s.shape[1] * s.shape[2], s.shape[-2] *
+             s.shape[-1]),
+            None,
+            s.data,
+            self._tmp_fft_array.data,
+            self.traj.data,
+            np.int32(self._gridsize),
+            self.DTYPE_real(self._kwidth / self._gridsize),
+            self.dcf.data,
+            self.cl_kerneltable,
+            np.int32(self._kernelpoints),
+            np.int32(scan_offset),
+            wait_for=s.events + wait_for + self._tmp_fft_array.events)
 
     def FFTH(self, sg, s, wait_for=None, scan_offset=0):
         """Perform the inverse (adjoint) NUFFT operation.
@@ -353,63 +558,12 @@ class PyOpenCLRadialNUFFT(PyOpenCLnuFFT):
         """
         if wait_for is None:
             wait_for = []
-        # Zero tmp arrays
-        self._tmp_fft_array.add_event(
-            self.prg.zero_tmp(
-                self.queue,
-                (self._tmp_fft_array.size,
-                 ),
-                None,
-                self._tmp_fft_array.data,
-                wait_for=s.events +
-                sg.events +
-                self._tmp_fft_array.events +
-                wait_for))
-        # Grid k-space
+        # Grid k-space, the checkerboard modulation of the centered FFT is
+        # applied in gridding and deapodization.
         self._tmp_fft_array.add_event(
-            self.prg.grid_lut(
-                self.queue,
-                (s.shape[0], s.shape[1] * s.shape[2],
-                 s.shape[-2] * self._gridsize),
-                None,
-                self._tmp_fft_array.data,
-                s.data,
-                self.traj.data,
-                np.int32(self._gridsize),
-                self.DTYPE_real(self._kwidth / self._gridsize),
-                self.dcf.data,
-                self.cl_kerneltable,
-                np.int32(self._kernelpoints),
-                np.int32(scan_offset),
-                wait_for=(wait_for + sg.events +
-                          s.events + self._tmp_fft_array.events)))
+            self._grid(s, wait_for + sg.events, scan_offset))
         # FFT
-        self._tmp_fft_array.add_event(
-            self.prg.fftshift(
-                self.queue,
-                (self.fft_shape[0],
-                 self.fft_shape[1],
-                 self.fft_shape[2]),
-                None,
-                self._tmp_fft_array.data,
-                self._check.data))
-        for j in range(s.shape[0]):
-            self._tmp_fft_array.add_event(
-                self.fft.enqueue_arrays(
-                    data=self._tmp_fft_array[
-                        j * self.par_fft:(j + 1) * self.par_fft, ...],
-                    result=self._tmp_fft_array[
-                        j * self.par_fft:(j + 1) * self.par_fft, ...],
-                    forward=False)[0])
-        self._tmp_fft_array.add_event(
-            self.prg.fftshift(
-                self.queue,
-                (self.fft_shape[0],
-                 self.fft_shape[1],
-                 self.fft_shape[2]),
-                None,
-                self._tmp_fft_array.data,
-                self._check.data))
+        self._enqueueFFT(s.shape[0], forward=False)
         return self.prg.deapo_adj(
             self.queue,
             (sg.shape[0] * sg.shape[1] *
@@ -421,6 +575,7 @@ class PyOpenCLRadialNUFFT(PyOpenCLnuFFT):
             np.int32(self._tmp_fft_array.shape[-1]),
             self.DTYPE_real(self.fft_scale),
             self.DTYPE_real(self.ogf),
+            np.int32(1),
             wait_for=(wait_for + sg.events + s.events +
                       self._tmp_fft_array.events))
 
@@ -444,76 +599,264 @@ class PyOpenCLRadialNUFFT(PyOpenCLnuFFT):
         """
         if wait_for is None:
             wait_for = []
-        # Zero tmp arrays
-        self._tmp_fft_array.add_event(
-            self.prg.zero_tmp(
-                self.queue,
-                (self._tmp_fft_array.size,
-                 ),
-                None,
-                self._tmp_fft_array.data,
-                wait_for=s.events +
-                sg.events +
-                self._tmp_fft_array.events +
-                wait_for))
-        # Deapodization and Scaling
+        # Zero padding, deapodization, scaling and the checkerboard
+        # modulation of the centered FFT in one pass over the grid.
         self._tmp_fft_array.add_event(
             self.prg.deapo_fwd(
                 self.queue,
                 (sg.shape[0] * sg.shape[1] * sg.shape[2],
-                 sg.shape[3], sg.shape[4]),
+                 self.fft_shape[1], self.fft_shape[2]),
                 None,
                 self._tmp_fft_array.data,
                 sg.data,
                 self.cl_deapo,
-                np.int32(self._tmp_fft_array.shape[-1]),
+                np.int32(sg.shape[4]),
+                np.int32(sg.shape[3]),
                 self.DTYPE_real(1 / self.fft_scale),
                 self.DTYPE_real(self.ogf),
-                wait_for=wait_for + sg.events + self._tmp_fft_array.events))
+                np.int32(1),
+                wait_for=(wait_for + s.events + sg.events +
+                          self._tmp_fft_array.events)))
         # FFT
+        self._enqueueFFT(s.shape[0], forward=True)
+        # Resample on Spoke
+        return self._invgrid(s, wait_for, scan_offset)
+
+
+class PyOpenCLRadialToeplitz(PyOpenCLnuFFT):
+    """Toeplitz embedded normal operator of the radial NUFFT.
+
+    The composition of forward and adjoint radial NUFFT is a convolution
+    with the point spread function (PSF) of the trajectory. This class
+    precomputes the PSF of each scan on the grid of twice the image size
+    and applies the normal operator as zero padding, FFT, multiplication
+    with the transformed PSF, inverse FFT and cropping. Thus, no gridding
+    is needed in iterative reconstructions.
+
+    Parameters
+    ----------
+      ctx : PyOpenCL.Context
+        The context for the PyOpenCL computations.
+      queue : PyOpenCL.Queue
+        The computation Queue for the PyOpenCL kernels.
+      par : dict
+        A python dict containing the necessary information to
+        setup the object. Needs to contain the number of slices (NSlice),
+        number of scans (NScan), image dimensions (dimX, dimY), number of
+        coils (NC), sampling points (N) and read outs (NProj) as well as
+        the trajectory (traj) and density compensation (dcf) of all scans.
+      kwidth : int
+        The width of the sampling kernel of the NUFFT used to compute the
+        PSF.
+      klength : int
+        The length of the kernel lookup table which samples the contineous
+        gridding kernel.
+      DTYPE : Numpy.dtype
+        The comlex precision type. Currently complex64 is used.
+      DTYPE_real : Numpy.dtype
+        The real precision type. Currently float32 is used.
+
+    Attributes
+    ----------
+      fft_shape : tuple of ints
+        3 dimensional tuple. Dim 0 containts all Scans, Coils and Slices.
+        Dim 1 and 2 the doubled image dimensions.
+      psf : PyOpenCL.Array
+        The Fourier transformed PSF of each acquired scan.
+      par_fft : int
+        The number of parallel fft calls. Typically it iterates over the
+        Scans.
+      fft : gpyfft.fft.FFT
+        The fft object created from gpyfft (A wrapper for clFFT).
+      prg : PyOpenCL.Program
+        The PyOpenCL.Program object containing the necessary kernels to
+        execute the linear Operator.
+    """
+
+    def __init__(
+            self,
+            ctx,
+            queue,
+            par,
+            kwidth=5,
+            klength=200,
+            DTYPE=np.complex64,
+            DTYPE_real=np.float32):
+        super().__init__(ctx, queue, [-2, -1], DTYPE, DTYPE_real)
+        if DTYPE == np.complex128:
+            file = open(
+                resource_filename(
+                    'pyqmri', 'kernels/OpenCL_gridding_double.c'))
+        else:
+            file = open(
+                resource_filename(
+                    'pyqmri', 'kernels/OpenCL_gridding_single.c'))
+        self.prg = Program(self.ctx, file.read())
+        file.close()
+
+        self.fft_shape = (
+            par["NScan"] *
+            par["NC"] *
+            par["NSlice"],
+            2*par["dimY"],
+            2*par["dimX"])
+        self.psf = clarray.to_device(
+            self.queue, self._computePSF(par, kwidth, klength))
+        self._ones = cl.Buffer(
+            self.ctx,
+            cl.mem_flags.READ_ONLY | cl.mem_flags.COPY_HOST_PTR,
+            hostbuf=np.ones(max(par["dimY"], par["dimX"]),
+                            dtype=DTYPE_real).data)
+        self._tmp_fft_array = (
+            clarray.empty(
+                self.queue,
+                (self.fft_shape),
+                dtype=DTYPE))
+        self.par_fft = int(self.fft_shape[0] / par["NScan"])
+        self._setupFFT(par, par["NScan"])
+
+    def __del__(self):
+        """Explicitly delete OpenCL Objets."""
+        del self.psf
+        del self._ones
+        del self._tmp_fft_array
+        del self.queue
+        del self.ctx
+        del self.prg
+        del self.fft
+        del self._fft_plans
+
+    def _computePSF(self, par, kwidth, klength):
+        dimY = par["dimY"]
+        dimX = par["dimX"]
+        N = par["N"]
+        single = {"NScan": 1, "NC": 1, "NSlice": 1, "fft_dim": [-2, -1],
+                  "gridding": "lut"}
+
+        # Twice the image size needs a grid of twice the size at the same
+        # overgridding. The additional readout points carry no weight.
+        psf_par = dict(par, **single)
+        psf_par["dimY"] = 2*dimY
+        psf_par["dimX"] = 2*dimX
+        psf_par["N"] = 2*N
+        psf_par["traj"] = np.require(
+            np.pad(par["traj"], [(0, 0)]*(par["traj"].ndim-1) + [(0, N)]),
+            requirements='C')
+        psf_par["dcf"] = np.require(
+            np.pad(par["dcf"], [(0, 0)]*(par["dcf"].ndim-1) + [(0, N)]),
+            requirements='C')
+        nufft = PyOpenCLnuFFT.create(
+            self.ctx, self.queue, psf_par, kwidth=kwidth, klength=klength,
+            DTYPE=self.DTYPE, DTYPE_real=self.DTYPE_real, radial=True)
+        # Forward and adjoint NUFFT both weight with the density
+        # compensation, thus the PSF is the adjoint of the dcf itself.
+        weights = clarray.to_device(
+            self.queue,
+            np.require(np.reshape(psf_par["dcf"], (1, 1, 1, -1, 2*N)),
+                       self.DTYPE, 'C'))
+        img = clarray.empty(self.queue, (1, 1, 1, 2*dimY, 2*dimX),
+                            dtype=self.DTYPE)
+        psf = np.zeros((par["traj"].shape[0], 2*dimY, 2*dimX),
+                       dtype=self.DTYPE)
+        for scan in range(psf.shape[0]):
+            nufft.FFTH(img, weights, scan_offset=scan).wait()
+            psf[scan] = img.get()[0, 0, 0]
+        del nufft, weights, img
+
+        # The NUFFT scaling depends on the grid size. Match the PSF to the
+        # gridding based normal operator applied to a centered impulse.
+        nufft = PyOpenCLnuFFT.create(
+            self.ctx, self.queue, dict(par, **single),
+            kwidth=kwidth, klength=klength,
+            DTYPE=self.DTYPE, DTYPE_real=self.DTYPE_real, radial=True)
+        delta = np.zeros((1, 1, 1, dimY, dimX), dtype=self.DTYPE)
+        delta[..., dimY//2, dimX//2] = 1
+        delta = clarray.to_device(self.queue, delta)
+        kspace = clarray.empty(self.queue,
+                               (1, 1, 1, par["Nproj"], N),
+                               dtype=self.DTYPE)
+        img = clarray.empty(self.queue, (1, 1, 1, dimY, dimX),
+                            dtype=self.DTYPE)
+        kspace.add_event(nufft.FFT(kspace, delta))
+        nufft.FFTH(img, kspace).wait()
+        reference = img.get()[0, 0, 0]
+        del nufft, delta, kspace, img
+        shifted = psf[0,
+                      dimY-dimY//2:2*dimY-dimY//2,
+                      dimX-dimX//2:2*dimX-dimX//2]
+        scale = np.vdot(shifted, reference)/np.vdot(shifted, shifted)
+
+        return np.require(
+            scale*np.fft.fft2(np.fft.ifftshift(psf, axes=(-2, -1))),
+            self.DTYPE, 'C')
+
+    def FFTHFFT(self, out, inp, wait_for=None, scan_offset=0):
+        """Apply the composition of adjoint and forward NUFFT.
+
+        Parameters
+        ----------
+          out : PyOpenCL.Array
+            The complex image data after application of the normal
+            operator. Can be the same as inp.
+          inp : PyOpenCL.Array
+            The complex image data.
+          wait_for : list of PyopenCL.Event, None
+            A List of PyOpenCL events to wait for.
+          scan_offset : int, 0
+            Offset compared to the first acquired scan.
+
+        Returns
+        -------
+          PyOpenCL.Event: A PyOpenCL event to wait for.
+        """
+        if wait_for is None:
+            wait_for = []
+        # Zero padding
         self._tmp_fft_array.add_event(
-            self.prg.fftshift(
+            self.prg.deapo_fwd(
                 self.queue,
-                (self.fft_shape[0],
-                 self.fft_shape[1],
-                 self.fft_shape[2]),
+                (inp.shape[0] * inp.shape[1] * inp.shape[2],
+                 self.fft_shape[1], self.fft_shape[2]),
                 None,
                 self._tmp_fft_array.data,
-                self._check.data))
-
-        for j in range(s.shape[0]):
-            self._tmp_fft_array.add_event(
-                self.fft.enqueue_arrays(
-                    data=self._tmp_fft_array[
-                        j * self.par_fft:(j + 1) * self.par_fft, ...],
-                    result=self._tmp_fft_array[
-                        j * self.par_fft:(j + 1) * self.par_fft, ...],
-                    forward=True)[0])
+                inp.data,
+                self._ones,
+                np.int32(inp.shape[4]),
+                np.int32(inp.shape[3]),
+                self.DTYPE_real(1),
+                self.DTYPE_real(2),
+                np.int32(0),
+                wait_for=(wait_for + inp.events +
+                          self._tmp_fft_array.events)))
+        self._enqueueFFT(inp.shape[0], forward=True)
         self._tmp_fft_array.add_event(
-            self.prg.fftshift(
+            self.prg.toeplitz_psf(
                 self.queue,
                 (self.fft_shape[0],
                  self.fft_shape[1],
                  self.fft_shape[2]),
                 None,
                 self._tmp_fft_array.data,
-                self._check.data))
-        # Resample on Spoke
-        return self.prg.invgrid_lut(
+                self.psf.data,
+                np.int32(self.par_fft),
+                np.int32(scan_offset),
+                wait_for=self._tmp_fft_array.events + self.psf.events))
+        self._enqueueFFT(inp.shape[0], forward=False)
+        # Cropping
+        return self.prg.deapo_adj(
             self.queue,
-            (s.shape[0], s.shape[1] * s.shape[2], s.shape[-2] *
-             self._gridsize),
+            (out.shape[0] * out.shape[1] *
+             out.shape[2], out.shape[3], out.shape[4]),
             None,
-            s.data,
+            out.data,
             self._tmp_fft_array.data,
-            self.traj.data,
-            np.int32(self._gridsize),
-            self.DTYPE_real(self._kwidth / self._gridsize),
-            self.dcf.data,
-            self.cl_kerneltable,
-            np.int32(self._kernelpoints),
-            np.int32(scan_offset),
-            wait_for=s.events + wait_for + self._tmp_fft_array.events)
+            self._ones,
+            np.int32(self._tmp_fft_array.shape[-1]),
+            self.DTYPE_real(1),
+            self.DTYPE_real(2),
+            np.int32(0),
+            wait_for=(wait_for + out.events +
+                      self._tmp_fft_array.events))
 
 
 class PyOpenCLCartNUFFT(PyOpenCLnuFFT):
@@ -586,17 +929,14 @@ class PyOpenCLCartNUFFT(PyOpenCLnuFFT):
                     dtype=DTYPE))
             self.par_fft = int(self.fft_shape[0] / par["NScan"] / par["NC"])
             self.mask = clarray.to_device(self.queue, par["mask"])
-            self.fft = FFT(ctx, queue, self._tmp_fft_array[
-                0:self.par_fft, ...],
-                           out_array=self._tmp_fft_array[
-                               0:self.par_fft, ...],
-                           axes=self.fft_dim)
+            self._setupFFT(par, par["NScan"]*par["NC"])
 
     def __del__(self):
         """Explicitly delete OpenCL Objets."""
         if self.fft_dim is not None:
             del self._tmp_fft_array
             del self.fft
+            del self._fft_plans
             del self.mask
         del self.queue
         del self.ctx
@@ -632,14 +972,7 @@ class PyOpenCLCartNUFFT(PyOpenCLnuFFT):
                     s.data,
                     self.mask.data,
                     wait_for=s.events+self._tmp_fft_array.events+wait_for))
-            for j in range(np.prod(s.shape[0:2])):
-                self._tmp_fft_array.add_event(
-                    self.fft.enqueue_arrays(
-                        data=self._tmp_fft_array[
-                            j * self.par_fft:(j + 1) * self.par_fft, ...],
-                        result=self._tmp_fft_array[
-                            j * self.par_fft:(j + 1) * self.par_fft, ...],
-                        forward=False)[0])
+            self._enqueueFFT(np.prod(s.shape[0:2]), forward=False)
             return (
                 self.prg.copy(
                     self.queue,
@@ -695,14 +1028,7 @@ class PyOpenCLCartNUFFT(PyOpenCLnuFFT):
                         self.fft_scale),
                     wait_for=s.events+self._tmp_fft_array.events+wait_for))
 
-            for j in range(np.prod(s.shape[0:2])):
-                self._tmp_fft_array.add_event(
-                    self.fft.enqueue_arrays(
-                        data=self._tmp_fft_array[
-                            j * self.par_fft:(j + 1) * self.par_fft, ...],
-                        result=self._tmp_fft_array[
-                            j * self.par_fft:(j + 1) * self.par_fft, ...],
-                        forward=True)[0])
+            self._enqueueFFT(np.prod(s.shape[0:2]), forward=True)
             return (
                 self.prg.maskingcpy(
                     self.queue,
@@ -806,17 +1132,14 @@ class PyOpenCLSMSNUFFT(PyOpenCLnuFFT):
                     self.queue,
                     self.fft_shape,
                     dtype=DTYPE))
-            self.fft = FFT(ctx, queue, self._tmp_fft_array[
-                0:self.par_fft, ...],
-                           out_array=self._tmp_fft_array[
-                               0:self.par_fft, ...],
-                           axes=self.fft_dim)
+            self._setupFFT(par, par["NScan"])
 
     def __del__(self):
         """Explicitly delete OpenCL Objets."""
         if self.fft_dim is not None:
             del self._tmp_fft_array
             del self.fft
+            del self._fft_plans
         del self.mask
         del self.queue
         del self.ctx
@@ -859,14 +1182,7 @@ class PyOpenCLSMSNUFFT(PyOpenCLnuFFT):
                     self.DTYPE_real(self.fft_scale),
                     np.int32(sg.shape[2]/self.packs/self.MB),
                     wait_for=s.events+wait_for))
-            for j in range(s.shape[0]):
-                self._tmp_fft_array.add_event(
-                    self.fft.enqueue_arrays(
-                        data=self._tmp_fft_array[
-                            j * self.par_fft:(j + 1) * self.par_fft, ...],
-                        result=self._tmp_fft_array[
-                            j * self.par_fft:(j + 1) * self.par_fft, ...],
-                        forward=False)[0])
+            self._enqueueFFT(s.shape[0], forward=False)
 
             return (self.prg.copy(self.queue,
                                   (sg.size,),
@@ -923,14 +1239,7 @@ class PyOpenCLSMSNUFFT(PyOpenCLnuFFT):
                     self.DTYPE_real(1 / self.fft_scale),
                     wait_for=self._tmp_fft_array.events+sg.events+wait_for))
 
-            for j in range(s.shape[0]):
-                self._tmp_fft_array.add_event(
-                    self.fft.enqueue_arrays(
-                        data=self._tmp_fft_array[
-                            j * self.par_fft:(j + 1) * self.par_fft, ...],
-                        result=self._tmp_fft_array[
-                            j * self.par_fft:(j + 1) * self.par_fft, ...],
-                        forward=True)[0])
+            self._enqueueFFT(s.shape[0], forward=True)
 
             return (
                 self.prg.copy_SMS_fwdkspace(
@@ -982,7 +1291,9 @@ class PyOpenCLRadialNUFFTStreamed(PyOpenCLnuFFT):
         number of scans (NScan), image dimensions (dimX, dimY), number of
         coils (NC), sampling points (N) and read outs (NProj)
         a PyOpenCL queue (queue) and the complex coil
-        sensitivities (C).
+        sensitivities (C). Optionally contains the oversampling factor
+        (ogf) of the grid and the kernel width (kwidth), which takes
+        precedence over the argument. Without ogf, the grid has N points.
       kwidth : int
         The width of the sampling kernel for regridding of non-uniform
         kspace samples.
@@ -1037,15 +1348,17 @@ class PyOpenCLRadialNUFFTStreamed(PyOpenCLnuFFT):
 
         super().__init__(ctx, queue, par["fft_dim"], DTYPE, DTYPE_real)
 
-        self.ogf = par["N"]/par["dimX"]
+        kwidth = par.get("kwidth") or kwidth
+        self._gridsize = _gridSize(par)
+        self.ogf = self._gridsize/par["dimX"]
         self.fft_shape = (par["NScan"] *
                           par["NC"] *
                           (par["par_slices"] +
                            par["overlap"]),
-                          int(par["dimY"]*self.ogf),
-                          int(par["dimX"]*self.ogf))
+                          self._gridsize,
+                          self._gridsize)
         (kerneltable, kerneltable_FT) = calckbkernel(
-            kwidth, self.ogf, par["N"], klength)
+            kwidth, self.ogf, self._gridsize, klength)
         self._kernelpoints = kerneltable.size
 
         self.fft_scale = DTYPE_real(self.fft_shape[-1])
@@ -1075,10 +1388,6 @@ class PyOpenCLRadialNUFFTStreamed(PyOpenCLnuFFT):
 
         self._kernelpoints = kerneltable.size
         self._kwidth = kwidth / 2
-        self._check = np.ones(par["N"], dtype=DTYPE_real)
-        self._check[1::2] = -1
-        self._check = clarray.to_device(self.queue, self._check)
-        self._gridsize = par["N"]
 
     def __del__(self):
         """Explicitly delete OpenCL Objets."""
@@ -1087,7 +1396,6 @@ class PyOpenCLRadialNUFFTStreamed(PyOpenCLnuFFT):
         del self._tmp_fft_array
         del self.cl_kerneltable
         del self.cl_deapo
-        del self._check
         del self.queue
         del self.ctx
         del self.prg
@@ -1126,7 +1434,7 @@ class PyOpenCLRadialNUFFTStreamed(PyOpenCLnuFFT):
             self.prg.grid_lut(
                 self.queue,
                 (s.shape[0], s.shape[1] * s.shape[2],
-                 s.shape[-2] * self._gridsize),
+                 s.shape[-2] * s.shape[-1]),
                 None,
                 self._tmp_fft_array.data,
                 s.data,
@@ -1140,15 +1448,6 @@ class PyOpenCLRadialNUFFTStreamed(PyOpenCLnuFFT):
                 wait_for=(wait_for + sg.events + s.events +
                           self._tmp_fft_array.events)))
         # FFT
-        self._tmp_fft_array.add_event(
-            self.prg.fftshift(
-                self.queue,
-                (self.fft_shape[0],
-                 self.fft_shape[1],
-                 self.fft_shape[2]),
-                None,
-                self._tmp_fft_array.data,
-                self._check.data))
         for j in range(int(self.fft_shape[0] / self.par_fft)):
             self._tmp_fft_array.add_event(
                 self.fft.enqueue_arrays(
@@ -1159,15 +1458,6 @@ class PyOpenCLRadialNUFFTStreamed(PyOpenCLnuFFT):
                         j * self.par_fft:
                         (j + 1) * self.par_fft, ...],
                     forward=False)[0])
-        self._tmp_fft_array.add_event(
-            self.prg.fftshift(
-                self.queue,
-                (self.fft_shape[0],
-                 self.fft_shape[1],
-                 self.fft_shape[2]),
-                None,
-                self._tmp_fft_array.data,
-                self._check.data))
         # Deapodization and Scaling
         return self.prg.deapo_adj(self.queue,
                                   (sg.shape[0] * sg.shape[1] * sg.shape[2],
@@ -1179,6 +1469,7 @@ class PyOpenCLRadialNUFFTStreamed(PyOpenCLnuFFT):
                                   np.int32(self._tmp_fft_array.shape[-1]),
                                   self.DTYPE_real(self.fft_scale),
                                   self.DTYPE_real(self.ogf),
+                                  np.int32(1),
                                   wait_for=(wait_for + sg.events + s.events +
                                             self._tmp_fft_array.events))
 
@@ -1200,40 +1491,25 @@ class PyOpenCLRadialNUFFTStreamed(PyOpenCLnuFFT):
         """
         if wait_for is None:
             wait_for = []
-        # Zero tmp arrays
-        self._tmp_fft_array.add_event(
-            self.prg.zero_tmp(
-                self.queue,
-                (self._tmp_fft_array.size,
-                 ),
-                None,
-                self._tmp_fft_array.data,
-                wait_for=self._tmp_fft_array.events +
-                wait_for))
-        # Deapodization and Scaling
+        # Zero padding, deapodization, scaling and the checkerboard
+        # modulation of the centered FFT in one pass over the grid.
         self._tmp_fft_array.add_event(
             self.prg.deapo_fwd(
                 self.queue,
-                (sg.shape[0] * sg.shape[1] * sg.shape[2], sg.shape[3],
-                 sg.shape[4]),
+                (sg.shape[0] * sg.shape[1] * sg.shape[2],
+                 self.fft_shape[1], self.fft_shape[2]),
                 None,
                 self._tmp_fft_array.data,
                 sg.data,
                 self.cl_deapo,
-                np.int32(self._tmp_fft_array.shape[-1]),
+                np.int32(sg.shape[4]),
+                np.int32(sg.shape[3]),
                 self.DTYPE_real(1 / self.fft_scale),
                 self.DTYPE_real(self.ogf),
-                wait_for=sg.events + self._tmp_fft_array.events))
+                np.int32(1),
+                wait_for=(wait_for + sg.events +
+                          self._tmp_fft_array.events)))
         # FFT
-        self._tmp_fft_array.add_event(
-            self.prg.fftshift(
-                self.queue,
-                (self.fft_shape[0],
-                 self.fft_shape[1],
-                 self.fft_shape[2]),
-                None,
-                self._tmp_fft_array.data,
-                self._check.data))
         for j in range(int(self.fft_shape[0] / self.par_fft)):
             self._tmp_fft_array.add_event(
                 self.fft.enqueue_arrays(
@@ -1244,21 +1520,12 @@ class PyOpenCLRadialNUFFTStreamed(PyOpenCLnuFFT):
                         j * self.par_fft:
                         (j + 1) * self.par_fft, ...],
                     forward=True)[0])
-        self._tmp_fft_array.add_event(
-            self.prg.fftshift(
-                self.queue,
-                (self.fft_shape[0],
-                 self.fft_shape[1],
-                 self.fft_shape[2]),
-                None,
-                self._tmp_fft_array.data,
-                self._check.data))
         # Resample on Spoke
 
         return self.prg.invgrid_lut(
             self.queue,
             (s.shape[0], s.shape[1] * s.shape[2],
-             s.shape[-2] * self._gridsize),
+             s.shape[-2] * s.shape[-1]),
             None,
             s.data,
             self._tmp_fft_array.data,
@@ -1702,3 +1969,211 @@ class PyOpenCLSMSNUFFTStreamed(PyOpenCLnuFFT):
                 self.DTYPE_real(1),
                 np.int32(sg.shape[2]/self.packs/self.MB),
                 wait_for=s.events+sg.events+wait_for))
+
+
+def _gridSize(par):
+    """Return the edge length of the quadratic oversampled grid.
+
+    Without an oversampling factor (ogf) in par, the grid has as many
+    points as a readout (N). Otherwise the oversampled image size is
+    rounded up to the next even number with prime factors 2, 3, 5 and 7
+    only, which are the radices supported by clFFT.
+
+    Parameters
+    ----------
+      par : dict
+        A python dict containing the image dimensions (dimX, dimY), the
+        readout length (N) and optionally the oversampling factor (ogf).
+
+    Returns
+    -------
+      int:
+        The number of grid points along each dimension.
+    """
+    if not par.get("ogf"):
+        return par["N"]
+    if par["ogf"] < 1:
+        raise ValueError("The oversampling factor needs to be at least 1.")
+    gridsize = int(np.ceil(par["ogf"]*max(par["dimX"], par["dimY"])))
+    gridsize += gridsize % 2
+    while True:
+        rest = gridsize
+        for radix in (2, 3, 5, 7):
+            while rest % radix == 0:
+                rest //= radix
+        if rest == 1:
+            return gridsize
+        gridsize += 2
+
+
+def _griddingMatrixBytes(nscan, nsamples, gridpoints, kwidth, itemsize):
+    # Upper bound: all taps of the square kernel window are stored, once
+    # per sample (CSR) and once per grid point (CSC).
+    taps = (int(np.ceil(2*kwidth)) + 2)**2
+    nnz = nscan*nsamples*taps
+    return (2*nnz*(itemsize + 4)
+            + 4*(nscan*nsamples + 1) + 4*(nscan*gridpoints + 1))
+
+
+def _griddingTaps(traj, kerneltable, kwidth, gridsize, DTYPE_real):
+    # Taps of all samples of one scan, computed and wrapped around the
+    # grid border in the same way as in grid_lut and invgrid_lut.
+    traj = np.reshape(traj, (-1))
+    center = gridsize//2
+    kw = DTYPE_real(kwidth/gridsize)
+    offsets = np.arange(int(np.ceil(2*kwidth)) + 2)
+    nkernelpts = kerneltable.size
+
+    kx = traj.real.astype(DTYPE_real)[:, None, None]
+    ky = traj.imag.astype(DTYPE_real)[:, None, None]
+    ixmin = np.trunc((kx-kw)*gridsize + center).astype(np.int64)
+    ixmax = np.trunc((kx+kw)*gridsize + center).astype(np.int64) + 1
+    iymin = np.trunc((ky-kw)*gridsize + center).astype(np.int64)
+    iymax = np.trunc((ky+kw)*gridsize + center).astype(np.int64) + 1
+    gcount1 = ixmin + offsets[None, :, None]
+    gcount2 = iymin + offsets[None, None, :]
+    dkx = (gcount1-center).astype(DTYPE_real)/gridsize - kx
+    dky = (gcount2-center).astype(DTYPE_real)/gridsize - ky
+    dk = np.sqrt(dkx*dkx + dky*dky)
+    valid = (gcount1 <= ixmax) & (gcount2 <= iymax) & (dk < kw)
+
+    fracind = dk/kw*DTYPE_real(nkernelpts-1)
+    kernelind = np.minimum(fracind.astype(np.int64), nkernelpts-2)
+    fracdk = fracind - kernelind
+    kern = (kerneltable[kernelind]*(1-fracdk)
+            + kerneltable[kernelind+1]*fracdk)
+
+    indx = np.broadcast_to(gcount1, dk.shape).copy()
+    indy = np.broadcast_to(gcount2, dk.shape).copy()
+    for wrap, shift in ((gcount1 < 0, gridsize),
+                        (gcount1 >= gridsize, -gridsize)):
+        wrap = np.broadcast_to(wrap, dk.shape)
+        indx[wrap] += shift
+        indy[wrap] = gridsize - indy[wrap]
+    for wrap, shift in ((gcount2 < 0, gridsize),
+                        (gcount2 >= gridsize, -gridsize)):
+        wrap = np.broadcast_to(wrap, dk.shape)
+        indy[wrap] += shift
+        indx[wrap] = gridsize - indx[wrap]
+    ind = indx*gridsize + indy
+    valid &= (ind >= 0) & (ind < gridsize*gridsize)
+
+    sample = np.broadcast_to(np.arange(traj.size)[:, None, None], dk.shape)
+    return sample[valid], indx[valid], indy[valid], kern[valid]
+
+
+def _griddingMatrix(traj, dcf, kerneltable, kwidth, gridsize, DTYPE_real):
+    """Compute the gridding interpolation of all scans as sparse matrices.
+
+    The taps, kernel values and wrapped grid indices are computed in the
+    same way as in grid_lut and invgrid_lut. The density compensation and
+    the checkerboard modulation of the centered FFT are included in the
+    weights.
+
+    Parameters
+    ----------
+      traj : numpy.array
+        The complex trajectory of all scans.
+      dcf : numpy.array
+        The density compensation of the samples of one scan.
+      kerneltable : numpy.array
+        The gridding kernel lookup table.
+      kwidth : float
+        Half of the kernel width in grid units.
+      gridsize : int
+        The size of the quadratic grid.
+      DTYPE_real : Numpy.dtype
+        The real precision type.
+
+    Returns
+    -------
+      tuple of numpy.array:
+        Row pointer, column indices and values of the CSR matrix mapping
+        the grid to the samples followed by column pointer, row indices
+        and values of the CSC matrix of the same map. Rows and columns of
+        all scans are stacked, the stored indices are local to the scan.
+    """
+    nscan = traj.shape[0]
+    traj = np.reshape(traj, (nscan, -1))
+    dcf = np.reshape(dcf, (-1)).astype(DTYPE_real)
+    kerneltable = kerneltable.astype(DTYPE_real)
+    nsamples = traj.shape[1]
+    gridpoints = gridsize*gridsize
+
+    rows = []
+    cols = []
+    vals = []
+    for scan in range(nscan):
+        sample, indx, indy, kern = _griddingTaps(
+            traj[scan], kerneltable, kwidth, gridsize, DTYPE_real)
+        rows.append(sample + scan*nsamples)
+        cols.append(indx*gridsize + indy + scan*gridpoints)
+        vals.append(kern*dcf[sample]*(1-2*((indx+indy) % 2)))
+    rows = np.concatenate(rows)
+    cols = np.concatenate(cols)
+    vals = np.concatenate(vals).astype(DTYPE_real)
+
+    rowptr = np.zeros(nscan*nsamples + 1, dtype=np.int32)
+    rowptr[1:] = np.cumsum(np.bincount(rows, minlength=nscan*nsamples))
+    colptr = np.zeros(nscan*gridpoints + 1, dtype=np.int32)
+    colptr[1:] = np.cumsum(np.bincount(cols, minlength=nscan*gridpoints))
+    order = np.argsort(cols, kind='stable')
+    return (rowptr,
+            np.require(cols % gridpoints, np.int32, 'C'),
+            vals,
+            colptr,
+            np.require(rows[order] % nsamples, np.int32, 'C'),
+            np.require(vals[order], DTYPE_real, 'C'))
+
+
+def _binSamples(traj, kerneltable, kwidth, gridsize, tilesize, DTYPE_real):
+    """Sort the samples of all scans into tiles of the grid.
+
+    A sample is listed for each tile which is reached by its gridding
+    kernel, such that the adjoint gridding can gather the contributions
+    to a grid point from the samples listed for its tile.
+
+    Parameters
+    ----------
+      traj : numpy.array
+        The complex trajectory of all scans.
+      kerneltable : numpy.array
+        The gridding kernel lookup table.
+      kwidth : float
+        Half of the kernel width in grid units.
+      gridsize : int
+        The size of the quadratic grid.
+      tilesize : int
+        The edge length of the quadratic tiles in grid points.
+      DTYPE_real : Numpy.dtype
+        The real precision type.
+
+    Returns
+    -------
+      tuple of numpy.array:
+        The pointer to the first sample of each tile of each scan and the
+        sample indices, local to the scan, sorted by scan and tile.
+    """
+    nscan = traj.shape[0]
+    traj = np.reshape(traj, (nscan, -1))
+    kerneltable = kerneltable.astype(DTYPE_real)
+    ntiles = -(-gridsize//tilesize)
+
+    tiles = []
+    samples = []
+    for scan in range(nscan):
+        sample, indx, indy, _ = _griddingTaps(
+            traj[scan], kerneltable, kwidth, gridsize, DTYPE_real)
+        # Wrapped taps can leave the row, thus the written grid point is
+        # given by the flat index as in grid_lut.
+        ind = indx*gridsize + indy
+        tile = ((ind//gridsize//tilesize)*ntiles
+                + (ind % gridsize)//tilesize + scan*ntiles*ntiles)
+        pairs = np.unique(tile*traj.shape[1] + sample)
+        tiles.append(pairs//traj.shape[1])
+        samples.append(pairs % traj.shape[1])
+    tiles = np.concatenate(tiles)
+    tileptr = np.zeros(nscan*ntiles*ntiles + 1, dtype=np.int32)
+    tileptr[1:] = np.cumsum(np.bincount(tiles,
+                                        minlength=nscan*ntiles*ntiles))
+    return tileptr, np.require(np.concatenate(samples), np.int32, 'C')
@@ -28,11 +28,12 @@ setup(name='pyqmri',
         'h5py',
         'mako',
         'matplotlib',
-        'ipyparallel',
         'pyfftw',
         'pyqt5',
         'numexpr',
         'sympy>=1.6.2'],
+      extras_require={
+        'ipyparallel': ['ipyparallel']},
       entry_points={
         'console_scripts': ['pyqmri = pyqmri.pyqmri:run'],
         },
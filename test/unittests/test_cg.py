@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Compare the device side CG iteration with a dense solve."""
+
+import pyqmri
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+from pyqmri._helper_fun import CLProgram as Program
+from pyqmri.solver import CGSolver
+import pyopencl as cl
+import pyopencl.array as clarray
+import numpy as np
+
+DTYPE = np.complex64
+DTYPE_real = np.float32
+RTOL = 1e-4
+
+MATVEC = """
+__kernel void matvec(__global float2 *out, __global float2 *A,
+                     __global float2 *x, const int n)
+{
+    size_t i = get_global_id(0);
+    float2 sum = 0.0f;
+    for (int j = 0; j < n; j++)
+    {
+        float2 a = A[i*n + j];
+        sum += (float2)(a.x*x[j].x - a.y*x[j].y, a.x*x[j].y + a.y*x[j].x);
+    }
+    out[i] = sum;
+}
+"""
+
+
+class tmpArgs():
+    pass
+
+
+class CGTest(unittest.TestCase):
+    def setUp(self):
+        parser = tmpArgs()
+        parser.streamed = False
+        parser.devices = -1
+        parser.use_GPU = True
+
+        par = {}
+        pyqmri.pyqmri._setupOCL(parser, par)
+        ctx = par["ctx"][0]
+        self.queue = par["queue"][0]
+
+        # The solver is set up without a k-space operator, the normal
+        # operator is replaced by a small Hermitian positive definite
+        # matrix and the right hand side is the data itself.
+        solver = CGSolver.__new__(CGSolver)
+        solver._queue = self.queue
+        solver._allocator = None
+        solver._NScan = 1
+        solver._NSlice = 2
+        solver._dimY = 4
+        solver._dimX = 5
+        solver._DTYPE = DTYPE
+        solver._DTYPE_real = DTYPE_real
+        solver._coils = solver._tmp_result = solver._tmp_sino = None
+        solver._FT = solver._FTH = solver._toeplitz = None
+        solver._setupKernels(ctx)
+        self.solver = solver
+        self.shape = (solver._NSlice, solver._dimY, solver._dimX)
+        n = int(np.prod(self.shape))
+
+        M = (np.random.randn(n, n) + 1j*np.random.randn(n, n)) / np.sqrt(n)
+        self.A = (M @ np.conj(M.T) + 0.5*np.eye(n)).astype(DTYPE)
+        self.cl_A = clarray.to_device(self.queue, self.A)
+        self.prg = Program(ctx, MATVEC)
+        solver._operator_lhs = self._operatorLHS
+        solver._operator_rhs = self._operatorRHS
+
+        self.data = (np.random.randn(*self.shape)
+                     + 1j*np.random.randn(*self.shape)).astype(DTYPE)
+
+    def _operatorLHS(self, out, x, wait_for=None):
+        return self.prg.matvec(
+            self.queue, (self.A.shape[0],), None,
+            out.data, self.cl_A.data, x.data, np.int32(self.A.shape[0]),
+            wait_for=out.events+x.events)
+
+    def _operatorRHS(self, out, x, wait_for=None):
+        return cl.enqueue_copy(self.queue, out.data, x.data,
+                               wait_for=out.events+x.events)
+
+    def _reference(self, lambd):
+        return np.linalg.solve(
+            self.A.astype(np.complex128) + lambd*np.eye(self.A.shape[0]),
+            self.data.ravel()).reshape(self.shape)
+
+    def _assertClose(self, a, b):
+        np.testing.assert_allclose(
+            a, b, rtol=RTOL, atol=RTOL*np.abs(b).max())
+
+    def test_solve(self):
+        for check_interval in (1, 5):
+            x = self.solver.run(self.data, iters=200, lambd=1e-2, tol=1e-10,
+                                check_interval=check_interval)
+            self._assertClose(x, self._reference(1e-2))
+
+    def test_guess(self):
+        guess = self._reference(1e-3).astype(DTYPE)
+        x = self.solver.run(self.data, iters=200, lambd=1e-3, tol=1e-10,
+                            guess=guess)
+        self._assertClose(x, self._reference(1e-3))
+
+    def test_check_interval(self):
+        # The convergence checks do not alter the iterates.
+        x1 = self.solver.run(self.data, iters=7, lambd=1e-2, tol=0,
+                             check_interval=1)
+        x5 = self.solver.run(self.data, iters=7, lambd=1e-2, tol=0,
+                             check_interval=5)
+        np.testing.assert_allclose(x1, x5, rtol=1e-5)
+
+    def test_zero_data(self):
+        x = self.solver.run(np.zeros_like(self.data), iters=10)
+        np.testing.assert_array_equal(x, 0)
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Round trip the IRGN state through a checkpoint file."""
+
+import os
+import tempfile
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+from pyqmri._helper_fun._hdf5writer import HDF5Writer
+from pyqmri.irgn import IRGNOptimizer
+from pyqmri.models.VFA import Model
+import numpy as np
+
+DTYPE = np.complex64
+DTYPE_real = np.float32
+
+
+def setupPar(par):
+    par["NScan"] = 4
+    par["NSlice"] = 3
+    par["dimX"] = 8
+    par["dimY"] = 6
+    par["DTYPE"] = DTYPE
+    par["DTYPE_real"] = DTYPE_real
+    par["TR"] = 5.0
+    par["flip_angle(s)"] = np.array([2, 5, 8, 12])
+    par["fname"] = "test.h5"
+
+
+class CheckpointTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.par = {}
+        setupPar(self.par)
+        self.par["outdir"] = self.tmpdir.name + os.sep
+        self.irgn_par = {"max_gn_it": 10, "start_iters": 10,
+                         "max_iters": 1000, "gamma": 1e-1, "delta": 1e-2,
+                         "omega": 0.0, "display_iterations": True,
+                         "checkpoint_interval": 2}
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _optimizer(self, streamed):
+        # The state handling only needs the model and the IRGN parameters.
+        opt = IRGNOptimizer.__new__(IRGNOptimizer)
+        opt.par = self.par
+        opt.irgn_par = dict(self.irgn_par)
+        opt.gn_res = []
+        opt._model = Model(dict(self.par))
+        opt._model.computeInitialGuess()
+        opt._reg_type = "TGV"
+        opt._streamed = streamed
+        opt._DTYPE = DTYPE
+        opt._v = None
+        opt._fval_init = 0
+        opt._gamma = opt.irgn_par["gamma"]
+        opt._delta = opt.irgn_par["delta"]
+        opt._omega = opt.irgn_par["omega"]
+        opt._resume_state = None
+        return opt
+
+    def _roundTrip(self, streamed):
+        opt = self._optimizer(streamed)
+        shape = opt._model.guess.shape
+        x = (np.random.randn(*shape) + 1j*np.random.randn(*shape)).astype(
+            DTYPE)
+        v = (np.random.randn(*shape, 4)
+             + 1j*np.random.randn(*shape, 4)).astype(DTYPE)
+        opt._v = np.require(np.swapaxes(v, 0, 1), requirements='C') \
+            if streamed else v.copy()
+        opt._model.uk_scale = [2.5, 0.75]
+        opt._model.constraints[0].min = 0.5
+        opt._model.constraints[1].max = 0.9
+        opt.gn_res = [10.0, 5.0, 4.0]
+        opt._fval_init = 12.0
+        opt._gamma = 0.2
+        opt._delta = 0.03
+        opt._omega = 0.0
+        opt.irgn_par["delta"] = 0.06
+
+        opt._writer = HDF5Writer(self.par["outdir"] + self.par["fname"])
+        # Streamed solvers use the slice first layout.
+        opt._saveCheckpoint(
+            3, np.require(np.swapaxes(x, 0, 1), requirements='C')
+            if streamed else x, 42)
+        opt._writer.close()
+
+        new = self._optimizer(streamed)
+        new.loadCheckpoint(
+            self.par["outdir"] + "checkpoint_" + self.par["fname"])
+        state = new._resume_state
+        np.testing.assert_array_equal(state["x"], x)
+        np.testing.assert_array_equal(state["v"], v)
+        np.testing.assert_array_equal(new._v, opt._v)
+        self.assertEqual(new._model.uk_scale, [2.5, 0.75])
+        self.assertEqual(
+            [(const.min, const.max) for const in new._model.constraints],
+            [(const.min, const.max) for const in opt._model.constraints])
+        self.assertEqual(new.irgn_par, opt.irgn_par)
+        for key, value in new.irgn_par.items():
+            self.assertIs(type(value), type(opt.irgn_par[key]))
+        self.assertEqual(new.gn_res, [10.0, 5.0, 4.0])
+        for key, value in (("gn_step", 3), ("iters", 42),
+                           ("fval_init", 12.0), ("gamma", 0.2),
+                           ("delta", 0.03), ("omega", 0.0),
+                           ("reg_type", "TGV")):
+            self.assertEqual(state[key], value)
+
+    def test_round_trip(self):
+        self._roundTrip(False)
+
+    def test_round_trip_streamed(self):
+        self._roundTrip(True)
+
+    def test_regularization_mismatch(self):
+        opt = self._optimizer(False)
+        opt._writer = HDF5Writer(self.par["outdir"] + self.par["fname"])
+        opt._saveCheckpoint(1, opt._model.guess, 10)
+        opt._writer.close()
+        new = self._optimizer(False)
+        new._reg_type = "TV"
+        with self.assertRaises(ValueError):
+            new.loadCheckpoint(
+                self.par["outdir"] + "checkpoint_" + self.par["fname"])
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Test the SVD based coil compression."""
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+from pyqmri._helper_fun._coil_compression import (coil_compression_matrix,
+                                                  compress_coils)
+import numpy as np
+
+DTYPE = np.complex64
+
+# Signal energy of the coil modes, normalized cumulative sum is
+# 0.5, 0.75, 0.875, 0.9375, 1.
+POWER = np.array([8, 4, 2, 1, 1]) / 16
+
+
+def unitary(n, m):
+    q, _ = np.linalg.qr(np.random.randn(n, m) + 1j*np.random.randn(n, m))
+    return q
+
+
+class CoilCompressionTest(unittest.TestCase):
+    def setUp(self):
+        self.NScan = 2
+        self.NC = POWER.size
+        self.NSlice = 2
+        self.dimY = 8
+        self.dimX = 10
+        # Coil mixing of samples with orthonormal rows yields a coil
+        # covariance with eigenvalues POWER.
+        mixing = unitary(self.NC, self.NC)
+        samples = unitary(self.NScan*self.NSlice*self.dimY*self.dimX,
+                          self.NC).T.reshape(
+            self.NC, self.NScan, self.NSlice, self.dimY, self.dimX)
+        self.data = np.tensordot(
+            mixing*np.sqrt(POWER*self.NScan), samples, axes=(1, 0))
+        self.data = np.moveaxis(self.data, 1, 0).astype(DTYPE)
+
+    def test_orthonormal_rows(self):
+        for ncoils in (2, self.NC):
+            matrix = coil_compression_matrix(self.data, ncoils)
+            self.assertEqual(matrix.shape, (ncoils, self.NC))
+            np.testing.assert_allclose(
+                matrix @ np.conj(matrix.T), np.eye(ncoils), atol=1e-10)
+
+    def test_energy_threshold(self):
+        for energy, ncoils, expected in ((0.7, 0, 2), (0.8, 0, 3),
+                                         (0.9, 0, 4), (0.99, 0, 5),
+                                         (0.9, 2, 2), (0, 3, 3),
+                                         (0, 0, 5)):
+            matrix = coil_compression_matrix(self.data, ncoils, energy)
+            self.assertEqual(matrix.shape[0], expected)
+
+    def test_compressed_energy(self):
+        matrix = coil_compression_matrix(self.data, energy=0.8)
+        compressed = compress_coils(self.data, matrix)
+        self.assertEqual(compressed.dtype, DTYPE)
+        np.testing.assert_allclose(
+            np.sum(np.abs(compressed)**2) / np.sum(np.abs(self.data)**2),
+            0.875, rtol=1e-5)
+
+    def test_forward_model(self):
+        coils = (np.random.randn(self.NC, self.NSlice, self.dimY, self.dimX)
+                 + 1j*np.random.randn(
+                     self.NC, self.NSlice, self.dimY, self.dimX))
+        image = (np.random.randn(self.NScan, self.NSlice, self.dimY,
+                                 self.dimX)
+                 + 1j*np.random.randn(
+                     self.NScan, self.NSlice, self.dimY, self.dimX))
+
+        def forward(coils):
+            return np.fft.fft2(image[:, None] * coils[None], norm="ortho")
+
+        # Keeping all coils is a change of basis which needs to be applied
+        # to the sensitivities as well.
+        for ncoils in (2, self.NC):
+            matrix = coil_compression_matrix(self.data, ncoils)
+            np.testing.assert_allclose(
+                compress_coils(forward(coils), matrix),
+                forward(compress_coils(coils, matrix, axis=0)),
+                rtol=1e-10, atol=1e-10)
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Compare the generated OpenCL kernels of GeneralModel with sympy/numpy."""
+
+import os
+import tempfile
+import pyqmri
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+from pyqmri.models.GeneralModel import Model
+import pyopencl.array as clarray
+import numpy as np
+
+DTYPE = np.complex64
+DTYPE_real = np.float32
+RTOL = 1e-4
+
+MODELS = """[VFA-E1]
+parameter = TR fa fa_corr
+unknowns = M0 E_1
+signal = M0*sin(fa*fa_corr)*(1-E_1)/(1-E_1*cos(fa*fa_corr))
+box_constraints_lower = 0,0.9048
+box_constraints_upper = 10,0.99909
+real_value_constraints = False,True
+guess = 1,0.99667
+rescale = M0,-TR/log(E_1)
+estimate_individual_phase = False
+
+[VFA-E1-numpy]
+parameter = TR fa fa_corr
+unknowns = M0 E_1
+signal = M0*sin(fa*fa_corr)*(1-E_1)/(1-E_1*cos(fa*fa_corr))
+box_constraints_lower = 0,0.9048
+box_constraints_upper = 10,0.99909
+real_value_constraints = False,True
+guess = 1,0.99667
+rescale = M0,-TR/log(E_1)
+estimate_individual_phase = False
+use_opencl = False
+"""
+
+
+class tmpArgs():
+    pass
+
+
+def setupPar(par):
+    par["NScan"] = 5
+    par["NSlice"] = 4
+    par["dimX"] = 16
+    par["dimY"] = 12
+    par["DTYPE"] = DTYPE
+    par["DTYPE_real"] = DTYPE_real
+    par["par_slices"] = 3
+    par["TR"] = 5.0
+    par["fa"] = np.array([2, 5, 8, 12, 16])*np.pi/180
+    par["fa_corr"] = (
+        1 + 0.1*np.random.rand(
+            par["NSlice"], par["dimY"], par["dimX"])).astype(DTYPE)
+
+
+class GeneralModelCLTest(unittest.TestCase):
+    def setUp(self):
+        parser = tmpArgs()
+        parser.streamed = False
+        parser.devices = -1
+        parser.use_GPU = True
+
+        self.par = {}
+        pyqmri.pyqmri._setupOCL(parser, self.par)
+        setupPar(self.par)
+
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.par["modelfile"] = os.path.join(self.tmpdir.name, "models.ini")
+        with open(self.par["modelfile"], "w") as f:
+            f.write(MODELS)
+
+        self.model = self._model("VFA-E1")
+        self.ref = self._model("VFA-E1-numpy")
+        self.assertTrue(self.model.cl_available)
+        self.assertFalse(self.ref.cl_available)
+
+        shape = (2, self.par["NSlice"], self.par["dimY"], self.par["dimX"])
+        self.x = np.array(
+            [1 + 0.5*np.random.randn(*shape[1:])
+             + 0.5j*np.random.randn(*shape[1:]),
+             0.95 + 0.04*np.random.rand(*shape[1:])],
+            dtype=DTYPE)
+        for model in (self.model, self.ref):
+            model.uk_scale = [1.5, 0.7]
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _model(self, name):
+        par = dict(self.par)
+        par["modelname"] = name
+        return Model(par)
+
+    def _assertClose(self, a, b):
+        np.testing.assert_allclose(
+            a, b, rtol=RTOL, atol=RTOL*np.abs(b).max())
+
+    def test_forward(self):
+        self._assertClose(self.model.execute_forward(self.x),
+                          self.ref.execute_forward(self.x))
+
+    def test_gradient(self):
+        self._assertClose(self.model.execute_gradient(self.x),
+                          self.ref.execute_gradient(self.x))
+
+    def test_forward_and_gradient(self):
+        S, grad = self.model.execute_forward_and_gradient(self.x)
+        S_ref, grad_ref = self.ref.execute_forward_and_gradient(self.x)
+        self._assertClose(S, S_ref)
+        self._assertClose(grad, grad_ref)
+
+    def test_slab_offset(self):
+        islice = slice(1, 3)
+        x = np.require(self.x[:, islice], requirements='C')
+        S, grad = self.model.execute_forward_and_gradient(x, islice)
+        S_ref, grad_ref = self.ref.execute_forward_and_gradient(
+            self.x)
+        self._assertClose(S, S_ref[:, islice])
+        self._assertClose(grad, grad_ref[:, :, islice])
+
+    def test_gradient_cl(self):
+        grad = self.model.execute_gradient_cl(
+            clarray.to_device(self.par["queue"][0], self.x)).get()
+        self._assertClose(grad, self.ref.execute_gradient(self.x))
+
+    def test_complex_parameter_fallback(self):
+        self.par["fa_corr"] = self.par["fa_corr"] * np.exp(0.1j)
+        model = self._model("VFA-E1")
+        ref = self._model("VFA-E1-numpy")
+        self.assertFalse(model.cl_available)
+        for mod in (model, ref):
+            mod.uk_scale = [1.5, 0.7]
+        self._assertClose(model.execute_forward(self.x),
+                          ref.execute_forward(self.x))
+        self._assertClose(model.execute_gradient(self.x),
+                          ref.execute_gradient(self.x))
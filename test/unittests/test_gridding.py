@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Compare the matrix and binned radial gridding with the lookup table."""
+
+import types
+import pyqmri
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+from pyqmri._helper_fun import CLProgram as Program
+from pyqmri._helper_fun._calckbkernel import calckbkernel
+from pyqmri.transforms import (
+    PyOpenCLRadialNUFFT, _griddingMatrix, _binSamples)
+from pkg_resources import resource_filename
+import pyopencl.array as clarray
+import numpy as np
+
+DTYPE = np.complex64
+DTYPE_real = np.float32
+RTOL = 1e-5
+
+
+class tmpArgs():
+    pass
+
+
+def setupPar(par):
+    par["NScan"] = 3
+    par["NC"] = 2
+    par["NSlice"] = 1
+    par["Nproj"] = 9
+    par["N"] = 16
+    par["dimX"] = 16
+    par["dimY"] = 16
+    par["kwidth"] = 5
+    par["gridsize"] = 32
+
+
+class GriddingTest(unittest.TestCase):
+    def setUp(self):
+        parser = tmpArgs()
+        parser.streamed = False
+        parser.devices = -1
+        parser.use_GPU = True
+
+        par = {}
+        pyqmri.pyqmri._setupOCL(parser, par)
+        setupPar(par)
+        if DTYPE == np.complex128:
+            file = resource_filename(
+                        'pyqmri', 'kernels/OpenCL_gridding_double.c')
+        else:
+            file = resource_filename(
+                        'pyqmri', 'kernels/OpenCL_gridding_single.c')
+        with open(file) as myfile:
+            self.prg = Program(par["ctx"][0], myfile.read())
+        self.queue = par["queue"][0]
+        self.par = par
+
+        self.gridsize = par["gridsize"]
+        self.kwidth = par["kwidth"] / 2
+        kerneltable, _ = calckbkernel(
+            par["kwidth"], self.gridsize/par["dimX"], self.gridsize, 200)
+        self.kerneltable = kerneltable.astype(DTYPE_real)
+
+        # Random samples cover the whole k-space, thus the kernel windows
+        # of the samples close to the border wrap around the grid. The
+        # last readout explicitly hits the corners and edges.
+        shape = (par["NScan"], par["Nproj"], par["N"])
+        self.traj = (np.random.rand(*shape) - 0.5 + 1j*(
+            np.random.rand(*shape) - 0.5)).astype(DTYPE)
+        self.traj[:, -1, :8] = np.array(
+            [-0.5, 0.499, -0.499+0.499j, 0.499-0.5j,
+             0.499+0.499j, -0.5j, 0.499j, -0.5-0.5j]).astype(DTYPE)
+        self.dcf = np.require(
+            np.random.rand(par["Nproj"], par["N"]) + 0.1, DTYPE_real, 'C')
+
+        self.cl_traj = clarray.to_device(self.queue, self.traj)
+        self.cl_dcf = clarray.to_device(self.queue, self.dcf)
+        self.cl_kerneltable = clarray.to_device(self.queue, self.kerneltable)
+
+        # Two scans starting at the second one test the scan offset.
+        self.scan_offset = 1
+        batch = (par["NScan"]-self.scan_offset, par["NC"], par["NSlice"])
+        self.sino = (np.random.randn(*batch, par["Nproj"], par["N"]) +
+                     1j*np.random.randn(*batch, par["Nproj"], par["N"])
+                     ).astype(DTYPE)
+        self.grid = (
+            np.random.randn(*batch, self.gridsize, self.gridsize) +
+            1j*np.random.randn(*batch, self.gridsize, self.gridsize)
+            ).astype(DTYPE)
+
+    def _lutArgs(self):
+        return (self.cl_traj.data,
+                np.int32(self.gridsize),
+                DTYPE_real(self.kwidth / self.gridsize),
+                self.cl_dcf.data,
+                self.cl_kerneltable.data,
+                np.int32(self.kerneltable.size),
+                np.int32(self.scan_offset))
+
+    def _sinoSize(self, s):
+        return (s.shape[0], s.shape[1] * s.shape[2],
+                s.shape[-2] * s.shape[-1])
+
+    def _gridSize(self, sg):
+        return (sg.shape[0], sg.shape[1] * sg.shape[2],
+                sg.shape[-2] * sg.shape[-1])
+
+    def _gridLUT(self):
+        s = clarray.to_device(self.queue, self.sino)
+        sg = clarray.zeros(self.queue, self.grid.shape, DTYPE)
+        self.prg.grid_lut(
+            self.queue, self._sinoSize(s), None,
+            sg.data, s.data, *self._lutArgs()).wait()
+        return sg.get()
+
+    def _invgridLUT(self):
+        sg = clarray.to_device(self.queue, self.grid)
+        s = clarray.zeros(self.queue, self.sino.shape, DTYPE)
+        self.prg.invgrid_lut(
+            self.queue, self._sinoSize(s), None,
+            s.data, sg.data, *self._lutArgs()).wait()
+        return s.get()
+
+    def _matrix(self):
+        return [clarray.to_device(self.queue, arr)
+                for arr in _griddingMatrix(
+                    self.traj, self.dcf, self.kerneltable, self.kwidth,
+                    self.gridsize, DTYPE_real)]
+
+    def _assertClose(self, a, b):
+        np.testing.assert_allclose(
+            a, b, rtol=RTOL, atol=RTOL*np.abs(b).max())
+
+    def test_grid_csc(self):
+        colptr, rowind, val = self._matrix()[3:]
+        s = clarray.to_device(self.queue, self.sino)
+        # Every grid point is written, thus the output is not zeroed.
+        sg = clarray.empty(self.queue, self.grid.shape, DTYPE)
+        self.prg.grid_csc(
+            self.queue, self._gridSize(sg), None,
+            sg.data, s.data, colptr.data, rowind.data, val.data,
+            np.int32(s.shape[-2] * s.shape[-1]),
+            np.int32(self.scan_offset)).wait()
+        self._assertClose(sg.get(), self._gridLUT())
+
+    def test_invgrid_csr(self):
+        rowptr, colind, val = self._matrix()[:3]
+        sg = clarray.to_device(self.queue, self.grid)
+        s = clarray.empty(self.queue, self.sino.shape, DTYPE)
+        self.prg.invgrid_csr(
+            self.queue, self._sinoSize(s), None,
+            s.data, sg.data, rowptr.data, colind.data, val.data,
+            np.int32(self.gridsize**2),
+            np.int32(self.scan_offset)).wait()
+        self._assertClose(s.get(), self._invgridLUT())
+
+    def _setupGriddingMatrix(self, mem_fraction):
+        nufft = types.SimpleNamespace(
+            queue=self.queue, DTYPE_real=DTYPE_real,
+            _gridsize=self.gridsize, _kwidth=self.kwidth,
+            _csr=None, _csc=None)
+        par = {"traj": self.traj, "dcf": self.dcf,
+               "Nproj": self.par["Nproj"], "N": self.par["N"]}
+        PyOpenCLRadialNUFFT._setupGriddingMatrix(
+            nufft, par, self.kerneltable, mem_fraction)
+        return nufft
+
+    def test_matrix_setup(self):
+        nufft = self._setupGriddingMatrix(1)
+        for cl_arr, arr in zip(nufft._csr + nufft._csc, self._matrix()):
+            np.testing.assert_array_equal(cl_arr.get(), arr.get())
+
+    def test_matrix_memory_fallback(self):
+        # Without device memory to spare, the lookup table is used.
+        nufft = self._setupGriddingMatrix(0)
+        self.assertIsNone(nufft._csr)
+        self.assertIsNone(nufft._csc)
+
+    def _gridBinned(self, tilesize):
+        tileptr, sampleind = [
+            clarray.to_device(self.queue, arr)
+            for arr in _binSamples(
+                self.traj, self.kerneltable, self.kwidth, self.gridsize,
+                tilesize, DTYPE_real)]
+        s = clarray.to_device(self.queue, self.sino)
+        sg = clarray.empty(self.queue, self.grid.shape, DTYPE)
+        self.prg.grid_binned(
+            self.queue, self._gridSize(sg), None,
+            sg.data, s.data, self.cl_traj.data,
+            tileptr.data, sampleind.data,
+            np.int32(self.gridsize),
+            np.int32(s.shape[-2] * s.shape[-1]),
+            DTYPE_real(self.kwidth / self.gridsize),
+            self.cl_dcf.data,
+            self.cl_kerneltable.data,
+            np.int32(self.kerneltable.size),
+            np.int32(tilesize),
+            np.int32(self.scan_offset)).wait()
+        return sg.get()
+
+    def test_grid_binned(self):
+        self._assertClose(self._gridBinned(1), self._gridLUT())
+
+    def test_grid_binned_tiles(self):
+        self._assertClose(self._gridBinned(3), self._gridLUT())
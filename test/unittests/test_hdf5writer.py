@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Test the asynchronous HDF5 result writer."""
+
+import os
+import tempfile
+import threading
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+from pyqmri._helper_fun._hdf5writer import HDF5Writer
+import numpy as np
+import h5py
+
+DTYPE = np.complex64
+
+
+class HDF5WriterTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmpdir.name, "result.h5")
+        self.data = (np.random.randn(2, 3, 6, 5)
+                     + 1j*np.random.randn(2, 3, 6, 5)).astype(DTYPE)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _readBack(self, name):
+        with h5py.File(self.filename, "r") as f:
+            dset = f[name]
+            data = dset[()]
+            if data.dtype.names is not None:
+                data = data['r'] + 1j*data['i']
+            return data, dset.dtype, dset.chunks, dset.compression, dict(
+                f.attrs)
+
+    def test_precision(self):
+        for precision, dtype, rtol in (("native", DTYPE, 0),
+                                       ("float32", np.complex64, 0),
+                                       ("float16", None, 1e-3)):
+            writer = HDF5Writer(self.filename, precision=precision)
+            writer.write(precision, self.data, {"fval_" + precision: 1.5})
+            writer.close()
+            data, file_dtype, chunks, _, attrs = self._readBack(precision)
+            if dtype is None:
+                self.assertEqual(file_dtype.names, ('r', 'i'))
+                self.assertEqual(file_dtype['r'], np.float16)
+            else:
+                self.assertEqual(file_dtype, dtype)
+            self.assertEqual(chunks, (1, 1, 6, 5))
+            self.assertEqual(attrs["fval_" + precision], 1.5)
+            np.testing.assert_allclose(
+                data, self.data, rtol=rtol,
+                atol=rtol*np.abs(self.data).max())
+
+    def test_compression(self):
+        for compression, expected in (("gzip", "gzip"), ("lzf", "lzf"),
+                                      ("none", None), (None, None)):
+            writer = HDF5Writer(self.filename, compression=compression)
+            writer.write("result", self.data)
+            writer.close()
+            data, _, chunks, file_compression, _ = self._readBack("result")
+            self.assertEqual(file_compression, expected)
+            self.assertEqual(chunks, (1, 1, 6, 5))
+            np.testing.assert_array_equal(data, self.data)
+
+    def test_real_and_1D_data(self):
+        writer = HDF5Writer(self.filename, precision="float16")
+        writer.write("real", self.data.real)
+        writer.write("vector", np.arange(4))
+        writer.close()
+        _, dtype, chunks, _, _ = self._readBack("real")
+        self.assertEqual(dtype, np.float32)
+        self.assertEqual(chunks, (1, 1, 6, 5))
+        data = self._readBack("vector")[0]
+        np.testing.assert_array_equal(data, np.arange(4))
+
+    def test_call_order(self):
+        order = []
+
+        def check():
+            with h5py.File(self.filename, "r") as f:
+                order.append("result" in f)
+
+        writer = HDF5Writer(self.filename)
+        writer.write("result", self.data)
+        writer.call(check)
+        writer.flush()
+        self.assertEqual(order, [True])
+        writer.close()
+
+    def _fail(self):
+        raise RuntimeError("writer failed")
+
+    def test_error_on_flush(self):
+        writer = HDF5Writer(self.filename)
+        writer.call(self._fail)
+        with self.assertRaisesRegex(RuntimeError, "writer failed"):
+            writer.flush()
+        # The error is reported once, later items are written again.
+        writer.write("result", self.data)
+        writer.close()
+        self.assertEqual(self._readBack("result")[0].shape, self.data.shape)
+
+    def test_error_on_close(self):
+        release = threading.Event()
+
+        def failLater():
+            release.wait()
+            self._fail()
+
+        writer = HDF5Writer(self.filename)
+        writer.call(failLater)
+        # Datasets queued before the failure occurs are skipped.
+        writer.write("result", self.data)
+        release.set()
+        with self.assertRaisesRegex(RuntimeError, "writer failed"):
+            writer.close()
+        with h5py.File(self.filename, "a") as f:
+            self.assertNotIn("result", f)
+
+    def test_error_on_write(self):
+        writer = HDF5Writer(self.filename)
+        writer.call(self._fail)
+        writer._queue.join()
+        with self.assertRaisesRegex(RuntimeError, "writer failed"):
+            writer.write("result", self.data)
+        writer.close()
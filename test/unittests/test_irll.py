@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Compare the closed form IRLL readout averaging with a per-readout loop."""
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+from pyqmri.models.IRLL import Model
+import numpy as np
+
+DTYPE = np.complex128
+DTYPE_real = np.float64
+
+
+def setupPar(par):
+    par["NScan"] = 6
+    par["NSlice"] = 2
+    par["dimX"] = 6
+    par["dimY"] = 5
+    par["DTYPE"] = DTYPE
+    par["DTYPE_real"] = DTYPE_real
+    par["Nproj"] = 13
+    par["Nproj_measured"] = par["NScan"] * par["Nproj"]
+    par["time_per_slice"] = 3000.
+    par["tau"] = 5.5
+    par["gradient_delay"] = 10.
+    par["flip_angle(s)"] = 5.
+    par["fa_corr"] = np.ones((par["NSlice"], par["dimY"], par["dimX"]))
+    # A vanishing flip angle yields Etau*cos_phi close to one.
+    par["fa_corr"][0, 0, 0] = 0.016
+
+
+def readoutLoop(model, x):
+    """Average each readout of a scan explicitly."""
+    sin_phi = model._sin_phi
+    cos_phi = model._cos_phi
+    M0 = x[0]
+    M0_sc = model.uk_scale[0]
+    Etau, Etr, Etd, F, Q_F = model._signalTerms(x)
+    tmp1, tmp2, tmp3 = model._derivativeTerms(x, Etau, Etr, Etd)
+    grad = np.zeros((2, model.NScan, model.Nproj) + x.shape[1:],
+                    dtype=DTYPE)
+    for i in range(model.NScan):
+        for j in range(model.Nproj):
+            n = i * model.Nproj + j + 1
+            a_n = (Etau * cos_phi)**(n - 1)
+            grad[0, i, j] = M0_sc * (a_n * Q_F + F) * sin_phi
+            grad[1, i, j] = M0 * M0_sc * (
+                a_n * tmp1 + tmp2 + model.tau * a_n * (n - 1) * tmp3
+                ) * sin_phi
+    grad = np.mean(grad, axis=2)
+    return M0 * grad[0], grad
+
+
+class IRLLProjectionMeanTest(unittest.TestCase):
+    def setUp(self):
+        par = {}
+        setupPar(par)
+        self.model = Model(par)
+        self.model.uk_scale = [1.5, 0.9]
+        shape = (par["NSlice"], par["dimY"], par["dimX"])
+        self.x = np.array(
+            [1 + np.random.rand(*shape),
+             np.exp(-100 / (800 + 500 * np.random.rand(*shape))) / 0.9],
+            dtype=DTYPE)
+        # Etau = 1 - 2e-5 for the voxel with vanishing flip angle.
+        self.x[1, 0, 0, 0] = (1 - 2e-5)**(100 / 5.5) / 0.9
+
+    def test_forward(self):
+        S_ref, _ = readoutLoop(self.model, self.x)
+        np.testing.assert_allclose(
+            self.model.execute_forward(self.x), S_ref, rtol=1e-6)
+
+    def test_forward_and_gradient(self):
+        S_ref, grad_ref = readoutLoop(self.model, self.x)
+        S, grad = self.model.execute_forward_and_gradient(self.x)
+        np.testing.assert_allclose(S, S_ref, rtol=1e-6)
+        for uk in range(2):
+            np.testing.assert_allclose(
+                grad[uk], grad_ref[uk], rtol=1e-6,
+                atol=1e-6*np.abs(grad_ref[uk]).max())
+
+    def test_means_close_to_one(self):
+        self.model._cos_phi = np.ones(1)
+        n = np.arange(self.model.NScan * self.model.Nproj).reshape(
+            self.model.NScan, self.model.Nproj)
+        for a in (1 - 1e-5, 1 - 5e-5j, 1.0, 1 - 2e-4, 0.5):
+            mean0, mean1 = self.model._projectionMeans(np.array([a]))
+            a = np.complex128(a)
+            np.testing.assert_allclose(
+                mean0[:, 0], np.mean(a**n, axis=1), rtol=1e-8)
+            np.testing.assert_allclose(
+                mean1[:, 0], np.mean(n * a**n, axis=1), rtol=1e-8)
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Compare the radial NUFFT with an explicitly fftshifted reference."""
+
+import pyqmri
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+from pyqmri._helper_fun._calckbkernel import calckbkernel
+from pyqmri.transforms import PyOpenCLnuFFT, _griddingTaps
+import pyopencl.array as clarray
+import numpy as np
+
+DTYPE = np.complex64
+DTYPE_real = np.float32
+RTOL = 1e-4
+
+
+class tmpArgs():
+    pass
+
+
+def setupPar(par):
+    par["NScan"] = 2
+    par["NC"] = 2
+    par["NSlice"] = 2
+    par["dimX"] = 16
+    par["dimY"] = 16
+    par["Nproj"] = 7
+    par["N"] = 32
+    par["fft_dim"] = (-2, -1)
+    # Golden angle radial spokes.
+    angles = np.arange(par["NScan"]*par["Nproj"]) * np.pi*(3-np.sqrt(5))
+    kpos = np.linspace(-0.5, 0.5, par["N"], endpoint=False)
+    par["traj"] = np.reshape(
+        np.exp(1j*angles)[:, None] * kpos[None],
+        (par["NScan"], par["Nproj"], par["N"])).astype(DTYPE)
+    par["dcf"] = np.require(
+        np.abs(np.tile(kpos, (par["Nproj"], 1))) + 1/par["N"],
+        DTYPE_real, 'C')
+
+
+class RadialNUFFTTest(unittest.TestCase):
+    def setUp(self):
+        parser = tmpArgs()
+        parser.streamed = False
+        parser.devices = -1
+        parser.use_GPU = True
+
+        par = {}
+        pyqmri.pyqmri._setupOCL(parser, par)
+        setupPar(par)
+        self.par = par
+        self.queue = par["queue"][0]
+
+        self.image = (
+            np.random.randn(par["NScan"], par["NC"], par["NSlice"],
+                            par["dimY"], par["dimX"])
+            + 1j*np.random.randn(par["NScan"], par["NC"], par["NSlice"],
+                                 par["dimY"], par["dimX"])).astype(DTYPE)
+        self.kspace = (
+            np.random.randn(par["NScan"], par["NC"], par["NSlice"],
+                            par["Nproj"], par["N"])
+            + 1j*np.random.randn(par["NScan"], par["NC"], par["NSlice"],
+                                 par["Nproj"], par["N"])).astype(DTYPE)
+
+    def _nufft(self, gridding="lut", streamed=False):
+        par = dict(self.par)
+        par["gridding"] = gridding
+        par["par_slices"] = par["NSlice"]
+        par["overlap"] = 0
+        return PyOpenCLnuFFT.create(
+            par["ctx"][0], self.queue, par, DTYPE=DTYPE,
+            DTYPE_real=DTYPE_real, radial=True, streamed=streamed)
+
+    def _reference(self, nufft):
+        gridsize = nufft._gridsize
+        kerneltable, kerneltable_FT = calckbkernel(
+            5, nufft.ogf, gridsize, 200)
+        deapo = 1 / kerneltable_FT.astype(DTYPE_real)
+        taps = [_griddingTaps(traj, kerneltable.astype(DTYPE_real),
+                              nufft._kwidth, gridsize, DTYPE_real)
+                for traj in self.par["traj"]]
+        dcf = self.par["dcf"].ravel()
+        offy = (gridsize - self.par["dimY"])//2
+        offx = (gridsize - self.par["dimX"])//2
+        crop = (Ellipsis, slice(offy, offy+self.par["dimY"]),
+                slice(offx, offx+self.par["dimX"]))
+        deapo2D = np.outer(deapo[:self.par["dimY"]],
+                           deapo[:self.par["dimX"]])
+        return taps, dcf, crop, deapo2D
+
+    def _refFFT(self, nufft):
+        taps, dcf, crop, deapo2D = self._reference(nufft)
+        gridsize = nufft._gridsize
+        grid = np.zeros(self.image.shape[:3] + (gridsize, gridsize),
+                        dtype=np.complex128)
+        grid[crop] = self.image * deapo2D / nufft.fft_scale
+        grid = np.fft.fftshift(
+            np.fft.fft2(np.fft.ifftshift(grid, axes=(-2, -1))),
+            axes=(-2, -1))
+        grid = np.reshape(grid, grid.shape[:3] + (-1,))
+        kspace = np.zeros(self.kspace.shape[:3] + (dcf.size,),
+                          dtype=np.complex128)
+        for scan, (sample, indx, indy, kern) in enumerate(taps):
+            np.add.at(
+                kspace[scan], (Ellipsis, sample),
+                kern * grid[scan][..., indx*gridsize + indy])
+        return np.reshape(kspace * dcf, self.kspace.shape)
+
+    def _refFFTH(self, nufft):
+        taps, dcf, crop, deapo2D = self._reference(nufft)
+        gridsize = nufft._gridsize
+        kspace = np.reshape(self.kspace, self.kspace.shape[:3] + (-1,))
+        grid = np.zeros(self.kspace.shape[:3] + (gridsize*gridsize,),
+                        dtype=np.complex128)
+        for scan, (sample, indx, indy, kern) in enumerate(taps):
+            np.add.at(
+                grid[scan], (Ellipsis, indx*gridsize + indy),
+                kern * dcf[sample] * kspace[scan][..., sample])
+        grid = np.reshape(grid, grid.shape[:3] + (gridsize, gridsize))
+        grid = np.fft.fftshift(
+            np.fft.ifft2(np.fft.ifftshift(grid, axes=(-2, -1))),
+            axes=(-2, -1))
+        return grid[crop] * deapo2D * nufft.fft_scale
+
+    def _assertClose(self, a, b):
+        np.testing.assert_allclose(
+            a, b, rtol=RTOL, atol=RTOL*np.abs(b).max())
+
+    def test_fwd(self):
+        for gridding in ("lut", "matrix", "binned"):
+            nufft = self._nufft(gridding)
+            image = clarray.to_device(self.queue, self.image)
+            kspace = clarray.zeros(self.queue, self.kspace.shape, DTYPE)
+            nufft.FFT(kspace, image).wait()
+            self._assertClose(kspace.get(), self._refFFT(nufft))
+
+    def test_adj(self):
+        for gridding in ("lut", "matrix", "binned"):
+            nufft = self._nufft(gridding)
+            kspace = clarray.to_device(self.queue, self.kspace)
+            image = clarray.zeros(self.queue, self.image.shape, DTYPE)
+            nufft.FFTH(image, kspace).wait()
+            self._assertClose(image.get(), self._refFFTH(nufft))
+
+    def _sliceFirst(self, x):
+        return np.require(np.moveaxis(x, 2, 0), requirements='C')
+
+    def test_fwd_streamed(self):
+        nufft = self._nufft(streamed=True)
+        image = clarray.to_device(self.queue, self._sliceFirst(self.image))
+        kspace = clarray.zeros(
+            self.queue, self._sliceFirst(self.kspace).shape, DTYPE)
+        nufft.FFT(kspace, image).wait()
+        self._assertClose(kspace.get(), self._sliceFirst(self._refFFT(nufft)))
+
+    def test_adj_streamed(self):
+        nufft = self._nufft(streamed=True)
+        kspace = clarray.to_device(self.queue, self._sliceFirst(self.kspace))
+        image = clarray.zeros(
+            self.queue, self._sliceFirst(self.image).shape, DTYPE)
+        nufft.FFTH(image, kspace).wait()
+        self._assertClose(image.get(), self._sliceFirst(self._refFFTH(nufft)))
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Compare the OpenCL gradient and Jacobi kernels of the VFA model."""
+
+import types
+import pyqmri
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+from pyqmri._helper_fun import CLProgram as Program
+from pyqmri.irgn import IRGNOptimizer
+from pyqmri.models.VFA import Model
+from pkg_resources import resource_filename
+import pyopencl.array as clarray
+import numpy as np
+
+DTYPE = np.complex64
+DTYPE_real = np.float32
+RTOL = 1e-4
+
+
+class tmpArgs():
+    pass
+
+
+def setupPar(par):
+    par["NScan"] = 5
+    par["NSlice"] = 3
+    par["dimX"] = 16
+    par["dimY"] = 12
+    par["unknowns"] = 2
+    par["DTYPE"] = DTYPE
+    par["DTYPE_real"] = DTYPE_real
+    par["TR"] = 5.0
+    # A vanishing flip angle yields sin_phi = 0 and cos_phi = 1.
+    par["flip_angle(s)"] = np.array([0, 5, 8, 12, 16])
+    par["fa_corr"] = (
+        1 + 0.1*np.random.rand(
+            par["NSlice"], par["dimY"], par["dimX"])).astype(DTYPE)
+    par["fa_corr"][0, 0, 0] = 1
+
+
+class VFAModelCLTest(unittest.TestCase):
+    def setUp(self):
+        parser = tmpArgs()
+        parser.streamed = False
+        parser.devices = -1
+        parser.use_GPU = True
+
+        self.par = {}
+        pyqmri.pyqmri._setupOCL(parser, self.par)
+        setupPar(self.par)
+        self.queue = self.par["queue"][0]
+
+        self.model = Model(self.par)
+        self.model.uk_scale = [1.5, 0.5]
+        self.assertTrue(self.model.cl_available)
+
+        shape = (self.par["NSlice"], self.par["dimY"], self.par["dimX"])
+        self.x = np.array(
+            [1 + 0.5*np.random.randn(*shape)
+             + 0.5j*np.random.randn(*shape),
+             (0.95 + 0.04*np.random.rand(*shape)) / 0.5],
+            dtype=DTYPE)
+        # E1 = 1 with vanishing flip angle: 0/0 for the first scan.
+        self.x[1, 0, 0, 0] = 2
+        # Non-finite unknowns.
+        self.x[1, 0, 0, 1] = np.nan
+        self.x[0, 0, 0, 2] = np.inf
+
+    def _assertClose(self, a, b):
+        np.testing.assert_allclose(
+            a, b, rtol=RTOL, atol=RTOL*np.abs(b).max())
+
+    def test_gradient_cl(self):
+        grad = self.model.execute_gradient_cl(
+            clarray.to_device(self.queue, self.x)).get()
+        grad_ref = np.nan_to_num(self.model.execute_gradient(self.x))
+        self.assertTrue(np.all(np.isfinite(grad)))
+        self._assertClose(grad, grad_ref)
+
+    def test_jacobi(self):
+        if DTYPE == np.complex128:
+            file = resource_filename(
+                        'pyqmri', 'kernels/OpenCL_Kernels_double.c')
+        else:
+            file = resource_filename(
+                        'pyqmri', 'kernels/OpenCL_Kernels.c')
+        with open(file) as myfile:
+            prg = Program(self.par["ctx"][0], myfile.read())
+        irgn = types.SimpleNamespace(
+            _queue=[self.queue], _prg=[prg], par=self.par,
+            _DTYPE_real=DTYPE_real, _allocator=None,
+            _modelgrad=self.model.execute_gradient_cl(
+                clarray.to_device(self.queue, self.x)))
+
+        jacobi = IRGNOptimizer._calcJacobi(irgn).get()
+
+        jacobi_ref = np.sum(
+            np.abs(np.nan_to_num(self.model.execute_gradient(self.x)))**2,
+            1).astype(DTYPE_real)
+        jacobi_ref[jacobi_ref == 0] = 1e-8
+        self._assertClose(jacobi, jacobi_ref)